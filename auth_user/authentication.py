@@ -0,0 +1,170 @@
+import copy
+import hashlib
+import threading
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from utils import app_settings
+from utils.caching import LRUCache
+
+User = get_user_model()
+
+DEFAULTS = {
+    # Django cache alias shared by all workers; None keeps a process-local LRU.
+    'CACHE_ALIAS': None,
+    # Most tokens held by the process-local LRU.
+    'MAX_ENTRIES': 10000,
+    # Seconds a resolved token is trusted without going back to the database.
+    'TIMEOUT': 300,
+}
+
+
+get_setting = partial(app_settings.get_setting, 'AUTH_TOKEN_CACHE', DEFAULTS)
+
+
+def token_cache_key(key):
+    # Never store raw token keys in a shared cache
+    return 'auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+class TokenCache:
+    """
+    Bounded cache of token key -> Token (with its user) lookups.
+
+    Backed by a process-local LRU by default, or by the Django cache named by
+    AUTH_TOKEN_CACHE['CACHE_ALIAS'] when several workers must see each other's
+    invalidations. The shared cache only holds the user's primary key and
+    `is_active`, never the user row itself (password hash included); active
+    users are then loaded by primary key. Entries are dropped on logout,
+    deactivation and deletion (see auth_user.signals); the timeout bounds
+    staleness for changes that bypass signals, such as `queryset.update()`.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        alias = get_setting('CACHE_ALIAS')
+        return caches[alias] if alias else None
+
+    def get_local(self):
+        if self.local is None:
+            self.local = LRUCache(get_setting('MAX_ENTRIES'), get_setting('TIMEOUT'))
+        return self.local
+
+    def get(self, key):
+        shared = self.shared
+        if shared is not None:
+            token = self.get_shared(shared, key)
+        else:
+            token = self.get_local().get(key, None)
+            if token is not None:
+                # Hand each request its own instances; views may modify request.user
+                token = copy.copy(token)
+                token.user = copy.copy(token.user)
+
+        with self.lock:
+            if token is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return token
+
+    def get_shared(self, shared, key):
+        entry = shared.get(token_cache_key(key))
+        if entry is None:
+            return None
+        user_id, is_active = entry
+        if not is_active:
+            # Rejected by the caller before anything else is read
+            return Token(key=key, user=User(pk=user_id, is_active=False))
+        user = User._default_manager.filter(pk=user_id).first()
+        return Token(key=key, user=user) if user is not None else None
+
+    def set(self, key, token):
+        shared = self.shared
+        if shared is not None:
+            entry = (token.user_id, token.user.is_active)
+            shared.set(token_cache_key(key), entry, get_setting('TIMEOUT'))
+        else:
+            self.get_local().set(key, token)
+
+    def delete(self, keys):
+        shared = self.shared
+        if shared is not None:
+            shared.delete_many([token_cache_key(key) for key in keys])
+        else:
+            local = self.get_local()
+            for key in keys:
+                local.delete(key)
+
+    def invalidate(self, keys):
+        """
+        Forget the given token keys now and again once the transaction commits.
+        """
+        keys = list(keys)
+        if not keys:
+            return
+        self.delete(keys)
+        transaction.on_commit(lambda: self.delete(keys))
+
+    def clear(self):
+        if self.local is not None:
+            self.local.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': get_setting('CACHE_ALIAS') or 'local',
+                'entries': len(self.local.entries) if self.local is not None else None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+token_cache = TokenCache()
+
+
+def get_token(key):
+    """
+    Resolve a token key to its Token with the user loaded, via the cache.
+
+    Returns:
+        Token | None: The token, or None if the key is unknown.
+    """
+    token = token_cache.get(key)
+    if token is None:
+        token = Token.objects.select_related('user').filter(key=key).first()
+        if token is not None:
+            token_cache.set(key, token)
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that resolves tokens through `token_cache`.
+
+    Behaves like DRF's TokenAuthentication, but a cached token costs no
+    database round trip.
+    """
+
+    def authenticate_credentials(self, key):
+        token = get_token(key)
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
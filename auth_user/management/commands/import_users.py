@@ -0,0 +1,246 @@
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from auth_user.models import UsernameTrigram
+from auth_user.search import normalize_username, trigram_rows
+from user_profile.models import UserProfile
+
+User = get_user_model()
+
+def read_records(stream, fmt):
+    """
+    Yield input records as dicts, one at a time, in file order.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def hash_passwords(passwords):
+    # Runs in a worker process; a batch per task keeps IPC overhead negligible
+    return [make_password(password) for password in passwords]
+
+
+class Command(BaseCommand):
+    """
+    Create users (and their profiles) in bulk from a CSV or JSONL file.
+
+    Each input record may carry `username` (required), `email`, `first_name`,
+    `last_name` and either a plaintext `password`, a `password_hash` already in
+    Django's format, or neither. Records are streamed and written in batches:
+    one `bulk_create` each for the users, their profiles and their username
+    search trigrams per transaction, bypassing the per-row post_save signals
+    that `create_user` would trigger.
+
+    Plaintext passwords are hashed in a process pool, which is by far the most
+    expensive step; `--invite` skips hashing altogether and gives every account
+    an unusable password to be set through an invite flow.
+
+    Progress is checkpointed after every committed batch, so an interrupted
+    import picks up where it stopped when re-run with the same file. Usernames
+    that already exist are skipped, which also makes re-running a batch safe.
+    """
+    help = 'Bulk import users from a CSV or JSONL file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import, or "-" for stdin.')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Input format (default: guessed from the file extension).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users to create per transaction (default: 1000).'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes used to hash passwords (default: number of CPUs).'
+        )
+        parser.add_argument(
+            '--invite',
+            action='store_true',
+            help='Ignore passwords and create accounts with unusable passwords.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording progress (default: <path>.checkpoint).'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore an existing checkpoint and start from the first record.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        batch_size = options['batch_size']
+        self.invite = options['invite']
+        self.checkpoint_path = options['checkpoint'] or (None if path == '-' else f'{path}.checkpoint')
+
+        skip = 0 if options['restart'] else self.load_checkpoint()
+        self.created = self.skipped = self.invalid = 0
+        # Records read (and validated) vs. records whose batch was committed
+        self.read = self.processed = skip
+        self.started = time.monotonic()
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        executor = None
+        self.workers = options['workers']
+        if not self.invite and self.workers > 1:
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup)
+
+        try:
+            records = itertools.islice(read_records(stream, fmt), skip, None)
+            if skip:
+                self.stdout.write(f'Resuming after {skip} records.')
+
+            batches = iter(lambda: list(itertools.islice(records, batch_size)), [])
+            pending = self.prepare(next(batches, None), executor)
+            while pending is not None:
+                # Hash the next batch while this one is being written
+                upcoming = self.prepare(next(batches, None), executor)
+                self.write_batch(*pending)
+                pending = upcoming
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Import stopped after {self.processed} records: {exc}')
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if stream is not sys.stdin:
+                stream.close()
+
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Import complete: {self.created} created, {self.skipped} already existed, '
+            f'{self.invalid} invalid, {self.rate():.0f} users/s.'
+        ))
+
+    def prepare(self, records, executor):
+        """
+        Validate a batch and start hashing its passwords.
+
+        Returns:
+            tuple | None: ``(record count, users, (plaintext, hashes))`` where
+            `hashes` is a list of hashes or of futures resolving to lists of
+            hashes, one per chunk of `plaintext`.
+        """
+        if records is None:
+            return None
+
+        users, plaintext = [], []
+        for offset, record in enumerate(records, start=self.read + 1):
+            username = (record.get('username') or '').strip()
+            if not username:
+                self.invalid += 1
+                self.stderr.write(f'Record {offset}: missing username; skipped.')
+                continue
+
+            user = User(
+                username=username,
+                username_normalized=normalize_username(username),
+                email=User.objects.normalize_email(record.get('email') or ''),
+                first_name=record.get('first_name') or '',
+                last_name=record.get('last_name') or ''
+            )
+            password_hash = record.get('password_hash')
+            if self.invite:
+                user.set_unusable_password()
+            elif password_hash:
+                try:
+                    identify_hasher(password_hash)
+                except ValueError:
+                    self.invalid += 1
+                    self.stderr.write(f'Record {offset}: unrecognised password_hash; skipped.')
+                    continue
+                user.password = password_hash
+            elif record.get('password'):
+                plaintext.append((user, record['password']))
+            else:
+                user.set_unusable_password()
+            users.append(user)
+        self.read += len(records)
+
+        passwords = [password for _, password in plaintext]
+        if executor is None:
+            hashes = [hash_passwords(passwords)]
+        else:
+            # Spread the batch over every worker
+            chunk = -(-len(passwords) // self.workers) or 1
+            hashes = [
+                executor.submit(hash_passwords, passwords[start:start + chunk])
+                for start in range(0, len(passwords), chunk)
+            ]
+        return len(records), users, (plaintext, hashes)
+
+    def write_batch(self, count, users, hashing):
+        plaintext, chunks = hashing
+        hashes = itertools.chain.from_iterable(
+            chunk if isinstance(chunk, list) else chunk.result() for chunk in chunks
+        )
+        for (user, _), password_hash in zip(plaintext, hashes):
+            user.password = password_hash
+
+        # Drop duplicates within the batch and accounts created by an earlier run
+        unique = {}
+        for user in users:
+            unique.setdefault(user.username, user)
+        existing = set(User.objects.filter(
+            username__in=unique.keys()
+        ).values_list('username', flat=True))
+        new_users = [user for username, user in unique.items() if username not in existing]
+
+        with transaction.atomic():
+            User.objects.bulk_create(new_users)
+            UserProfile.objects.bulk_create([UserProfile(user_id=user.pk) for user in new_users])
+            UsernameTrigram.objects.bulk_create(trigram_rows(new_users))
+
+        self.created += len(new_users)
+        self.skipped += len(users) - len(new_users)
+        self.processed += count
+        self.save_checkpoint()
+        self.stdout.write(
+            f'{self.processed} records processed: {self.created} created, '
+            f'{self.skipped} existing, {self.invalid} invalid ({self.rate():.0f} users/s).'
+        )
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.created / elapsed if elapsed else 0.0
+
+    def load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path, encoding='utf-8') as checkpoint:
+            return json.load(checkpoint)['processed']
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        # Write-then-rename so a crash never leaves a truncated checkpoint
+        temporary = f'{self.checkpoint_path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as checkpoint:
+            json.dump({'processed': self.processed}, checkpoint)
+        os.replace(temporary, self.checkpoint_path)
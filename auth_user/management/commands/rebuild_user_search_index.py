@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auth_user.search import normalize_username, reindex_users
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Recompute `User.username_normalized` and the username trigram index.
+
+    Users are processed in primary-key order in batches, each in its own
+    transaction, so the command can be interrupted and re-run. Needed after
+    deploying the search index and after bulk changes that bypass signals.
+    """
+    help = 'Rebuild the normalized usernames and trigram index used by user search.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users to process per transaction (default: 1000).'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        processed = 0
+        last_pk = None
+
+        while True:
+            batch = User.objects.order_by('pk').only('pk', 'username', 'username_normalized')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            users = list(batch[:batch_size])
+            if not users:
+                break
+            last_pk = users[-1].pk
+
+            for user in users:
+                user.username_normalized = normalize_username(user.username)
+            with transaction.atomic():
+                User.objects.bulk_update(users, ['username_normalized'])
+                reindex_users(users)
+            processed += len(users)
+            self.stdout.write(f'Processed up to {last_pk}: {processed} users indexed so far.')
+
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {processed} users.'))
@@ -0,0 +1,63 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+
+from auth_user.authentication import get_token
+
+# Subprotocol clients offer to announce a token, e.g.
+# new WebSocket(url, ['token', '<key>'])
+TOKEN_SUBPROTOCOL = 'token'
+
+
+@database_sync_to_async
+def get_user_for_token(key):
+    """
+    Resolve a DRF auth token to its active user, through the token cache.
+
+    Returns:
+        User | AnonymousUser: The token's user, or AnonymousUser if the token is
+        unknown or the account is inactive.
+    """
+    token = get_token(key)
+    if token is None or not token.user.is_active:
+        return AnonymousUser()
+    return token.user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Channels middleware that authenticates WebSocket connections with DRF tokens.
+
+    Browsers cannot set an Authorization header on a WebSocket handshake, so the
+    token is read from either:
+        - the query string: ``?token=<key>``
+        - the subprotocol list: ``Sec-WebSocket-Protocol: token, <key>``
+
+    The resolved user (or AnonymousUser) is stored in ``scope['user']``.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        key = self.get_token_key(scope)
+        scope['user'] = await get_user_for_token(key) if key else AnonymousUser()
+        return await super().__call__(scope, receive, send)
+
+    @staticmethod
+    def get_token_key(scope):
+        """
+        Extract the token key from the subprotocols or the query string.
+
+        Returns:
+            str | None: The token key if one was supplied.
+        """
+        subprotocols = scope.get('subprotocols') or []
+        if TOKEN_SUBPROTOCOL in subprotocols:
+            index = subprotocols.index(TOKEN_SUBPROTOCOL)
+            if index + 1 < len(subprotocols):
+                return subprotocols[index + 1]
+
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        keys = query.get('token')
+        return keys[0] if keys else None
@@ -1,7 +1,9 @@
-import uuid
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from auth_user.search import normalize_username
+from utils.ids import uuid7
+
 
 class User(AbstractUser):
     """
@@ -9,13 +11,53 @@ class User(AbstractUser):
 
     This model replaces the default integer-based ID with a UUID for better
     uniqueness and security. All other fields and behavior are inherited from AbstractUser.
+
+    `username_normalized` is a case- and width-folded copy of the username,
+    maintained on save and indexed for prefix search (see auth_user.search).
     """
 
-    # Use a UUID as the primary key instead of the default auto-incrementing ID.
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Use a time-ordered UUID as the primary key instead of the default
+    # auto-incrementing ID (see utils.ids).
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    username_normalized = models.CharField(
+        max_length=150,
+        db_index=True,
+        editable=False,
+        default=''
+    )
 
     def __str__(self):
         """
         Returns a string representation of the user instance.
         """
         return self.username
+
+    def save(self, *args, **kwargs):
+        normalized = normalize_username(self.username)
+        # Tells the post_save receiver whether the search index needs a rebuild
+        self._username_changed = normalized != self.username_normalized or self._state.adding
+        self.username_normalized = normalized
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'username' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'username_normalized'}
+        super().save(*args, **kwargs)
+
+
+class UsernameTrigram(models.Model):
+    """
+    Side index of the three-character substrings of each normalized username.
+
+    Backs substring search without scanning the users table: a query's
+    trigrams are looked up on the (trigram, user) index and only users having
+    all of them are checked. Rows are kept in sync by auth_user.signals.
+    """
+    trigram = models.CharField(max_length=3)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trigram', 'user'], name='unique_username_trigram'),
+        ]
+
+    def __str__(self):
+        return f'{self.trigram} -> {self.user_id}'
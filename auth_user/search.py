@@ -0,0 +1,100 @@
+import unicodedata
+
+from django.apps import apps
+from django.db.models import Count
+
+TRIGRAM_LENGTH = 3
+MAX_RESULTS = 50
+
+
+def normalize_username(username):
+    """
+    Fold a username for matching: NFKC width normalization plus casefolding.
+    """
+    return unicodedata.normalize('NFKC', username or '').casefold().strip()
+
+
+def trigrams(text):
+    """
+    Return the distinct three-character substrings of `text`.
+    """
+    return {text[i:i + TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+
+def trigram_rows(users):
+    """
+    Build (unsaved) UsernameTrigram rows for the given users.
+    """
+    UsernameTrigram = apps.get_model('auth_user', 'UsernameTrigram')
+    return [
+        UsernameTrigram(trigram=trigram, user_id=user.pk)
+        for user in users
+        for trigram in trigrams(user.username_normalized)
+    ]
+
+
+def reindex_users(users):
+    """
+    Replace the trigram rows of the given users with fresh ones.
+    """
+    UsernameTrigram = apps.get_model('auth_user', 'UsernameTrigram')
+    users = list(users)
+    UsernameTrigram.objects.filter(user_id__in=[user.pk for user in users]).delete()
+    UsernameTrigram.objects.bulk_create(trigram_rows(users), ignore_conflicts=True)
+
+
+def search_user_ids(query, limit=10, exclude=None):
+    """
+    Rank users whose username matches `query` for typeahead.
+
+    Exact matches come first, then prefix matches, then (for queries of three
+    characters or more) substring matches, each tier alphabetical. Prefix
+    matches are a range scan on the `username_normalized` index; substring
+    matches are found through the UsernameTrigram side index, so neither tier
+    scans the users table. At most two queries are issued.
+
+    Args:
+        query (str): Text typed by the user.
+        limit (int): Most results returned, capped at MAX_RESULTS.
+        exclude: Optional user id left out of the results (e.g. the caller).
+
+    Returns:
+        list: Matching user ids, best first.
+    """
+    User = apps.get_model('auth_user', 'User')
+    UsernameTrigram = apps.get_model('auth_user', 'UsernameTrigram')
+
+    query = normalize_username(query)
+    limit = max(1, min(limit, MAX_RESULTS))
+    if not query:
+        return []
+
+    users = User.objects.filter(is_active=True)
+    if exclude is not None:
+        users = users.exclude(pk=exclude)
+
+    # The exact match sorts first within the prefix range on its own
+    prefixed = users.filter(
+        username_normalized__gte=query,
+        username_normalized__lt=query + '\U0010ffff'
+    ).order_by('username_normalized')
+    ids = list(prefixed.values_list('pk', flat=True)[:limit])
+
+    grams = trigrams(query)
+    if len(ids) < limit and grams:
+        candidates = UsernameTrigram.objects.filter(
+            trigram__in=grams
+        ).values('user_id').annotate(
+            matched=Count('trigram')
+        ).filter(matched=len(grams)).values('user_id')
+        substring = users.filter(
+            pk__in=candidates,
+            username_normalized__contains=query
+        ).exclude(
+            pk__in=ids
+        ).exclude(
+            username_normalized__startswith=query
+        ).order_by('username_normalized')
+        ids += substring.values_list('pk', flat=True)[:limit - len(ids)]
+
+    return ids
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from auth_user.authentication import token_cache
+from auth_user.search import reindex_users
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    # Logout deletes the token; deleting a user cascades here as well
+    token_cache.invalidate([instance.key])
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    # Cached tokens carry a copy of the user; drop them when the user changes,
+    # most importantly on deactivation.
+    token_cache.invalidate(Token.objects.filter(user=instance).values_list('key', flat=True))
+
+
+@receiver(post_save, sender=User)
+def sync_username_index(sender, instance, **kwargs):
+    # Only when the normalized username actually changed (see User.save)
+    if getattr(instance, '_username_changed', False):
+        reindex_users([instance])
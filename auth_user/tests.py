@@ -1,3 +1,76 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from auth_user.authentication import token_cache, token_cache_key
+
+User = get_user_model()
+
+
+class TokenCacheTests(TestCase):
+    """
+    Resolved tokens are cached, and dropped on logout, deactivation and
+    deletion. Runs against the process-local LRU.
+    """
+
+    def setUp(self):
+        self.reset()
+        self.addCleanup(self.reset)
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def reset(self):
+        token_cache.clear()
+        caches['default'].clear()
+        token_cache.hits = token_cache.misses = 0
+
+    def authenticated(self):
+        status_code = self.client.get('/api/notifications/unread-count/').status_code
+        self.assertIn(status_code, (200, 401))
+        return status_code == 200
+
+    def test_counts_hits_and_misses(self):
+        self.assertTrue(self.authenticated())
+        self.assertTrue(self.authenticated())
+        stats = token_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 1, 0.5))
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+    def test_logout_drops_the_token(self):
+        self.assertTrue(self.authenticated())
+        self.assertEqual(self.client.post('/api/users/logout/').status_code, 200)
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertFalse(self.authenticated())
+
+    def test_deactivation_drops_the_token(self):
+        self.assertTrue(self.authenticated())
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertFalse(self.authenticated())
+
+    def test_deletion_drops_the_token(self):
+        self.assertTrue(self.authenticated())
+        self.user.delete()
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertFalse(self.authenticated())
+
+
+@override_settings(AUTH_TOKEN_CACHE={'CACHE_ALIAS': 'default'})
+class SharedTokenCacheTests(TokenCacheTests):
+    """
+    The same, against a shared Django cache.
+    """
+
+    def test_stores_no_user_data(self):
+        self.assertTrue(self.authenticated())
+        entry = caches['default'].get(token_cache_key(self.token.key))
+        self.assertEqual(entry, (self.user.pk, True))
+
+    def test_inactive_entries_are_rejected(self):
+        caches['default'].set(token_cache_key(self.token.key), (self.user.pk, False))
+        self.assertFalse(self.authenticated())
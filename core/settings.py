@@ -37,13 +37,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'channels',
     'rest_framework',
     'rest_framework.authtoken',
     'rest_framework_nested',
     'auth_user',
     'user_profile',
     'posts',
-    'messaging'
+    'messaging',
+    'notifications',
+    'media_files'
 ]
 
 MIDDLEWARE = [
@@ -75,6 +78,37 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
+
+# Channel layer used to fan WebSocket events out to connected clients.
+# The in-memory layer only reaches consumers in the same process; point this
+# at channels_redis when running more than one ASGI worker.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Cached conversation membership checks (see messaging.membership)
+MESSAGING_MEMBERSHIP_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Per-conversation buffers of recent messages (see messaging.recent)
+MESSAGING_RECENT_BUFFER = {
+    'PER_CONVERSATION': 50,
+    'MAX_BYTES': 32 * 1024 * 1024,
+    'REPLAY_LIMIT': 500,
+}
+
+# Write-behind batching of WebSocket chat messages (see messaging.persistence)
+MESSAGING_WRITE_BEHIND = {
+    'FLUSH_SIZE': 100,
+    'FLUSH_INTERVAL': 0.005,
+    'MAX_PENDING': 1000,
+    'SUBMIT_TIMEOUT': 1.0,
+}
 
 
 # Database
@@ -89,6 +123,25 @@ DATABASES = {
 
 AUTH_USER_MODEL = 'auth_user.User'
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The local-memory cache is per process; use a shared backend (Redis,
+# Memcached) when running several workers so invalidations reach all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Versioned response payloads (see utils.response_cache). Any backend works,
+    # e.g. 'django.core.cache.backends.filebased.FileBasedCache' with a LOCATION
+    # directory, or a shared Redis/Memcached cache for several workers.
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -128,6 +181,16 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored once per content hash (see media_files.storage)
+STORAGES = {
+    'default': {
+        'BACKEND': 'media_files.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -135,12 +198,102 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'auth_user.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 
+    # Same bytes as JSONRenderer, encoded by orjson
+    'DEFAULT_RENDERER_CLASSES': [
+        'utils.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
     'EXCEPTION_HANDLER': 'utils.exception_handler.custom_exception_handler',
-}
\ No newline at end of file
+}
+
+# Token -> user lookups cached by CachedTokenAuthentication (see
+# auth_user.authentication). Set CACHE_ALIAS to a shared cache when running
+# several workers so logouts take effect on all of them immediately.
+AUTH_TOKEN_CACHE = {
+    'CACHE_ALIAS': None,
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 300,
+}
+
+# Object responses cached by version (see utils.response_cache)
+RESPONSE_CACHE = {
+    'CACHE_ALIAS': 'responses',
+    'TIMEOUT': 600,
+    'LOCK_TIMEOUT': 5,
+}
+
+# How MEDIA_URL is served (see media_files.views.serve_media). Behind nginx,
+# set SENDFILE to 'x-accel-redirect' with an internal location aliasing
+# MEDIA_ROOT at X_ACCEL_PREFIX so workers never copy file bytes.
+MEDIA_SERVING = {
+    'SENDFILE': None,
+    'X_ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 3600,
+    'IMMUTABLE_MAX_AGE': 365 * 24 * 3600,
+}
+
+# Home timelines (see posts.timeline)
+HOME_TIMELINE = {
+    'MAX_LENGTH': 800,
+    'CELEBRITY_FOLLOWERS': 10_000,
+    'FAN_OUT_BATCH': 1000,
+    'TRIM_EVERY': 50,
+    'BACKFILL': 50,
+}
+
+# Caption full-text search (see posts.search)
+POST_SEARCH = {
+    'MAX_CANDIDATES': 1000,
+    'MAX_TERMS': 8,
+    'MIN_PREFIX': 2,
+    'SNIPPET_WORDS': 12,
+    'HIGHLIGHT': ('<mark>', '</mark>'),
+    'TEXT_SEARCH_CONFIG': 'simple',
+}
+
+# Write-behind buffer for like, comment and post counts (see utils.counters)
+COUNTERS = {
+    'FLUSH_INTERVAL': 1.0,
+    'MAX_PENDING': 5000,
+    'BATCH_SIZE': 500,
+    'EAGER': False,
+}
+
+# Resized renditions of uploaded images (see media_files.variants)
+IMAGE_VARIANTS = {
+    'SIZES': {
+        'thumb': (320, 320),
+        'feed': (1080, 1350),
+        'full': (2048, 2048),
+    },
+    'CROP': ('thumb',),
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 82,
+}
+
+# Limits on image uploads, checked while streaming (see media_files.uploads)
+IMAGE_UPLOADS = {
+    'MAX_BYTES': 20 * 2 ** 20,
+    'MAX_PIXELS': 40_000_000,
+    'MAX_DIMENSION': 10_000,
+    'FORMATS': ('JPEG', 'PNG', 'WEBP', 'GIF'),
+    'HEADER_BYTES': 256 * 2 ** 10,
+}
+
+# In-process pool for work kept off the request path (see utils.background)
+BACKGROUND_TASKS = {
+    'WORKERS': 2,
+    'EAGER': False,
+}
+
+# Keyset pagination defaults for list endpoints (see utils.pagination)
+PAGINATION_PAGE_SIZE = 20
+PAGINATION_MAX_PAGE_SIZE = 100
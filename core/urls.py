@@ -15,7 +15,6 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
@@ -25,4 +24,7 @@ urlpatterns = [
     path('api/users/', include('user_profile.urls')),
     path('api/posts/', include('posts.urls')),
     path('api/messages/', include('messaging.urls')),
-] + static(settings.MEDIA_URL, document_root = settings.MEDIA_ROOT)
+    path('api/notifications/', include('notifications.urls')),
+    # Uploaded media, in production too (see media_files.views.serve_media)
+    path(settings.MEDIA_URL.lstrip('/'), include('media_files.urls')),
+]
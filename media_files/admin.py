@@ -0,0 +1,6 @@
+from django.contrib import admin
+
+from media_files.models import Blob
+
+# Register your models here.
+admin.site.register(Blob)
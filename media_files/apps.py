@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class MediaFilesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'media_files'
+
+    def ready(self):
+        import media_files.signals
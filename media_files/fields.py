@@ -0,0 +1,32 @@
+from rest_framework import serializers
+
+from media_files.variants import variant_urls
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only map of an image field's variants: ``{variant: {format: url}}``,
+    or None without an image.
+
+    Point `source` at the ImageField. Variants are generated in the background
+    after upload, or on first request (see media_files.views.serve_media).
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return variant_urls(value.storage, value.name, self.context.get('request'))
+
+    def compile_converter(self, model_field):
+        """
+        Converter for utils.fast_serializers, from the stored file name.
+        """
+        storage = model_field.storage
+
+        def convert(name, state):
+            return variant_urls(storage, name, state.request) if name else None
+        return convert
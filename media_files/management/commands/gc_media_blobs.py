@@ -0,0 +1,121 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from media_files.models import Blob
+from media_files.signals import MEDIA_FIELDS
+
+
+class Command(BaseCommand):
+    """
+    Delete blobs no image field references any more, with their variants.
+
+    Blobs are only collected once unreferenced for `--grace-hours`, so an
+    upload whose post or profile is still being saved (or a duplicate upload
+    racing the collector) keeps its file. Blobs are processed in batches, each
+    claimed and deleted in its own transaction.
+
+    `--recount` first recomputes every refcount from the image fields,
+    repairing drift from writes that bypass model signals (queryset updates,
+    raw SQL).
+    """
+    help = 'Remove unreferenced content-addressed media blobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of blobs to delete per transaction (default: 500).'
+        )
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=24,
+            help='Keep blobs used within this many hours (default: 24).'
+        )
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Recompute refcounts from the image fields first.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be deleted without deleting anything.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+        if not hasattr(default_storage, 'delete_blob'):
+            raise CommandError('The default storage is not a ContentAddressedStorage.')
+
+        if options['recount']:
+            fixed = self.recount(batch_size)
+            self.stdout.write(f'Corrected {fixed} refcounts.')
+
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        deleted = freed = 0
+        last_pk = None
+        while True:
+            candidates = Blob.objects.filter(refcount__lte=0, last_used_at__lt=cutoff).order_by('pk')
+            if last_pk is not None:
+                candidates = candidates.filter(pk__gt=last_pk)
+            pks = list(candidates.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+
+            if options['dry_run']:
+                blobs = list(Blob.objects.filter(pk__in=pks).values_list('name', 'size'))
+            else:
+                blobs = self.delete_batch(pks, cutoff)
+            deleted += len(blobs)
+            freed += sum(size for _, size in blobs)
+            self.stdout.write(f'Processed up to {last_pk}: {deleted} blobs so far.')
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} blobs ({freed} bytes).'))
+
+    def delete_batch(self, pks, cutoff):
+        with transaction.atomic():
+            # Re-check under lock: a reference or upload may have arrived since
+            blobs = list(Blob.objects.select_for_update(skip_locked=True).filter(
+                pk__in=pks, refcount__lte=0, last_used_at__lt=cutoff
+            ).values_list('pk', 'name', 'size'))
+            for _, name, _ in blobs:
+                default_storage.delete_blob(name)
+            Blob.objects.filter(pk__in=[pk for pk, _, _ in blobs]).delete()
+        return [(name, size) for _, name, size in blobs]
+
+    def recount(self, batch_size):
+        references = Counter()
+        for label, fields in MEDIA_FIELDS.items():
+            model = apps.get_model(label)
+            for names in model._base_manager.values_list(*fields).iterator(chunk_size=batch_size):
+                references.update(name for name in names if name)
+
+        fixed = 0
+        last_pk = None
+        while True:
+            batch = Blob.objects.order_by('pk').only('pk', 'name', 'refcount')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            blobs = list(batch[:batch_size])
+            if not blobs:
+                break
+            last_pk = blobs[-1].pk
+
+            stale = [blob for blob in blobs if blob.refcount != references[blob.name]]
+            for blob in stale:
+                blob.refcount = references[blob.name]
+            Blob.objects.bulk_update(stale, ['refcount'])
+            fixed += len(stale)
+        return fixed
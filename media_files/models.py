@@ -0,0 +1,63 @@
+import uuid
+
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+
+class Blob(models.Model):
+    """
+    A file stored once under its content hash (see ContentAddressedStorage).
+
+    Fields:
+        - id (UUID): Primary key.
+        - name (str): Storage name, ``blobs/ab/cd/<sha256><ext>``.
+        - size (int): Size in bytes.
+        - refcount (int): Number of image fields pointing at the blob.
+        - created_at (DateTime): When the blob was first stored.
+        - last_used_at (DateTime): Last upload or reference change; garbage
+          collection leaves recently used blobs alone.
+    """
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="Storage name of the blob"
+    )
+    size = models.PositiveBigIntegerField(
+        help_text="Size in bytes"
+    )
+    refcount = models.IntegerField(
+        default=0,
+        help_text="Image fields referencing the blob"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp of the first upload"
+    )
+    last_used_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Timestamp of the last upload or reference change"
+    )
+
+    class Meta:
+        indexes = [
+            # Backs the garbage collector's scan for unreferenced blobs
+            models.Index(fields=['refcount', 'last_used_at'], name='blob_gc_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount} refs)'
+
+    @classmethod
+    def adjust(cls, name, delta):
+        """
+        Add `delta` to the refcount of the blob stored as `name`; names that
+        are not blobs (e.g. files stored before deduplication) are ignored.
+        """
+        if name:
+            cls.objects.filter(name=name).update(refcount=F('refcount') + delta, last_used_at=timezone.now())
@@ -0,0 +1,64 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from media_files.models import Blob
+from media_files.variants import generate_variants
+from utils.background import background
+
+# Image fields whose uploads get variants and count as blob references, by
+# model label
+MEDIA_FIELDS = {
+    'posts.Post': ('post_image',),
+    'user_profile.UserProfile': ('profile_pic',),
+}
+
+
+def watched_fields(sender, update_fields):
+    fields = MEDIA_FIELDS[sender._meta.label]
+    if update_fields is None:
+        return fields
+    return tuple(name for name in fields if name in update_fields)
+
+
+def remember_media_names(sender, instance, update_fields=None, **kwargs):
+    # Names stored before this save, to move references from old to new blobs
+    fields = watched_fields(sender, update_fields)
+    if instance._state.adding or not fields:
+        instance._media_names = {}
+        return
+    stored = sender._base_manager.filter(pk=instance.pk).values_list(*fields).first()
+    instance._media_names = dict(zip(fields, stored)) if stored else {}
+
+
+def count_media_references(sender, instance, update_fields=None, **kwargs):
+    previous = instance.__dict__.pop('_media_names', {})
+    for name in watched_fields(sender, update_fields):
+        current = getattr(instance, name).name or ''
+        stored = previous.get(name) or ''
+        if current != stored:
+            Blob.adjust(current, 1)
+            Blob.adjust(stored, -1)
+
+
+def release_media_references(sender, instance, **kwargs):
+    for name in MEDIA_FIELDS[sender._meta.label]:
+        Blob.adjust(getattr(instance, name).name, -1)
+
+
+def schedule_variants(sender, instance, update_fields=None, **kwargs):
+    # Generation skips existing variants, so re-saving an unchanged image is
+    # a few storage lookups on the pool
+    for name in watched_fields(sender, update_fields):
+        image = getattr(instance, name)
+        if image:
+            background.submit_on_commit(
+                generate_variants, image.storage, image.name, key=('variants', image.name)
+            )
+
+
+for label in MEDIA_FIELDS:
+    model = apps.get_model(label)
+    pre_save.connect(remember_media_names, sender=model, dispatch_uid=f'media-names:{label}')
+    post_save.connect(count_media_references, sender=model, dispatch_uid=f'media-references:{label}')
+    post_delete.connect(release_media_references, sender=model, dispatch_uid=f'media-release:{label}')
+    post_save.connect(schedule_variants, sender=model, dispatch_uid=f'variants:{label}')
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+from media_files.variants import EXTENSIONS, get_setting, parse_variant_name, variant_name
+
+# Directory (under MEDIA_ROOT) holding content-addressed files.
+BLOB_DIR = 'blobs'
+
+# Longest file extension carried over from the uploaded name.
+MAX_EXTENSION_LENGTH = 10
+
+
+def blob_name(digest, extension):
+    """
+    Storage name of a blob: ``blobs/ab/cd/abcd...<ext>``, fanned out so no
+    directory grows too large.
+    """
+    return posixpath.join(BLOB_DIR, digest[:2], digest[2:4], digest + extension)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage writing uploads under the SHA-256 of their content.
+
+    The hash is computed while the upload streams to a temporary file next to
+    its destination. If a blob with that hash already exists the copy is
+    dropped and only its Blob row is touched, so a duplicate upload costs one
+    metadata write. The returned name is the blob's, whatever name was asked
+    for (only the extension is kept).
+
+    Image variants (see media_files.variants) are derived from the blob name
+    and stored as is, so duplicates share their variants too.
+
+    Blob rows are reference-counted by media_files.signals; unreferenced blobs
+    are removed by the `gc_media_blobs` command.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        if parse_variant_name(name) is not None:
+            return super().get_available_name(name, max_length)
+        # Blobs are named by content; an existing name is the deduplicated copy
+        return name
+
+    def _save(self, name, content):
+        if parse_variant_name(name) is not None:
+            return super()._save(name, content)
+
+        Blob = apps.get_model('media_files', 'Blob')
+        extension = os.path.splitext(name)[1].lower()[:MAX_EXTENSION_LENGTH]
+        directory = self.path(BLOB_DIR)
+        os.makedirs(directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    temp.write(chunk)
+                    size += len(chunk)
+
+            name = blob_name(digest.hexdigest(), extension)
+            full_path = self.path(name)
+            # A row that can be touched keeps the garbage collector off the file
+            touched = Blob.objects.filter(name=name).update(last_used_at=timezone.now())
+            if touched and os.path.exists(full_path):
+                return name
+
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # mkstemp creates the file owner-only
+            os.chmod(temp_path, self.file_permissions_mode if self.file_permissions_mode is not None else 0o644)
+            # Same name, same bytes: replacing a concurrent copy is harmless
+            os.replace(temp_path, full_path)
+            temp_path = None
+            if not touched:
+                Blob.objects.get_or_create(name=name, defaults={'size': size})
+            return name
+        finally:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def delete_blob(self, name):
+        """
+        Remove a blob's file together with its variants.
+        """
+        for variant in get_setting('SIZES'):
+            for fmt in EXTENSIONS:
+                self.delete(variant_name(name, variant, fmt))
+        self.delete(name)
@@ -0,0 +1,208 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from media_files.management.commands.gc_media_blobs import Command as CollectCommand
+from media_files.models import Blob
+from media_files.variants import generate_variants, variant_name
+from posts.models import Post
+
+User = get_user_model()
+
+
+def image_upload(name='photo.png', color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class MediaRootMixin:
+    """
+    Point MEDIA_ROOT at a fresh temporary directory for each test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class BlobTests(MediaRootMixin, TestCase):
+    """
+    Uploads are stored once per content hash and reference-counted, and the
+    collector only deletes blobs unreferenced for the grace period.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='author', email='author@example.com', password='secret')
+
+    def refcounts(self):
+        return dict(Blob.objects.values_list('name', 'refcount'))
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command('gc_media_blobs', *args, stdout=out)
+        return out.getvalue()
+
+    def test_duplicate_uploads_share_a_blob(self):
+        first = Post.objects.create(user=self.user, post_image=image_upload('a.png'))
+        second = Post.objects.create(user=self.user, post_image=image_upload('b.png'))
+
+        self.assertEqual(first.post_image.name, second.post_image.name)
+        self.assertEqual(self.refcounts(), {first.post_image.name: 2})
+        self.assertTrue(default_storage.exists(first.post_image.name))
+
+    def test_references_move_on_replace_and_delete(self):
+        post = Post.objects.create(user=self.user, post_image=image_upload())
+        old_name = post.post_image.name
+
+        post.post_image = image_upload(color='blue')
+        post.save()
+        new_name = post.post_image.name
+        self.assertNotEqual(old_name, new_name)
+        self.assertEqual(self.refcounts(), {old_name: 0, new_name: 1})
+
+        post.delete()
+        self.assertEqual(self.refcounts(), {old_name: 0, new_name: 0})
+
+    def test_collector_honours_grace_period(self):
+        post = Post.objects.create(user=self.user, post_image=image_upload())
+        name = post.post_image.name
+        variant = variant_name(name, 'thumb', 'webp')
+        generate_variants(default_storage, name, only=[('thumb', 'webp')])
+        post.delete()
+
+        self.collect()
+        self.assertTrue(Blob.objects.filter(name=name).exists())
+        self.assertTrue(default_storage.exists(name))
+
+        Blob.objects.update(last_used_at=timezone.now() - timedelta(hours=25))
+        self.assertIn('Would delete 1 blobs', self.collect('--dry-run'))
+        self.assertTrue(default_storage.exists(name))
+
+        self.collect()
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(variant))
+
+    def test_collector_rechecks_claimed_blobs(self):
+        post = Post.objects.create(user=self.user, post_image=image_upload())
+        blob = Blob.objects.get()
+        Blob.objects.update(last_used_at=timezone.now() - timedelta(hours=25))
+        cutoff = timezone.now()
+
+        # Claimed as a candidate, but still referenced once under the lock
+        self.assertEqual(CollectCommand().delete_batch([blob.pk], cutoff), [])
+        self.assertTrue(default_storage.exists(post.post_image.name))
+
+    def test_recount_fixes_drift(self):
+        post = Post.objects.create(user=self.user, post_image=image_upload())
+        Blob.objects.update(refcount=0, last_used_at=timezone.now() - timedelta(hours=25))
+
+        self.assertIn('Corrected 1 refcounts', self.collect('--recount'))
+        self.assertEqual(self.refcounts(), {post.post_image.name: 1})
+        self.assertTrue(os.path.exists(default_storage.path(post.post_image.name)))
+
+
+class ServeMediaTests(MediaRootMixin, TestCase):
+    """
+    serve_media answers conditional and byte-range requests and stays inside
+    MEDIA_ROOT.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.write('docs/digits.txt', b'0123456789')
+
+    def write(self, name, content):
+        # Written in place, like files stored before deduplication
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+
+    def get(self, path='docs/digits.txt', **headers):
+        response = self.client.get(f'/media/{path}', headers=headers)
+        self.body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response
+
+    def test_serves_whole_file(self):
+        response = self.get()
+        self.assertEqual((response.status_code, self.body), (200, b'0123456789'))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+    def test_blobs_are_immutable(self):
+        name = default_storage.save('photo.txt', ContentFile(b'blob'))
+        self.assertTrue(name.startswith('blobs/'))
+        self.assertIn('immutable', self.get(name)['Cache-Control'])
+
+    def test_byte_ranges(self):
+        response = self.get(Range='bytes=2-5')
+        self.assertEqual((response.status_code, self.body), (206, b'2345'))
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+
+        response = self.get(Range='bytes=7-')
+        self.assertEqual((response.status_code, self.body), (206, b'789'))
+
+    def test_suffix_ranges(self):
+        response = self.get(Range='bytes=-3')
+        self.assertEqual((response.status_code, self.body), (206, b'789'))
+        self.assertEqual(response['Content-Range'], 'bytes 7-9/10')
+
+        response = self.get(Range='bytes=-50')
+        self.assertEqual((response.status_code, self.body), (206, b'0123456789'))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=10-', 'bytes=5-2', 'bytes=-0'):
+            response = self.get(Range=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], 'bytes */10')
+
+        self.write('docs/empty.txt', b'')
+        response = self.get('docs/empty.txt', Range='bytes=-5')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_multiple_ranges_fall_back_to_whole_file(self):
+        response = self.get(Range='bytes=0-1,4-5')
+        self.assertEqual((response.status_code, self.body), (200, b'0123456789'))
+
+    def test_if_range(self):
+        etag = self.get()['ETag']
+        response = self.get(Range='bytes=0-1', If_Range=etag)
+        self.assertEqual((response.status_code, self.body), (206, b'01'))
+
+        response = self.get(Range='bytes=0-1', If_Range='"stale"')
+        self.assertEqual((response.status_code, self.body), (200, b'0123456789'))
+
+    def test_not_modified(self):
+        first = self.get()
+        response = self.get(If_None_Match=first['ETag'])
+        self.assertEqual((response.status_code, self.body), (304, b''))
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+        response = self.get(If_Modified_Since=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_files_and_traversal_are_not_found(self):
+        for path in ('docs/missing.txt', 'docs', '..%2Fcore%2Fsettings.py', '%2E%2E/%2E%2E/etc/passwd'):
+            self.assertEqual(self.get(path).status_code, 404, path)
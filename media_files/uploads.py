@@ -0,0 +1,164 @@
+import warnings
+from functools import partial
+from io import BytesIO
+
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, UnidentifiedImageError
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from utils import app_settings
+
+DEFAULTS = {
+    # Largest accepted image file, in bytes.
+    'MAX_BYTES': 20 * 2 ** 20,
+    # Largest accepted width * height, and longest accepted side.
+    'MAX_PIXELS': 40_000_000,
+    'MAX_DIMENSION': 10_000,
+    # Pillow format names accepted.
+    'FORMATS': ('JPEG', 'PNG', 'WEBP', 'GIF'),
+    # Bytes of an upload kept in memory to read its header early; headers
+    # beyond that (e.g. large embedded profiles) are read from the temp file.
+    'HEADER_BYTES': 256 * 2 ** 10,
+}
+
+# Multipart framing and ordinary form fields allowed on top of MAX_BYTES.
+FORM_OVERHEAD = 64 * 2 ** 10
+
+# Leading bytes identifying each accepted format.
+SIGNATURES = {
+    'JPEG': lambda head: head.startswith(b'\xff\xd8\xff'),
+    'PNG': lambda head: head.startswith(b'\x89PNG\r\n\x1a\n'),
+    'GIF': lambda head: head.startswith((b'GIF87a', b'GIF89a')),
+    'WEBP': lambda head: head.startswith(b'RIFF') and head[8:12] == b'WEBP',
+}
+SIGNATURE_BYTES = 12
+
+
+get_setting = partial(app_settings.get_setting, 'IMAGE_UPLOADS', DEFAULTS)
+
+
+class ImageTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Image upload is too large.'
+    default_code = 'image_too_large'
+
+
+class InvalidImage(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Upload a valid image.'
+    default_code = 'invalid_image'
+
+
+def check_image_header(file, complete):
+    """
+    Check format and dimensions of an image from its header, without decoding
+    any pixel data.
+
+    Args:
+        file: Binary file positioned at the start of the image.
+        complete (bool): Whether the whole image is available; otherwise an
+            unreadable header may just be truncated.
+
+    Returns:
+        bool: True once checked, False if more data is needed.
+
+    Raises:
+        InvalidImage: For unaccepted formats or unreadable images.
+        ImageTooLarge: If the dimensions exceed the configured limits.
+    """
+    formats = get_setting('FORMATS')
+    try:
+        with warnings.catch_warnings():
+            # Limits are enforced below; Pillow would only warn up to twice its own
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            image = Image.open(file, formats=formats)
+    except Image.DecompressionBombError:
+        raise ImageTooLarge('Image dimensions are too large.')
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        if complete:
+            raise InvalidImage()
+        return False
+
+    width, height = image.size
+    max_dimension = get_setting('MAX_DIMENSION')
+    if width > max_dimension or height > max_dimension or width * height > get_setting('MAX_PIXELS'):
+        raise ImageTooLarge(f'Image dimensions are too large ({width}x{height}).')
+    return True
+
+
+class BoundedImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Upload handler streaming image uploads to a temporary file under
+    IMAGE_UPLOADS limits, rejecting them as early as possible.
+
+    - Bodies whose Content-Length exceeds MAX_BYTES (plus form overhead) are
+      refused before anything is read.
+    - Files are refused by their first bytes when they are not an accepted
+      format, and as soon as their header shows oversized dimensions.
+    - Streaming stops once a file passes MAX_BYTES.
+
+    Memory use is bounded by the chunk size plus HEADER_BYTES, whatever the
+    upload. Errors are raised as APIExceptions from `request.data`.
+    """
+    chunk_size = 64 * 2 ** 10
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length and content_length > get_setting('MAX_BYTES') + FORM_OVERHEAD:
+            raise ImageTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = bytearray()
+        self.checked = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > get_setting('MAX_BYTES'):
+            self.reject(ImageTooLarge())
+
+        if not self.checked and self.header is not None:
+            self.header += raw_data
+            self.check_header()
+            if len(self.header) >= get_setting('HEADER_BYTES'):
+                # Finish the check from the temp file once it is complete
+                self.header = None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            self.file.seek(0)
+            try:
+                self.checked = check_image_header(self.file, complete=True)
+            except APIException as exc:
+                self.reject(exc)
+        return super().file_complete(file_size)
+
+    def check_header(self):
+        header = bytes(self.header)
+        formats = get_setting('FORMATS')
+        if len(header) >= SIGNATURE_BYTES and all(fmt in SIGNATURES for fmt in formats):
+            if not any(SIGNATURES[fmt](header) for fmt in formats):
+                self.reject(InvalidImage())
+        try:
+            self.checked = check_image_header(BytesIO(header), complete=False)
+        except APIException as exc:
+            self.reject(exc)
+
+    def reject(self, exc):
+        # Closing the temporary upload deletes it
+        self.file.close()
+        raise exc
+
+
+class BoundedImageUploadMixin:
+    """
+    View mixin parsing multipart bodies with BoundedImageUploadHandler, for
+    views accepting image uploads.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        # Must be in place before the body is read; authentication does not read it
+        request._request.upload_handlers = [BoundedImageUploadHandler(request._request)]
+        super().initial(request, *args, **kwargs)
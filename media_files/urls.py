@@ -0,0 +1,8 @@
+from django.urls import re_path
+
+from media_files.views import serve_media
+
+# Mounted at MEDIA_URL
+urlpatterns = [
+    re_path(r'^(?P<path>.+)$', serve_media, name='media'),
+]
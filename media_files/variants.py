@@ -0,0 +1,177 @@
+import io
+import posixpath
+from functools import partial
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image, ImageOps
+
+from utils import app_settings
+
+DEFAULTS = {
+    # Bounding box of each variant, in pixels; images are never upscaled.
+    'SIZES': {
+        'thumb': (320, 320),
+        'feed': (1080, 1350),
+        'full': (2048, 2048),
+    },
+    # Variants cropped to fill their box instead of fitting inside it.
+    'CROP': ('thumb',),
+    # Encodings written for every variant.
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 82,
+}
+
+# Directory, next to the original, holding its variants.
+VARIANT_DIR = 'variants'
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+FORMATS = {extension: fmt for fmt, extension in EXTENSIONS.items()}
+PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+get_setting = partial(app_settings.get_setting, 'IMAGE_VARIANTS', DEFAULTS)
+
+
+def variant_name(name, variant, fmt):
+    """
+    Storage name of a variant: ``post_images/a.jpg`` becomes
+    ``post_images/variants/a.jpg.thumb.webp``.
+    """
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, VARIANT_DIR, f'{filename}.{variant}.{EXTENSIONS[fmt]}')
+
+
+def parse_variant_name(name):
+    """
+    Inverse of `variant_name`.
+
+    Returns:
+        tuple | None: ``(original, variant, fmt)``, or None if `name` is not
+        the name of a configured variant.
+    """
+    directory, filename = posixpath.split(name)
+    parent, variant_dir = posixpath.split(directory)
+    if variant_dir != VARIANT_DIR:
+        return None
+    try:
+        original, variant, extension = filename.rsplit('.', 2)
+    except ValueError:
+        return None
+    fmt = FORMATS.get(extension)
+    if not original or variant not in get_setting('SIZES') or fmt not in get_setting('FORMATS'):
+        return None
+    return posixpath.join(parent, original), variant, fmt
+
+
+def variant_urls(storage, name, request=None):
+    """
+    Map of variant -> format -> URL for the original stored as `name`.
+
+    URLs are absolute when a request is given, like the original's.
+    """
+    suffixes = {
+        variant: {fmt: f'.{variant}.{EXTENSIONS[fmt]}' for fmt in get_setting('FORMATS')}
+        for variant in get_setting('SIZES')
+    }
+    if isinstance(storage, FileSystemStorage):
+        # Variant URLs only differ by an unquoted suffix; build the base once
+        directory, filename = posixpath.split(name)
+        base = storage.url(posixpath.join(directory, VARIANT_DIR, filename))
+        if request is not None:
+            base = request.build_absolute_uri(base)
+        return {
+            variant: {fmt: base + suffix for fmt, suffix in formats.items()}
+            for variant, formats in suffixes.items()
+        }
+
+    urls = {}
+    for variant, formats in suffixes.items():
+        urls[variant] = {}
+        for fmt in formats:
+            url = storage.url(variant_name(name, variant, fmt))
+            urls[variant][fmt] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def open_original(storage, name):
+    """
+    Decode a stored image upright (EXIF orientation applied) as RGB, or RGBA
+    when it has transparency; first frame only.
+    """
+    with storage.open(name, 'rb') as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    icc_profile = image.info.get('icc_profile')
+    alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if alpha else 'RGB')
+    image.info = {'icc_profile': icc_profile} if icc_profile else {}
+    return image
+
+
+def render_variant(image, variant, fmt):
+    """
+    Encode `image` (from `open_original`) as `variant` in `fmt`, without EXIF,
+    XMP or comments (only the ICC profile is kept so colours survive).
+
+    Returns:
+        bytes: The encoded image.
+    """
+    box = get_setting('SIZES')[variant]
+    if variant in get_setting('CROP'):
+        scale = min(1, image.width / box[0], image.height / box[1])
+        size = (max(1, round(box[0] * scale)), max(1, round(box[1] * scale)))
+        resized = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+    else:
+        resized = image.copy()
+        resized.thumbnail(box, Image.Resampling.LANCZOS)
+
+    if resized.mode == 'RGBA' and fmt == 'jpeg':
+        # JPEG has no alpha channel; flatten onto white
+        flattened = Image.new('RGB', resized.size, (255, 255, 255))
+        flattened.paste(resized, mask=resized.getchannel('A'))
+        resized = flattened
+
+    options = {'quality': get_setting('QUALITY')}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    if fmt == 'jpeg':
+        options.update(optimize=True, progressive=True)
+
+    resized.info = {}
+    output = io.BytesIO()
+    resized.save(output, PIL_FORMATS[fmt], **options)
+    return output.getvalue()
+
+
+def generate_variants(storage, name, only=None):
+    """
+    Write the missing variants of the image stored as `name` next to it.
+
+    Safe to run repeatedly and concurrently: existing variants are skipped,
+    and a copy saved under another name after losing a race is removed.
+
+    Args:
+        storage: Storage holding the original.
+        name (str): Storage name of the original.
+        only (iterable): Optional ``(variant, fmt)`` pairs to limit the work to.
+
+    Returns:
+        list: Names of the variants written.
+    """
+    wanted = only or [(variant, fmt) for variant in get_setting('SIZES') for fmt in get_setting('FORMATS')]
+    missing = [(variant, fmt) for variant, fmt in wanted if not storage.exists(variant_name(name, variant, fmt))]
+    if not missing:
+        return []
+
+    image = open_original(storage, name)
+    written = []
+    for variant, fmt in missing:
+        target = variant_name(name, variant, fmt)
+        saved = storage.save(target, ContentFile(render_variant(image, variant, fmt)))
+        if saved != target:
+            storage.delete(saved)
+        written.append(target)
+    return written
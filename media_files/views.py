@@ -0,0 +1,212 @@
+import mimetypes
+import os
+import re
+from functools import partial
+from urllib.parse import quote
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from PIL import Image
+
+from media_files.storage import BLOB_DIR
+from media_files.variants import generate_variants, parse_variant_name
+from utils import app_settings
+from utils.background import background
+
+DEFAULTS = {
+    # Hand the byte copying to the front proxy: None, 'x-accel-redirect'
+    # (nginx) or 'x-sendfile' (Apache, lighttpd).
+    'SENDFILE': None,
+    # Internal nginx location aliased to MEDIA_ROOT, for X-Accel-Redirect.
+    'X_ACCEL_PREFIX': '/protected-media/',
+    # Cache lifetime of files whose content may change under the same name.
+    'MAX_AGE': 3600,
+    # Cache lifetime of content-addressed files and their variants.
+    'IMMUTABLE_MAX_AGE': 365 * 24 * 3600,
+}
+
+# Bytes read per iteration when Python streams the file itself.
+BLOCK_SIZE = 64 * 2 ** 10
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+get_setting = partial(app_settings.get_setting, 'MEDIA_SERVING', DEFAULTS)
+
+
+class RangeFile:
+    """
+    Read-only view of `length` bytes of an open file from its current
+    position. Exposes `fileno()` so WSGI servers with sendfile support (which
+    honour Content-Length) still send the range without copying it through
+    Python.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range ``Range: bytes=...`` header.
+
+    Returns:
+        tuple | None: Inclusive ``(start, end)``, None to serve the whole file
+        (no header, several ranges or another unit).
+
+    Raises:
+        ValueError: If the range cannot be satisfied (no range of an empty
+            file can).
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not size:
+        raise ValueError(header)
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    """
+    Whether a Range request's If-Range validator still matches the file.
+    """
+    validator = request.headers.get('If-Range')
+    if validator is None:
+        return True
+    if validator.startswith(('"', 'W/')):
+        return validator == etag
+    modified = parse_http_date_safe(validator)
+    return modified is not None and int(mtime) <= modified
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from the default storage (MEDIA_ROOT) in production.
+
+    - Conditional requests (ETag from size and mtime, Last-Modified) are
+      answered with 304 before the file is opened.
+    - Content-addressed files (see ContentAddressedStorage) never change, so
+      they and their variants are cached as immutable for a year; other files
+      for MAX_AGE.
+    - With SENDFILE set, the response only carries X-Accel-Redirect or
+      X-Sendfile and the proxy sends the bytes (ranges included).
+    - Otherwise the file goes out as a FileResponse, which WSGI servers hand
+      to sendfile; single byte ranges are honoured (206/416) the same way.
+    - Missing image variants are rendered on first request (see
+      media_files.variants) and the others queued.
+
+    Raises:
+        Http404: If the file does not exist (or a variant's original is not
+            a decodable image).
+    """
+    try:
+        full_path = default_storage.path(path)
+        if parse_variant_name(path) is not None and not os.path.exists(full_path):
+            generate_missing_variant(path)
+        stat = os.stat(full_path)
+    except (OSError, SuspiciousFileOperation):
+        raise Http404('File not found.')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found.')
+
+    size = stat.st_size
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        if not_modified.status_code == 304:
+            set_cache_headers(not_modified, path, etag, stat.st_mtime)
+        return not_modified
+
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    sendfile = get_setting('SENDFILE')
+    if sendfile or request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        if sendfile == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = get_setting('X_ACCEL_PREFIX') + quote(path)
+        elif sendfile == 'x-sendfile':
+            response['X-Sendfile'] = full_path
+        else:
+            response['Content-Length'] = size
+        return set_cache_headers(response, path, etag, stat.st_mtime)
+
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is not None and not if_range_matches(request, etag, stat.st_mtime):
+        byte_range = None
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(RangeFile(file, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response.block_size = BLOCK_SIZE
+    return set_cache_headers(response, path, etag, stat.st_mtime)
+
+
+def generate_missing_variant(path):
+    """
+    Render the variant stored as `path` from its original, queueing the
+    original's other variants.
+
+    Raises:
+        Http404: If the original is missing or not a decodable image.
+    """
+    original, variant, fmt = parse_variant_name(path)
+    if not default_storage.exists(original):
+        raise Http404('Image not found.')
+    try:
+        generate_variants(default_storage, original, only=[(variant, fmt)])
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise Http404('Image not found.')
+    background.submit(generate_variants, default_storage, original, key=('variants', original))
+
+
+def set_cache_headers(response, path, etag, mtime):
+    if path.startswith(BLOB_DIR + '/'):
+        response['Cache-Control'] = f"public, max-age={get_setting('IMMUTABLE_MAX_AGE')}, immutable"
+    else:
+        response['Cache-Control'] = f"public, max-age={get_setting('MAX_AGE')}"
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Accept-Ranges'] = 'bytes'
+    return response
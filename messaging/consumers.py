@@ -1,22 +1,52 @@
 import json
-from channels.generic.websocket import AsyncWebsocketConsumer
+import logging
+import uuid
+from urllib.parse import parse_qs
 from channels.db import database_sync_to_async
-from django.contrib.auth.models import AnonymousUser
+from channels.generic.websocket import AsyncWebsocketConsumer
+from auth_user.middleware import TOKEN_SUBPROTOCOL
+from messaging.membership import ais_member
 from messaging.models import Conversation, Message
+from messaging.pagination import MessageHistoryPagination
+from messaging.persistence import MessageQueueFull, get_write_queue
+from messaging.recent import get_setting as get_buffer_setting, recent_messages
 from user_profile.models import UserProfile
 
+logger = logging.getLogger(__name__)
+
+
+def conversation_group_name(conversation_id):
+    """
+    Channel layer group that every socket open on a conversation joins.
+    """
+    return f'chat_{conversation_id}'
+
+
+def chat_message_event(message, sender):
+    """
+    Build the channel layer event broadcast for a stored message.
+    """
+    return {
+        'type': 'chat_message',
+        'id': str(message.id),
+        'message': message.text,
+        'sender': sender.username,
+        'timestamp': str(message.created_at)
+    }
+
+
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
-        self.conversation_group_name = f'chat_{self.conversation_id}'
+        self.conversation_group_name = conversation_group_name(self.conversation_id)
 
         # Check if user is authenticated and part of the conversation
         user = self.scope['user']
-        if user == AnonymousUser():
+        if not user.is_authenticated:
             await self.close()
             return
 
-        if not await self.is_participant(user):
+        if not await ais_member(self.conversation_id, user.pk):
             await self.close()
             return
 
@@ -26,7 +56,21 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
-        await self.accept()
+        # Echo the token subprotocol back, or browsers drop the connection
+        subprotocol = TOKEN_SUBPROTOCOL if TOKEN_SUBPROTOCOL in self.scope.get('subprotocols', []) else None
+        await self.accept(subprotocol=subprotocol)
+
+        # Reconnecting clients pass ?since=<message id> to catch up on the gap
+        query = parse_qs(self.scope.get('query_string', b'').decode('latin-1'))
+        since = query.get('since')
+        if since:
+            events, after = await self.events_since(since[0])
+            for event in events:
+                await self.send(text_data=json.dumps(event))
+            if after is not None:
+                # More was missed than is replayed; the rest is read from the
+                # history API with ?after=<cursor>
+                await self.send(text_data=json.dumps({'type': 'replay_truncated', 'after': after}))
 
     async def disconnect(self, close_code):
         # Leave conversation group
@@ -36,40 +80,95 @@ class ChatConsumer(AsyncWebsocketConsumer):
         )
 
     @database_sync_to_async
-    def is_participant(self, user):
-        return Conversation.objects.filter(
-            id=self.conversation_id,
-            participants=user
-        ).exists()
+    def events_since(self, message_id):
+        """
+        Build chat_message events for messages newer than `message_id`.
 
-    @database_sync_to_async
-    def create_message(self, sender, message):
-        conversation = Conversation.objects.get(id=self.conversation_id)
-        return Message.objects.create(
-            conversation=conversation,
-            sender=sender,
-            text=message
-        )
+        Served from the recent-message buffer when possible, otherwise by one
+        keyset query on the history index.
+
+        Returns:
+            tuple: ``(events, after)``, oldest first and at most REPLAY_LIMIT
+            events. `after` is a history API cursor past the last replayed
+            message when more are newer, otherwise None.
+        """
+        try:
+            message_id = uuid.UUID(message_id)
+        except ValueError:
+            return [], None
+
+        last_message_id = Conversation.objects.filter(
+            pk=self.conversation_id
+        ).values_list('last_message_id', flat=True).first()
+        messages = recent_messages.since(self.conversation_id, message_id, last_message_id)
+        replay_limit = get_buffer_setting('REPLAY_LIMIT')
+        paginator = MessageHistoryPagination()
+
+        if messages is None:
+            anchor = Message.objects.filter(
+                pk=message_id,
+                conversation_id=self.conversation_id
+            ).first()
+            if anchor is None:
+                return [], None
+            messages = Message.objects.filter(
+                conversation_id=self.conversation_id
+            ).filter(
+                paginator.build_seek_filter(paginator.get_position(anchor))
+            ).select_related('sender').order_by(*paginator.get_ordering())
+
+        # Oldest first; one extra row tells whether the client has to page on
+        messages = list(messages[:replay_limit + 1])
+        after = None
+        if len(messages) > replay_limit:
+            messages = messages[:replay_limit]
+            after = paginator.encode_cursor(paginator.get_position(messages[-1]))
+        return [chat_message_event(message, message.sender) for message in messages], after
 
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
         message = text_data_json['message']
+        client_id = text_data_json.get('client_id')
         user = self.scope['user']
 
-        # Save message to database
-        message_obj = await self.create_message(user, message)
+        # Cheap cache hit in the common case; catches members removed mid-session
+        if not await ais_member(self.conversation_id, user.pk):
+            await self.close()
+            return
+
+        # Hand the message to the write-behind queue; returns once committed
+        try:
+            message_obj = await get_write_queue().submit(self.conversation_id, user, message)
+        except MessageQueueFull as exc:
+            await self.send_error(client_id, str(exc))
+            return
+        except Exception:
+            # Anything persist_messages raised; the socket stays open
+            logger.exception('Could not save message in conversation %s', self.conversation_id)
+            await self.send_error(client_id, 'Message could not be saved.')
+            return
+
+        # Acknowledge to the sender with the server-assigned id and timestamp
+        await self.send(text_data=json.dumps({
+            'type': 'ack',
+            'client_id': client_id,
+            'id': str(message_obj.id),
+            'timestamp': str(message_obj.created_at)
+        }))
 
         # Send message to conversation group
         await self.channel_layer.group_send(
             self.conversation_group_name,
-            {
-                'type': 'chat_message',
-                'message': message,
-                'sender': user.username,
-                'timestamp': str(message_obj.created_at)
-            }
+            chat_message_event(message_obj, user)
         )
 
+    async def send_error(self, client_id, error):
+        await self.send(text_data=json.dumps({
+            'type': 'error',
+            'client_id': client_id,
+            'error': error
+        }))
+
     async def chat_message(self, event):
         # Send message to WebSocket
         await self.send(text_data=json.dumps(event))
\ No newline at end of file
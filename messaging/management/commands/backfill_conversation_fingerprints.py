@@ -0,0 +1,79 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from messaging.models import Conversation, ConversationMember
+
+
+class Command(BaseCommand):
+    """
+    Populate `Conversation.participant_fingerprint` for existing conversations.
+
+    Conversations are processed in primary-key order in batches, so the command
+    can be interrupted and re-run; only rows without a fingerprint are touched.
+    When several conversations share the same participant set, the first one
+    processed becomes the canonical chat and the others are reported and left
+    without a fingerprint.
+    """
+    help = 'Backfill participant-set fingerprints used to deduplicate conversations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of conversations to process per transaction (default: 1000).'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = duplicates = 0
+        last_pk = None
+
+        while True:
+            batch = Conversation.objects.filter(participant_fingerprint__isnull=True).order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            conversation_ids = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not conversation_ids:
+                break
+            last_pk = conversation_ids[-1]
+
+            members = defaultdict(list)
+            rows = ConversationMember.objects.filter(
+                conversation_id__in=conversation_ids
+            ).values_list('conversation_id', 'user_id')
+            for conversation_id, user_id in rows:
+                members[conversation_id].append(user_id)
+
+            fingerprints = {
+                conversation_id: Conversation.fingerprint_for(user_ids)
+                for conversation_id, user_ids in members.items()
+            }
+            taken = set(Conversation.objects.filter(
+                participant_fingerprint__in=fingerprints.values()
+            ).values_list('participant_fingerprint', flat=True))
+
+            to_update = []
+            for conversation_id in conversation_ids:
+                fingerprint = fingerprints.get(conversation_id)
+                if fingerprint is None:
+                    continue
+                if fingerprint in taken:
+                    duplicates += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'Conversation {conversation_id} duplicates an existing participant set; skipped.'
+                    ))
+                    continue
+                taken.add(fingerprint)
+                to_update.append(Conversation(pk=conversation_id, participant_fingerprint=fingerprint))
+
+            with transaction.atomic():
+                Conversation.objects.bulk_update(to_update, ['participant_fingerprint'])
+            updated += len(to_update)
+            self.stdout.write(f'Processed up to {last_pk}: {updated} fingerprinted so far.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfill complete: {updated} conversations fingerprinted, {duplicates} duplicates skipped.'
+        ))
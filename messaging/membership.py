@@ -0,0 +1,72 @@
+from functools import partial
+
+from channels.db import database_sync_to_async
+from django.core.cache import caches
+from django.db import transaction
+
+from messaging.models import ConversationMember
+from utils import app_settings
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+
+get_setting = partial(app_settings.get_setting, 'MESSAGING_MEMBERSHIP_CACHE', DEFAULTS)
+
+
+def get_cache():
+    return caches[get_setting('CACHE_ALIAS')]
+
+
+def membership_key(conversation_id, user_id):
+    return f'messaging:member:{conversation_id}:{user_id}'
+
+
+def is_member(conversation_id, user_id):
+    """
+    Check whether a user belongs to a conversation.
+
+    Answers, positive and negative, are cached per (conversation, user); a miss
+    costs one `exists()` probe on the unique (conversation, user) index. Entries
+    are dropped by `invalidate` whenever membership changes (see
+    messaging.signals), so the timeout is only a safety net.
+
+    Returns:
+        bool: True if the user is a member of the conversation.
+    """
+    cache = get_cache()
+    key = membership_key(conversation_id, user_id)
+    member = cache.get(key)
+    if member is None:
+        member = ConversationMember.objects.filter(
+            conversation_id=conversation_id,
+            user_id=user_id
+        ).exists()
+        cache.set(key, member, get_setting('TIMEOUT'))
+    return member
+
+
+async def ais_member(conversation_id, user_id):
+    """
+    Async variant of `is_member`; only touches the database on a cache miss.
+    """
+    member = await get_cache().aget(membership_key(conversation_id, user_id))
+    if member is None:
+        member = await database_sync_to_async(is_member)(conversation_id, user_id)
+    return member
+
+
+def invalidate(conversation_id, user_ids):
+    """
+    Forget cached answers for the given users in a conversation.
+
+    Entries are dropped immediately and again after commit, so a reader racing
+    the open transaction cannot leave a stale answer behind.
+    """
+    keys = [membership_key(conversation_id, user_id) for user_id in user_ids]
+    if not keys:
+        return
+    get_cache().delete_many(keys)
+    transaction.on_commit(lambda: get_cache().delete_many(keys))
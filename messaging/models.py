@@ -1,42 +1,207 @@
-import uuid
-from django.db import models
+import hashlib
+from collections import Counter, defaultdict
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from utils.ids import uuid7
+
 User = get_user_model()
 
 class Conversation(models.Model):
     """
     Represents a conversation between two or more users
+
+    `last_message` and `last_message_preview` are denormalized from the newest
+    message by `record_message`, so the inbox never has to look at the
+    messages table.
+
+    `participant_fingerprint` is a hash of the sorted participant ids, kept
+    unique so "find the conversation with exactly these people" is a single
+    indexed lookup and concurrent creations of the same chat cannot both win.
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    participants = models.ManyToManyField(User, related_name='conversations')
+    PREVIEW_LENGTH = 100
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    participants = models.ManyToManyField(
+        User,
+        through='ConversationMember',
+        related_name='conversations'
+    )
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True, default='')
+    participant_fingerprint = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            # Backs keyset pagination of the inbox on (updated_at, id).
+            models.Index(fields=['-updated_at', '-id'], name='conversation_updated_id_idx'),
+        ]
 
     def __str__(self):
         return f"Conversation {self.id}"
 
+    @staticmethod
+    def fingerprint_for(user_ids):
+        """
+        Return the canonical fingerprint of a set of participant ids.
+        """
+        canonical = ','.join(sorted({str(user_id) for user_id in user_ids}))
+        return hashlib.sha256(canonical.encode('ascii')).hexdigest()
+
+    def refresh_fingerprint(self):
+        """
+        Recompute the fingerprint from the current members and store it.
+
+        If another conversation already owns the resulting participant set, the
+        fingerprint is cleared instead: this conversation stays usable but is no
+        longer the canonical chat for that set.
+        """
+        user_ids = ConversationMember.objects.filter(conversation=self).values_list('user_id', flat=True)
+        fingerprint = self.fingerprint_for(user_ids) if user_ids else None
+        if fingerprint == self.participant_fingerprint:
+            return
+        try:
+            with transaction.atomic():
+                Conversation.objects.filter(pk=self.pk).update(participant_fingerprint=fingerprint)
+        except IntegrityError:
+            fingerprint = None
+            Conversation.objects.filter(pk=self.pk).update(participant_fingerprint=None)
+        self.participant_fingerprint = fingerprint
+
+    def record_message(self, message):
+        """
+        Account for a newly created message in this conversation.
+
+        Points `last_message` at it, refreshes the preview and `updated_at`, and
+        bumps the unread counter of every member except the sender; two UPDATEs
+        in total. Must run in the same transaction that created the message.
+        """
+        Conversation.record_messages([message])
+        self.last_message = message
+        self.last_message_preview = message.text[:self.PREVIEW_LENGTH]
+        self.updated_at = message.created_at
+
+    @classmethod
+    def record_messages(cls, messages):
+        """
+        Bulk counterpart of `record_message` for a batch of new messages.
+
+        Messages may span several conversations and must be given in creation
+        order. Each conversation touched costs two UPDATEs however many messages
+        it received: one for the last-message pointer, and one that bumps every
+        member's unread counter by the number of messages they did not send.
+        `messages_recorded` is sent once the transaction commits.
+        """
+        from messaging.signals import messages_recorded
+
+        latest = {}
+        sent = defaultdict(Counter)
+        for message in messages:
+            latest[message.conversation_id] = message
+            sent[message.conversation_id][message.sender_id] += 1
+
+        for conversation_id, message in latest.items():
+            cls.objects.filter(pk=conversation_id).update(
+                last_message=message,
+                last_message_preview=message.text[:cls.PREVIEW_LENGTH],
+                updated_at=message.created_at
+            )
+
+            per_sender = sent[conversation_id]
+            total = sum(per_sender.values())
+            increment = Case(
+                *[When(user_id=sender_id, then=Value(total - count)) for sender_id, count in per_sender.items()],
+                default=Value(total)
+            )
+            ConversationMember.objects.filter(
+                conversation_id=conversation_id
+            ).update(unread_count=F('unread_count') + increment)
+
+        messages = list(messages)
+        transaction.on_commit(lambda: messages_recorded.send_robust(sender=Message, messages=messages))
+
+    def mark_read(self, user):
+        """
+        Move the user's read watermark to the newest message in the conversation.
+
+        This is a single-row write regardless of how many messages were unread.
+        """
+        latest = Message.objects.filter(conversation=OuterRef('conversation')).order_by('-id')
+        ConversationMember.objects.filter(conversation=self, user=user).update(
+            last_read_at=timezone.now(),
+            last_read_message=Subquery(latest.values('id')[:1]),
+            unread_count=0
+        )
+
+
+class ConversationMember(models.Model):
+    """
+    Membership of a user in a conversation, carrying their read state.
+
+    `last_read_message` / `last_read_at` form the user's read watermark, and
+    `unread_count` is maintained alongside it so the inbox never has to count
+    messages.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_memberships')
+    joined_at = models.DateTimeField(auto_now_add=True)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    last_read_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='unique_conversation_member'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'conversation'], name='member_user_conversation_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} in {self.conversation_id}"
+
 class Message(models.Model):
     """
     Represents a single message within a conversation
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     text = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
-    read = models.BooleanField(default=False)
+    # Server-assigned; a default rather than auto_now_add so batched writes
+    # can hand out strictly increasing timestamps in arrival order.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
-        ordering = ['created_at']
+        ordering = ['id']
+        indexes = [
+            # Backs keyset pagination of a conversation's history; ids are
+            # time-ordered, so they sort chronologically on their own.
+            models.Index(fields=['conversation', 'id'], name='message_conv_id_idx'),
+        ]
 
     def __str__(self):
-        return f"Message from {self.sender.username} at {self.created_at}"
-
-    def mark_as_read(self):
-        self.read = True
-        self.save()
\ No newline at end of file
+        return f"Message from {self.sender.username} at {self.created_at}"
\ No newline at end of file
@@ -0,0 +1,108 @@
+from collections import OrderedDict
+
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from utils.pagination import KeysetPagination
+
+
+class ConversationCursorPagination(KeysetPagination):
+    """
+    Cursor pagination for the inbox, most recently active conversation first.
+    """
+    ordering = ('-updated_at', '-id')
+
+
+class MessageHistoryPagination(KeysetPagination):
+    """
+    Bidirectional cursor pagination over a conversation's history.
+
+    Without cursors the newest `limit` messages are returned. `before=<cursor>`
+    walks back into older history and `after=<cursor>` catches up on newer
+    messages; both may be combined to read a bounded window. Results are always
+    in chronological order.
+
+    The response carries a `before` link (null once the start of the history is
+    reached) and an `after` link pointing past the newest message seen, which
+    clients can keep polling for new messages.
+    """
+    # Message ids are time-ordered UUIDv7 (see utils.ids)
+    ordering = ('id',)
+    page_size_query_param = 'limit'
+    cursor_query_param = None
+    before_query_param = 'before'
+    after_query_param = 'after'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        limit = self.get_page_size(request)
+
+        before = self.decode_position(request.query_params.get(self.before_query_param))
+        after = self.decode_position(request.query_params.get(self.after_query_param))
+
+        if after is not None:
+            if before is not None:
+                before = self.coerce_position(queryset, before)
+                queryset = queryset.filter(self.build_seek_filter(before, reverse=True))
+            rows, has_more = self.fetch(queryset, after, False, limit)
+            self.has_older, self.has_newer = True, has_more
+        else:
+            rows, has_more = self.fetch(queryset, before, True, limit)
+            self.has_older, self.has_newer = has_more, before is not None
+
+        self.set_page(rows, after)
+        return rows
+
+    def paginate_buffered(self, request, rows, has_older):
+        """
+        Adopt an already fetched newest page (e.g. from the recent-message
+        buffer) so `get_paginated_response` can build links for it.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.has_older, self.has_newer = has_older, False
+        self.set_page(rows, None)
+        return rows
+
+    def set_page(self, rows, after):
+        self.page = rows
+        self.before_position = self.get_position(rows[0]) if rows else None
+        self.after_position = self.get_position(rows[-1]) if rows else after
+
+    def decode_position(self, token):
+        cursor = self.decode_cursor(token)
+        return cursor[0] if cursor else None
+
+    def get_position_link(self, query_param, position):
+        url = remove_query_param(self.base_url, self.before_query_param)
+        url = remove_query_param(url, self.after_query_param)
+        return replace_query_param(url, query_param, self.encode_cursor(position))
+
+    def get_before_link(self):
+        if not self.has_older or self.before_position is None:
+            return None
+        return self.get_position_link(self.before_query_param, self.before_position)
+
+    def get_after_link(self):
+        if self.after_position is None:
+            return None
+        return self.get_position_link(self.after_query_param, self.after_position)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('before', self.get_before_link()),
+            ('after', self.get_after_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'before': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'after': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
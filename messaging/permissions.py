@@ -1,8 +1,12 @@
 from rest_framework.permissions import BasePermission
 
+from messaging.membership import is_member
+
 class IsConversationParticipant(BasePermission):
     """
     Check if the user is a participant of the conversation
+
+    Uses the shared membership cache rather than loading every participant.
     """
     def has_object_permission(self, request, view, obj):
-        return request.user in obj.participants.all()
\ No newline at end of file
+        return is_member(obj.pk, request.user.pk)
\ No newline at end of file
@@ -0,0 +1,191 @@
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from datetime import timedelta
+from functools import partial
+from weakref import WeakKeyDictionary
+
+from channels.db import database_sync_to_async
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from messaging.models import Conversation, Message
+from messaging.recent import remember_messages
+from utils import app_settings
+
+DEFAULTS = {
+    # Flush once this many messages are pending...
+    'FLUSH_SIZE': 100,
+    # ...or once the oldest pending message has waited this long (seconds).
+    'FLUSH_INTERVAL': 0.005,
+    # Messages accepted but not yet written; senders wait beyond this.
+    'MAX_PENDING': 1000,
+    # How long a sender waits for room in a full queue before giving up.
+    'SUBMIT_TIMEOUT': 1.0,
+}
+
+
+get_setting = partial(app_settings.get_setting, 'MESSAGING_WRITE_BEHIND', DEFAULTS)
+
+
+class MessageQueueFull(Exception):
+    """
+    Raised when the write-behind queue stays full for longer than SUBMIT_TIMEOUT.
+    """
+
+
+@dataclass
+class PendingMessage:
+    conversation_id: object
+    sender: object
+    text: str
+    future: asyncio.Future = field(repr=False)
+
+
+_clock_lock = threading.Lock()
+_last_timestamp = None
+
+
+def monotonic_now():
+    """
+    Return `timezone.now()`, nudged forward so it never repeats or goes back.
+
+    Messages are ordered by their time-ordered ids, created in arrival order;
+    handing out strictly increasing timestamps keeps `created_at` agreeing
+    with them even when several messages land within the same microsecond.
+    """
+    global _last_timestamp
+    with _clock_lock:
+        now = timezone.now()
+        if _last_timestamp is not None and now <= _last_timestamp:
+            now = _last_timestamp + timedelta(microseconds=1)
+        _last_timestamp = now
+        return now
+
+
+def persist_messages(pending):
+    """
+    Write a batch of pending messages in one transaction.
+
+    Returns:
+        list: For each pending message, the saved Message or the exception that
+        prevented saving it.
+    """
+    messages = [
+        Message(
+            conversation_id=item.conversation_id,
+            sender=item.sender,
+            text=item.text,
+            created_at=monotonic_now()
+        )
+        for item in pending
+    ]
+
+    try:
+        with transaction.atomic():
+            Message.objects.bulk_create(messages)
+            Conversation.record_messages(messages)
+        results = messages
+    except IntegrityError:
+        # Typically a conversation deleted under us; don't let one bad message
+        # fail the whole batch, retry them one by one.
+        results = []
+        for message in messages:
+            try:
+                with transaction.atomic():
+                    message.save(force_insert=True)
+                    Conversation.record_messages([message])
+                results.append(message)
+            except IntegrityError as exc:
+                results.append(exc)
+
+    remember_messages([message for message in results if isinstance(message, Message)])
+    return results
+
+
+class MessageWriteQueue:
+    """
+    Write-behind queue batching chat messages into bulk inserts.
+
+    Consumers `submit` messages and await the saved row. A single flusher task
+    collects messages for up to FLUSH_INTERVAL seconds or FLUSH_SIZE messages,
+    writes them with one `bulk_create` in one transaction, then resolves every
+    waiter. Batches are written strictly one after another in arrival order, so
+    ordering within a conversation is preserved. When MAX_PENDING messages are
+    waiting, `submit` blocks, and raises MessageQueueFull after SUBMIT_TIMEOUT.
+
+    One queue exists per event loop (i.e. per ASGI worker); use `get_write_queue`.
+    """
+
+    def __init__(self, flush_size=None, flush_interval=None, max_pending=None, submit_timeout=None):
+        self.flush_size = flush_size or get_setting('FLUSH_SIZE')
+        self.flush_interval = flush_interval if flush_interval is not None else get_setting('FLUSH_INTERVAL')
+        self.submit_timeout = submit_timeout if submit_timeout is not None else get_setting('SUBMIT_TIMEOUT')
+        self.queue = asyncio.Queue(maxsize=max_pending or get_setting('MAX_PENDING'))
+        self.task = None
+
+    async def submit(self, conversation_id, sender, text):
+        """
+        Queue a message and wait until it has been committed.
+
+        Returns:
+            Message: The saved message, with server-assigned id and created_at.
+
+        Raises:
+            MessageQueueFull: If the queue stayed full for SUBMIT_TIMEOUT seconds.
+            IntegrityError: If the message could not be stored.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        item = PendingMessage(conversation_id, sender, text, loop.create_future())
+        try:
+            await asyncio.wait_for(self.queue.put(item), self.submit_timeout)
+        except asyncio.TimeoutError:
+            raise MessageQueueFull('Too many messages pending, try again shortly.')
+        return await item.future
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.flush_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self.flush(batch)
+
+    async def flush(self, batch):
+        try:
+            results = await database_sync_to_async(persist_messages)(batch)
+        except Exception as exc:
+            results = [exc] * len(batch)
+
+        for item, result in zip(batch, results):
+            if item.future.done():
+                continue
+            if isinstance(result, Exception):
+                item.future.set_exception(result)
+            else:
+                item.future.set_result(result)
+
+
+_queues = WeakKeyDictionary()
+
+
+def get_write_queue():
+    """
+    Return the write-behind queue bound to the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _queues:
+        _queues[loop] = MessageWriteQueue()
+    return _queues[loop]
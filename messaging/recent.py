@@ -0,0 +1,206 @@
+import threading
+from collections import OrderedDict, deque
+from functools import partial
+
+from messaging.models import Message
+from utils import app_settings
+
+DEFAULTS = {
+    # Newest messages kept per conversation.
+    'PER_CONVERSATION': 50,
+    # Approximate upper bound on memory held by all buffers, in bytes.
+    'MAX_BYTES': 32 * 1024 * 1024,
+    # Most messages replayed to a reconnecting socket.
+    'REPLAY_LIMIT': 500,
+}
+
+# Rough per-message overhead of a Message with its sender and profile loaded,
+# on top of the text itself.
+ENTRY_OVERHEAD = 2048
+
+
+get_setting = partial(app_settings.get_setting, 'MESSAGING_RECENT_BUFFER', DEFAULTS)
+
+
+def entry_size(message):
+    return ENTRY_OVERHEAD + len(message.text)
+
+
+class ConversationBuffer:
+    """
+    The newest messages of one conversation, oldest first.
+
+    `complete` is True when the buffer holds the conversation's entire history,
+    i.e. there is nothing older in the database.
+    """
+
+    def __init__(self, capacity, complete):
+        self.messages = deque(maxlen=capacity)
+        self.complete = complete
+        self.size = 0
+
+    def append(self, message):
+        if len(self.messages) == self.messages.maxlen:
+            self.size -= entry_size(self.messages[0])
+            self.complete = False
+        self.messages.append(message)
+        self.size += entry_size(message)
+
+    @property
+    def newest_id(self):
+        return self.messages[-1].id if self.messages else None
+
+
+class RecentMessageBuffer:
+    """
+    Process-local ring buffers of the newest messages of active conversations.
+
+    Serves the first history page and WebSocket reconnect replay from memory.
+    Buffers are evicted least-recently-used first once MAX_BYTES is exceeded.
+
+    A buffer is only trusted when its newest message is still the
+    conversation's `last_message` (a cheap primary-key read), so messages
+    written by other processes never leave a stale page behind: the buffer is
+    dropped and the database answers instead.
+    """
+
+    def __init__(self, per_conversation=None, max_bytes=None):
+        self.per_conversation = per_conversation or get_setting('PER_CONVERSATION')
+        self.max_bytes = max_bytes or get_setting('MAX_BYTES')
+        self.lock = threading.Lock()
+        self.buffers = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def prime(self, conversation_id, messages, complete):
+        """
+        Seed a conversation's buffer with its newest messages, oldest first.
+
+        Args:
+            conversation_id: Conversation the messages belong to.
+            messages (list): Newest messages, with sender and profile loaded.
+            complete (bool): True if there are no older messages.
+        """
+        buffer = ConversationBuffer(self.per_conversation, complete)
+        for message in messages:
+            buffer.append(message)
+        if len(messages) > self.per_conversation:
+            buffer.complete = False
+
+        with self.lock:
+            self.discard_locked(conversation_id)
+            self.buffers[conversation_id] = buffer
+            self.size += buffer.size
+            self.evict_locked()
+
+    def append(self, messages):
+        """
+        Add newly committed messages to the buffers of their conversations.
+
+        Conversations without a buffer are skipped: a partial buffer could not
+        answer a page on its own.
+        """
+        with self.lock:
+            for message in messages:
+                buffer = self.buffers.get(message.conversation_id)
+                if buffer is None:
+                    continue
+                self.size -= buffer.size
+                buffer.append(message)
+                self.size += buffer.size
+                self.buffers.move_to_end(message.conversation_id)
+            self.evict_locked()
+
+    def is_buffered(self, conversation_id):
+        return conversation_id in self.buffers
+
+    def latest(self, conversation_id, limit, last_message_id):
+        """
+        Return the newest `limit` messages, oldest first, if the buffer can.
+
+        Returns:
+            tuple | None: ``(messages, has_older)``, or None on a miss.
+        """
+        with self.lock:
+            buffer = self.get_locked(conversation_id, last_message_id)
+            if buffer is None or (len(buffer.messages) < limit and not buffer.complete):
+                self.misses += 1
+                return None
+            self.hits += 1
+            messages = list(buffer.messages)[-limit:]
+            has_older = len(buffer.messages) > limit or not buffer.complete
+            return messages, has_older
+
+    def since(self, conversation_id, message_id, last_message_id):
+        """
+        Return the messages newer than `message_id`, oldest first, if buffered.
+
+        Returns:
+            list | None: Messages after `message_id`, or None on a miss.
+        """
+        with self.lock:
+            buffer = self.get_locked(conversation_id, last_message_id)
+            if buffer is not None:
+                messages = list(buffer.messages)
+                for index, message in enumerate(messages):
+                    if str(message.id) == str(message_id):
+                        self.hits += 1
+                        return messages[index + 1:]
+            self.misses += 1
+            return None
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'conversations': len(self.buffers),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.buffers.clear()
+            self.size = 0
+
+    def get_locked(self, conversation_id, last_message_id):
+        buffer = self.buffers.get(conversation_id)
+        if buffer is None:
+            return None
+        if buffer.newest_id != last_message_id:
+            # Someone else wrote to this conversation; don't trust the buffer
+            self.discard_locked(conversation_id)
+            return None
+        self.buffers.move_to_end(conversation_id)
+        return buffer
+
+    def discard_locked(self, conversation_id):
+        buffer = self.buffers.pop(conversation_id, None)
+        if buffer is not None:
+            self.size -= buffer.size
+
+    def evict_locked(self):
+        while self.size > self.max_bytes and self.buffers:
+            _, buffer = self.buffers.popitem(last=False)
+            self.size -= buffer.size
+
+
+recent_messages = RecentMessageBuffer()
+
+
+def remember_messages(messages):
+    """
+    Warm the buffers with freshly committed messages.
+
+    Only messages of already buffered conversations are kept; they are
+    reloaded with sender and profile in one query so buffered entries never
+    trigger lazy loads when served.
+    """
+    ids = [message.id for message in messages if recent_messages.is_buffered(message.conversation_id)]
+    if not ids:
+        return
+    loaded = Message.objects.filter(pk__in=ids).select_related('sender__userprofile').in_bulk()
+    recent_messages.append([loaded[pk] for pk in ids if pk in loaded])
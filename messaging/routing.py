@@ -0,0 +1,7 @@
+from django.urls import path
+
+from messaging.consumers import ChatConsumer
+
+websocket_urlpatterns = [
+    path('ws/messages/conversations/<uuid:conversation_id>/', ChatConsumer.as_asgi()),
+]
@@ -1,39 +1,132 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
-from messaging.models import Conversation, Message
+from messaging.models import Conversation, ConversationMember, Message
 from user_profile.serializers import ProfileSerializer
+from utils.dynamic_fields import DynamicFieldsMixin
+from utils.fast_serializers import FastNested, FastValue
 
 from django.contrib.auth import get_user_model
 User = get_user_model()  # Add this at the top
 
-class MessageSerializer(serializers.ModelSerializer):
-    sender = ProfileSerializer(read_only=True)
+
+def participants_prefetch():
+    """
+    Prefetch participants together with their profiles in a single query.
+    """
+    return Prefetch('participants', queryset=User.objects.select_related('userprofile'))
+
+
+class MessageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    sender = ProfileSerializer(source='sender.userprofile', read_only=True)
+
+    expandable_fields = ('sender',)
 
     class Meta:
         model = Message
-        fields = ['id', 'sender', 'text', 'created_at', 'read']
+        fields = ['id', 'sender', 'text', 'created_at']
         read_only_fields = ['id', 'sender', 'created_at']
 
-
-class ConversationSerializer(serializers.ModelSerializer):
-    participants = ProfileSerializer(many=True, read_only=True)
+    @classmethod
+    def optimize_queryset(cls, queryset, fields=None, expand=None):
+        """
+        Join the sender's profile only when it is rendered in full.
+        """
+        if cls.wants(fields, 'sender') and cls.expanded(expand, 'sender'):
+            queryset = queryset.select_related('sender__userprofile')
+        if fields is not None:
+            # Ordering columns and the sender id are always needed
+            columns = {'id', 'created_at', 'sender'}
+            if 'text' in fields:
+                columns.add('text')
+            queryset = queryset.only(*columns)
+        return queryset
+
+
+class ConversationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    participants = serializers.SerializerMethodField()
     last_message = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()
 
+    expandable_fields = ('participants', 'last_message')
+
+    # Compiled list rendering (see utils.fast_serializers); the unread count is
+    # the inbox annotation. Participants have no equivalent, so only requests
+    # leaving them out take the fast path.
+    fast_fields = {
+        'get_last_message': FastNested(MessageSerializer, 'last_message'),
+        'get_unread_count': FastValue('member_unread_count'),
+    }
+
     class Meta:
         model = Conversation
-        fields = ['id', 'participants', 'created_at', 'updated_at', 'last_message', 'unread_count']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = [
+            'id', 'participants', 'created_at', 'updated_at',
+            'last_message', 'last_message_preview', 'unread_count'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at', 'last_message_preview']
+
+    @classmethod
+    def optimize_queryset(cls, queryset, fields=None, expand=None):
+        """
+        Join the last message and prefetch participants only as far as the
+        output renders them; collapsed participants prefetch bare ids.
+        """
+        if cls.wants(fields, 'last_message') and cls.expanded(expand, 'last_message'):
+            message_fields = cls.subspec(fields, 'last_message')
+            message_expand = cls.subexpand(expand, 'last_message')
+            if cls.wants(message_fields, 'sender') and cls.expanded(message_expand, 'sender'):
+                queryset = queryset.select_related('last_message__sender__userprofile')
+            else:
+                queryset = queryset.select_related('last_message')
+
+        if cls.wants(fields, 'participants'):
+            if cls.expanded(expand, 'participants'):
+                queryset = queryset.prefetch_related(participants_prefetch())
+            else:
+                queryset = queryset.prefetch_related(
+                    Prefetch('participants', queryset=User.objects.only('id'))
+                )
+        return queryset
+
+    def get_collapsed_field(self, name):
+        if name == 'participants':
+            return serializers.SerializerMethodField(method_name='get_participant_ids')
+        return super().get_collapsed_field(name)
+
+    def get_participants(self, obj):
+        # Participants are users; render their profiles (prefetched by the views)
+        profiles = [user.userprofile for user in obj.participants.all()]
+        return ProfileSerializer(
+            profiles,
+            many=True,
+            context=self.context,
+            **self.nested_options('participants')
+        ).data
+
+    def get_participant_ids(self, obj):
+        return [user.pk for user in obj.participants.all()]
 
     def get_last_message(self, obj):
-        last_message = obj.messages.last()
-        if last_message:
-            return MessageSerializer(last_message).data
+        # Denormalized pointer maintained by Conversation.record_message
+        if obj.last_message_id:
+            return MessageSerializer(
+                obj.last_message,
+                context=self.context,
+                **self.nested_options('last_message')
+            ).data
         return None
 
     def get_unread_count(self, obj):
+        # Annotated by the inbox query; fall back to the member row otherwise
+        if getattr(obj, 'member_unread_count', None) is not None:
+            return obj.member_unread_count
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.messages.filter(read=False).exclude(sender=request.user).count()
+            return ConversationMember.objects.filter(
+                conversation=obj,
+                user=request.user
+            ).values_list('unread_count', flat=True).first() or 0
         return 0
 
 
@@ -58,19 +151,20 @@ class ConversationCreateSerializer(serializers.ModelSerializer):
         current_user = self.context['request'].user
 
         # Get all participants including current user
-        participants = User.objects.filter(id__in=participant_ids)
-        participants = list(participants) + [current_user]
-
-        # Check if conversation already exists with exactly these participants
-        existing_conversation = None
-        for conv in Conversation.objects.all():
-            if set(conv.participants.all()) == set(participants):
-                existing_conversation = conv
-                break
+        participants = list(User.objects.filter(id__in=participant_ids).exclude(id=current_user.id))
+        participants.append(current_user)
+        fingerprint = Conversation.fingerprint_for(user.id for user in participants)
 
+        # Reuse the conversation with exactly these participants, if any
+        existing_conversation = Conversation.objects.filter(participant_fingerprint=fingerprint).first()
         if existing_conversation:
             return existing_conversation
 
-        conversation = Conversation.objects.create()
-        conversation.participants.set(participants)
-        return conversation
\ No newline at end of file
+        try:
+            with transaction.atomic():
+                conversation = Conversation.objects.create(participant_fingerprint=fingerprint)
+                conversation.participants.set(participants)
+        except IntegrityError:
+            # Lost a race with a concurrent request creating the same chat
+            return Conversation.objects.get(participant_fingerprint=fingerprint)
+        return conversation
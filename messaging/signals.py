@@ -1,21 +1,56 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from messaging.models import Message
-from notifications.models import Notification  # Assuming you have a notifications app
-
-
-@receiver(post_save, sender=Message)
-def create_message_notification(sender, instance, created, **kwargs):
-    if created:
-        conversation = instance.conversation
-        sender = instance.sender
-
-        for participant in conversation.participants.all():
-            if participant != sender:
-                Notification.objects.create(
-                    recipient=participant,
-                    actor=sender,
-                    verb='sent you a message',
-                    target=conversation,
-                    description=instance.text[:50]  # First 50 chars of message
-                )
\ No newline at end of file
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+from messaging import membership
+from messaging.models import Conversation, ConversationMember
+
+# Sent once a batch of new messages has been committed, with `messages` in
+# creation order. Receivers run on the write path, so they should batch work.
+messages_recorded = Signal()
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def sync_participants_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # Keep cached membership answers and the participant fingerprint in step
+    # with participants.add()/remove()/set()/clear() from either side.
+    if action == 'pre_clear':
+        # clear() does not report what it removed; remember it for post_clear
+        if reverse:
+            instance._cleared_conversation_ids = list(
+                ConversationMember.objects.filter(user=instance).values_list('conversation_id', flat=True)
+            )
+        else:
+            instance._cleared_user_ids = list(
+                ConversationMember.objects.filter(conversation=instance).values_list('user_id', flat=True)
+            )
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # Changed from the user side (user.conversations.add(...))
+        if action == 'post_clear':
+            pk_set = getattr(instance, '_cleared_conversation_ids', None)
+        conversations = Conversation.objects.filter(pk__in=pk_set) if pk_set else []
+        for conversation in conversations:
+            membership.invalidate(conversation.pk, [instance.pk])
+    else:
+        if action == 'post_clear':
+            pk_set = getattr(instance, '_cleared_user_ids', None)
+        membership.invalidate(instance.pk, pk_set or [])
+        conversations = [instance]
+
+    for conversation in conversations:
+        conversation.refresh_fingerprint()
+
+
+@receiver(post_save, sender=ConversationMember)
+@receiver(post_delete, sender=ConversationMember)
+def sync_member_change(sender, instance, **kwargs):
+    # Only membership rows created or removed one at a time land here;
+    # read-state updates go through queryset.update() and skip signals.
+    if kwargs.get('created', True):
+        membership.invalidate(instance.conversation_id, [instance.user_id])
+        conversation = Conversation.objects.filter(pk=instance.conversation_id).first()
+        if conversation:
+            conversation.refresh_fingerprint()
@@ -1,3 +1,371 @@
-from django.test import TestCase
+import asyncio
+import base64
+import contextlib
+import json
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from messaging import persistence
+from messaging.consumers import ChatConsumer
+from messaging.models import Conversation, ConversationMember, Message
+from messaging.pagination import MessageHistoryPagination
+from messaging.persistence import MessageQueueFull, MessageWriteQueue
+from messaging.recent import RecentMessageBuffer, entry_size, recent_messages
+from messaging.serializers import ConversationSerializer
+from messaging.views import ConversationListView, UserSearchView
+from user_profile.models import UserProfile
+from utils.fast_serializers import compile_serializer
+from utils.ids import uuid7
+
+User = get_user_model()
+
+
+class FastListTests(TestCase):
+    """
+    The compiled list paths must render the same bytes as the serializers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f'member{i}', email=f'member{i}@example.com', password='secret')
+            for i in range(6)
+        ]
+        for user in cls.users:
+            UserProfile.objects.get_or_create(user=user)
+        UserProfile.objects.filter(user=cls.users[1]).update(profile_pic='profile_pics/pic.png', bio='bïo')
+
+    def setUp(self):
+        self.client = APIClient()
+        token, _ = Token.objects.get_or_create(user=self.users[0])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def assert_identical(self, view, url):
+        view.fast_list = False
+        try:
+            regular = self.client.get(url)
+        finally:
+            view.fast_list = True
+        fast = self.client.get(url)
+        self.assertEqual(regular.status_code, 200)
+        self.assertEqual(regular.content, fast.content, url)
+        self.assertEqual(regular.get('ETag'), fast.get('ETag'), url)
+
+    def test_participants_are_not_compiled(self):
+        self.assertIsNone(compile_serializer(ConversationSerializer))
+        self.assertIsNotNone(compile_serializer(ConversationSerializer, {'id': None, 'last_message': None}))
+
+    def test_conversation_list_is_byte_identical(self):
+        for i, user in enumerate(self.users[1:]):
+            response = self.client.post(
+                '/api/messages/conversations/', {'participant_ids': [str(user.pk)]}, format='json'
+            )
+            if i % 2:
+                self.client.post(
+                    f"/api/messages/conversations/{response.json()['id']}/messages/",
+                    {'text': f'hello {i}'},
+                    format='json'
+                )
+        for url in [
+            '/api/messages/conversations/?fields=id,last_message,unread_count,updated_at',
+            '/api/messages/conversations/?fields=id,last_message&expand=last_message.sender',
+            '/api/messages/conversations/?fields=id,last_message&expand=last_message',
+        ]:
+            self.assert_identical(ConversationListView, url)
+
+    def test_user_search_is_byte_identical(self):
+        for url in [
+            '/api/messages/users/search/?q=member',
+            '/api/messages/users/search/?q=member1&fields=username,profile_pic',
+            '/api/messages/users/search/?q=nobody',
+        ]:
+            self.assert_identical(UserSearchView, url)
+
+
+class ConversationDetailTests(TestCase):
+    """
+    Conversations are only visible to their participants; everyone else
+    cannot tell them from missing ones.
+    """
+
+    def setUp(self):
+        self.member, self.other, self.outsider = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='secret')
+            for name in ('member', 'other', 'outsider')
+        ]
+        for user in (self.member, self.other, self.outsider):
+            UserProfile.objects.get_or_create(user=user)
+        self.conversation_id = self.client_for(self.member).post(
+            '/api/messages/conversations/', {'participant_ids': [str(self.other.pk)]}, format='json'
+        ).json()['id']
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.get_or_create(user=user)[0].key}')
+        return client
+
+    def test_members_see_the_conversation(self):
+        response = self.client_for(self.other).get(f'/api/messages/conversations/{self.conversation_id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_non_members_get_not_found(self):
+        client = self.client_for(self.outsider)
+        existing = client.get(f'/api/messages/conversations/{self.conversation_id}/')
+        missing = client.get(f'/api/messages/conversations/{uuid4()}/')
+        self.assertEqual((existing.status_code, missing.status_code), (404, 404))
+        self.assertEqual(existing.json(), missing.json())
+
+    def test_forged_cursors_are_not_found(self):
+        client = self.client_for(self.member)
+        urls = [
+            ('/api/messages/conversations/', 'cursor'),
+            (f'/api/messages/conversations/{self.conversation_id}/messages/', 'before'),
+            (f'/api/messages/conversations/{self.conversation_id}/messages/', 'after'),
+        ]
+        for url, param in urls:
+            for value in ('nope', None, {'a': 1}):
+                position = [value] * (2 if param == 'cursor' else 1)
+                payload = json.dumps({'p': position, 'r': 0}).encode()
+                cursor = base64.urlsafe_b64encode(payload).decode().rstrip('=')
+                response = client.get(url, {param: cursor})
+                self.assertEqual(response.status_code, 404, (url, param, value))
+
+
+class MessageWriteQueueTests(TransactionTestCase):
+    """
+    The write-behind queue batches messages, keeps their order and isolates
+    the ones that cannot be stored.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='sender', email='sender@example.com', password='secret')
+        self.conversation = Conversation.objects.create()
+        ConversationMember.objects.create(conversation=self.conversation, user=self.user)
+        self.batches = []
+        persist = persistence.persist_messages
+
+        def record(pending):
+            self.batches.append(len(pending))
+            return persist(pending)
+
+        patcher = mock.patch.object(persistence, 'persist_messages', record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def submit_all(self, queue, texts, conversation_id=None):
+        conversation_id = conversation_id or self.conversation.pk
+        return asyncio.gather(
+            *[queue.submit(conversation_id, self.user, text) for text in texts],
+            return_exceptions=True
+        )
+
+    async def stop(self, queue):
+        queue.task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await queue.task
+
+    async def test_batches_by_size_and_interval(self):
+        queue = MessageWriteQueue(flush_size=3, flush_interval=0.05)
+        await self.submit_all(queue, [f'm{i}' for i in range(7)])
+        self.assertEqual(self.batches, [3, 3, 1])
+        await self.stop(queue)
+
+        queue = MessageWriteQueue(flush_size=100, flush_interval=0.05)
+        await self.submit_all(queue, [f'n{i}' for i in range(5)])
+        self.assertEqual(self.batches[3:], [5])
+        await self.stop(queue)
+
+    async def test_preserves_order_within_a_conversation(self):
+        queue = MessageWriteQueue(flush_size=4, flush_interval=0.01)
+        texts = [f'm{i}' for i in range(10)]
+        saved = await self.submit_all(queue, texts)
+        self.assertEqual([message.text for message in saved], texts)
+
+        stored = [
+            (message.text, message.created_at)
+            async for message in Message.objects.filter(conversation=self.conversation).order_by('id')
+        ]
+        self.assertEqual([text for text, _ in stored], texts)
+        self.assertEqual(sorted(stored, key=lambda row: row[1]), stored)
+        await self.stop(queue)
+
+    async def test_full_queue_raises(self):
+        queue = MessageWriteQueue(max_pending=1, submit_timeout=0.01)
+        # A stalled flusher: nothing is taken off the queue
+        queue.task = asyncio.get_running_loop().create_future()
+        queue.queue.put_nowait(None)
+        with self.assertRaises(MessageQueueFull):
+            await queue.submit(self.conversation.pk, self.user, 'hello')
+        self.assertEqual(self.batches, [])
+
+    async def test_bad_row_does_not_fail_the_batch(self):
+        queue = MessageWriteQueue(flush_size=3, flush_interval=0.05)
+        results = await asyncio.gather(
+            queue.submit(self.conversation.pk, self.user, 'first'),
+            queue.submit(uuid4(), self.user, 'orphan'),
+            queue.submit(self.conversation.pk, self.user, 'last'),
+            return_exceptions=True
+        )
+        self.assertEqual(self.batches, [3])
+        self.assertIsInstance(results[1], IntegrityError)
+        self.assertEqual([results[0].text, results[2].text], ['first', 'last'])
+        texts = [text async for text in Message.objects.order_by('id').values_list('text', flat=True)]
+        self.assertEqual(texts, ['first', 'last'])
+        await self.stop(queue)
+
+    async def test_consumer_reports_failures_and_stays_open(self):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), f'/ws/chat/{self.conversation.pk}/')
+        communicator.scope['user'] = self.user
+        communicator.scope['url_route'] = {'kwargs': {'conversation_id': str(self.conversation.pk)}}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        queue = mock.Mock(submit=mock.AsyncMock(side_effect=RuntimeError('boom')))
+        with mock.patch('messaging.consumers.get_write_queue', return_value=queue), \
+                self.assertLogs('messaging.consumers', 'ERROR'):
+            await communicator.send_json_to({'message': 'hello', 'client_id': 'c1'})
+            frame = await communicator.receive_json_from()
+        self.assertEqual(frame, {'type': 'error', 'client_id': 'c1', 'error': 'Message could not be saved.'})
+
+        await communicator.send_json_to({'message': 'again', 'client_id': 'c2'})
+        self.assertEqual((await communicator.receive_json_from())['type'], 'ack')
+        await communicator.disconnect()
+
+
+class RecentMessageBufferTests(SimpleTestCase):
+    """
+    Buffers keep the newest messages of the most recently used conversations.
+    """
+
+    def messages(self, conversation_id, count):
+        return [Message(id=uuid7(), conversation_id=conversation_id, text=f'm{i}') for i in range(count)]
+
+    def test_evicts_least_recently_used(self):
+        first, second, third = [self.messages(uuid4(), 2) for _ in range(3)]
+        buffers = RecentMessageBuffer(per_conversation=5, max_bytes=5 * entry_size(first[0]))
+        for messages in (first, second):
+            buffers.prime(messages[0].conversation_id, messages, complete=True)
+        # Touching the first conversation makes the second the oldest
+        self.assertIsNotNone(buffers.latest(first[0].conversation_id, 2, first[-1].id))
+
+        buffers.prime(third[0].conversation_id, third, complete=True)
+        self.assertTrue(buffers.is_buffered(first[0].conversation_id))
+        self.assertFalse(buffers.is_buffered(second[0].conversation_id))
+        self.assertEqual(buffers.stats()['bytes'], 4 * entry_size(first[0]))
+
+        buffers.append(self.messages(third[0].conversation_id, 4)[2:])
+        self.assertFalse(buffers.is_buffered(first[0].conversation_id))
+        self.assertLessEqual(buffers.stats()['bytes'], buffers.max_bytes)
+
+    def test_since_misses_once_the_anchor_is_gone(self):
+        conversation_id = uuid4()
+        messages = self.messages(conversation_id, 5)
+        buffers = RecentMessageBuffer(per_conversation=3)
+        buffers.prime(conversation_id, messages[:3], complete=True)
+        buffers.append(messages[3:])
+
+        self.assertIsNone(buffers.since(conversation_id, messages[0].id, messages[-1].id))
+        self.assertEqual(buffers.since(conversation_id, messages[2].id, messages[-1].id), messages[3:])
+        # A newer message written elsewhere invalidates the buffer
+        self.assertIsNone(buffers.since(conversation_id, messages[2].id, uuid7()))
+        self.assertFalse(buffers.is_buffered(conversation_id))
+
+
+class MessageHistoryBufferTests(TestCase):
+    """
+    The first history page served from the buffer is the page the database
+    would serve.
+    """
+
+    def setUp(self):
+        recent_messages.clear()
+        self.addCleanup(recent_messages.clear)
+        self.user, other = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='secret')
+            for name in ('reader', 'writer')
+        ]
+        for user in (self.user, other):
+            UserProfile.objects.get_or_create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        conversation_id = self.client.post(
+            '/api/messages/conversations/', {'participant_ids': [str(other.pk)]}, format='json'
+        ).json()['id']
+        self.url = f'/api/messages/conversations/{conversation_id}/messages/'
+        for i in range(5):
+            self.send(f'm{i}')
+
+    def send(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(self.url, {'text': text}).status_code, 201)
+
+    def page(self):
+        response = self.client.get(self.url, {'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_buffered_page_matches_database_page(self):
+        from_database = self.page()
+        hits = recent_messages.hits
+        self.assertEqual(self.page(), from_database)
+        self.assertEqual(recent_messages.hits, hits + 1)
+
+        # New messages are appended to the buffer rather than invalidating it
+        self.send('m5')
+        buffered = self.page()
+        self.assertEqual(recent_messages.hits, hits + 2)
+        recent_messages.clear()
+        self.assertEqual(buffered, self.page())
+        self.assertEqual([row['text'] for row in buffered['results']], ['m3', 'm4', 'm5'])
+
+
+@override_settings(MESSAGING_RECENT_BUFFER={'REPLAY_LIMIT': 2})
+class ReplayTests(TransactionTestCase):
+    """
+    Reconnecting sockets replay what they missed, and are told when the gap
+    is longer than REPLAY_LIMIT.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='secret')
+        UserProfile.objects.get_or_create(user=self.user)
+        self.conversation = Conversation.objects.create()
+        ConversationMember.objects.create(conversation=self.conversation, user=self.user)
+        self.messages = [
+            Message.objects.create(conversation=self.conversation, sender=self.user, text=f'm{i}')
+            for i in range(4)
+        ]
+        Conversation.record_messages(self.messages)
+
+    async def replay(self, since):
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f'/ws/chat/{self.conversation.pk}/?since={since.pk}'
+        )
+        communicator.scope['user'] = self.user
+        communicator.scope['url_route'] = {'kwargs': {'conversation_id': str(self.conversation.pk)}}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        frames = []
+        while not await communicator.receive_nothing(0.05):
+            frames.append(await communicator.receive_json_from())
+        await communicator.disconnect()
+        return frames
+
+    async def test_short_gap_is_replayed_whole(self):
+        frames = await self.replay(self.messages[1])
+        self.assertEqual([frame['message'] for frame in frames], ['m2', 'm3'])
+
+    async def test_long_gap_signals_more(self):
+        frames = await self.replay(self.messages[0])
+        self.assertEqual([frame.get('message') for frame in frames[:2]], ['m1', 'm2'])
+        self.assertEqual(frames[2]['type'], 'replay_truncated')
+
+        paginator = MessageHistoryPagination()
+        self.assertEqual(paginator.decode_position(frames[2]['after']), [str(self.messages[2].pk)])
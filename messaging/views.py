@@ -1,23 +1,48 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
 from rest_framework import generics, status
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
-from django.shortcuts import get_object_or_404
-
-from messaging.models import Conversation, Message
+from django.db import transaction
+from django.contrib.auth import get_user_model
+from django.db.models import Case, OuterRef, Subquery, Value, When
+
+from auth_user.search import search_user_ids
+from messaging.consumers import chat_message_event, conversation_group_name
+from messaging.membership import is_member
+from messaging.models import Conversation, ConversationMember, Message
+from messaging.pagination import ConversationCursorPagination, MessageHistoryPagination
+from messaging.permissions import IsConversationParticipant
+from messaging.recent import recent_messages, remember_messages
 from messaging.serializers import (
     ConversationSerializer,
     ConversationCreateSerializer,
     MessageSerializer
 )
 from user_profile.serializers import ProfileSerializer
+from utils.conditional import ConditionalMixin
+from utils.dynamic_fields import DynamicFieldsViewMixin
+from utils.fast_serializers import FastListMixin
+
+User = get_user_model()
 
 
-class ConversationListView(generics.ListCreateAPIView):
+class ConversationListView(FastListMixin, ConditionalMixin, DynamicFieldsViewMixin, generics.ListCreateAPIView):
     """
     List all conversations for the current user or create a new conversation
+
+    The inbox is keyset paginated on `updated_at` and renders in a constant
+    number of queries: one for the page (last message, sender profile and
+    unread count joined in) and one for the participants. Conditional requests
+    are answered from those rows before anything is serialized. `?fields=` and
+    `?expand=` trim both the output and those queries (see DynamicFieldsMixin);
+    pages leaving out the participants are rendered from a single values()
+    query (see FastListMixin).
     """
     permission_classes = [IsAuthenticated]
+    pagination_class = ConversationCursorPagination
+    fast_list_columns = ('last_message_id', 'member_unread_count')
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -26,12 +51,47 @@ class ConversationListView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return Conversation.objects.filter(participants=user).prefetch_related('participants', 'messages')
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True, context={'request': request})
-        return Response(serializer.data)
+        membership = ConversationMember.objects.filter(conversation=OuterRef('pk'), user=user)
+        return self.optimize_queryset(Conversation.objects.filter(
+            participants=user
+        ).annotate(
+            member_unread_count=Subquery(membership.values('unread_count')[:1])
+        ))
+
+    def get_list_validators(self, rows):
+        """
+        ETag of an inbox page: each conversation's activity, the caller's
+        unread count and the participants' profile versions, plus whether
+        neighbouring pages exist.
+
+        Rows are conversations, or values() dicts on the fast path (which never
+        renders participants).
+        """
+        parts = [self.request.user.pk]
+        for conversation in rows:
+            if isinstance(conversation, dict):
+                parts.append((
+                    conversation['id'],
+                    conversation['updated_at'],
+                    conversation['last_message_id'],
+                    conversation['member_unread_count'],
+                    ()
+                ))
+                continue
+            # Participants are only loaded (with profiles) when rendered
+            participants = getattr(conversation, '_prefetched_objects_cache', {}).get('participants', ())
+            parts.append((
+                conversation.pk,
+                conversation.updated_at,
+                conversation.last_message_id,
+                conversation.member_unread_count,
+                tuple(
+                    (user.pk, user.userprofile.version if User.userprofile.is_cached(user) else None)
+                    for user in participants
+                )
+            ))
+        parts.append((self.paginator.has_next, self.paginator.has_previous))
+        return parts, None
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -43,67 +103,138 @@ class ConversationListView(generics.ListCreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class ConversationDetailView(generics.RetrieveAPIView):
+class ConversationDetailView(DynamicFieldsViewMixin, generics.RetrieveAPIView):
     """
     Retrieve a single conversation with all its messages
+
+    Membership is checked against the shared membership cache instead of
+    joining through the participants. Non-members get the same 404 as for a
+    conversation that does not exist, so ids cannot be probed.
     """
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsConversationParticipant]
     serializer_class = ConversationSerializer
 
     def get_queryset(self):
-        user = self.request.user
-        return Conversation.objects.filter(participants=user)
+        return self.optimize_queryset(Conversation.objects.all())
 
     def get_object(self):
+        """
+        Raises:
+            NotFound: If the conversation does not exist or the requester is
+                not a participant.
+        """
+        if not is_member(self.kwargs[self.lookup_field], self.request.user.pk):
+            raise NotFound('Conversation not found.')
         conversation = super().get_object()
 
-        # Mark all unread messages as read
-        Message.objects.filter(
-            conversation=conversation,
-            read=False
-        ).exclude(
-            sender=self.request.user
-        ).update(read=True)
+        # Advance the reader's watermark; a single-row write
+        conversation.mark_read(self.request.user)
 
         return conversation
 
 
-class MessageCreateView(generics.CreateAPIView):
+class MessageCreateView(DynamicFieldsViewMixin, generics.ListCreateAPIView):
     """
-    Create a new message in a conversation
+    Read a conversation's history page by page, or post a new message to it
+
+    History is keyset paginated on the time-ordered id with `before`, `after`
+    and `limit` query parameters (see MessageHistoryPagination), so reading an
+    old page costs the same as reading the newest one.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = MessageSerializer
+    pagination_class = MessageHistoryPagination
 
-    def create(self, request, *args, **kwargs):
+    def get_conversation_id(self):
+        """
+        Return the conversation id from the URL once the requester is known to
+        be a member (cached, see messaging.membership).
+
+        Raises:
+            NotFound: If the requester is not a participant.
+        """
         conversation_id = self.kwargs.get('conversation_id')
-        conversation = get_object_or_404(
-            Conversation.objects.filter(participants=request.user),
-            id=conversation_id
-        )
+        if not is_member(conversation_id, self.request.user.pk):
+            raise NotFound('Conversation not found.')
+        return conversation_id
+
+    def get_queryset(self):
+        return self.optimize_queryset(Message.objects.filter(
+            conversation_id=self.get_conversation_id()
+        ))
+
+    def list(self, request, *args, **kwargs):
+        paginator = self.paginator
+        params = request.query_params
+        if paginator.before_query_param in params or paginator.after_query_param in params:
+            return super().list(request, *args, **kwargs)
+
+        # The newest page is served from the recent-message buffer when it is
+        # still current, i.e. its newest entry is the conversation's last message
+        conversation_id = self.get_conversation_id()
+        last_message_id = Conversation.objects.filter(
+            pk=conversation_id
+        ).values_list('last_message_id', flat=True).first()
+
+        buffered = recent_messages.latest(conversation_id, paginator.get_page_size(request), last_message_id)
+        if buffered is not None:
+            messages, has_older = buffered
+            page = paginator.paginate_buffered(request, messages, has_older)
+        else:
+            page = paginator.paginate_queryset(self.get_queryset(), request, view=self)
+            if not self.has_field_specs():
+                # Pruned rows would leave later full reads with lazy loads
+                recent_messages.prime(conversation_id, page, complete=not paginator.has_older)
+
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def create(self, request, *args, **kwargs):
+        conversation_id = self.get_conversation_id()
 
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(conversation=conversation, sender=request.user)
+        with transaction.atomic():
+            message = serializer.save(conversation_id=conversation_id, sender=request.user)
+
+            # Refresh the inbox pointer, updated_at and unread counters
+            Conversation.record_messages([message])
 
-        # Update conversation's updated_at
-        conversation.save()
+            # Push to open sockets and warm the recent-message buffer once durable
+            event = chat_message_event(message, request.user)
+            transaction.on_commit(lambda: async_to_sync(get_channel_layer().group_send)(
+                conversation_group_name(conversation_id), event
+            ))
+            transaction.on_commit(lambda: remember_messages([message]))
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class UserSearchView(generics.ListAPIView):
+class UserSearchView(FastListMixin, DynamicFieldsViewMixin, generics.ListAPIView):
     """
     Search users by username for starting new conversations
+
+    Typeahead-ranked (exact, then prefix, then substring matches) through the
+    indexed search in auth_user.search; `limit` caps the number of results.
+    Profiles are rendered from values() rows (see FastListMixin).
     """
     permission_classes = [IsAuthenticated]
     serializer_class = ProfileSerializer
+    default_limit = 10
 
     def get_queryset(self):
         from user_profile.models import UserProfile
         query = self.request.query_params.get('q', '')
-        return UserProfile.objects.filter(
-            user__username__icontains=query
-        ).exclude(
-            user=self.request.user
-        )
\ No newline at end of file
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+
+        user_ids = search_user_ids(query, limit=limit, exclude=self.request.user.pk)
+        if not user_ids:
+            return UserProfile.objects.none()
+        # Keep the relevance order of the search
+        rank = Case(*(When(user_id=user_id, then=Value(i)) for i, user_id in enumerate(user_ids)))
+        return self.optimize_queryset(
+            UserProfile.objects.filter(user_id__in=user_ids).select_related('user').order_by(rank)
+        )
@@ -0,0 +1,7 @@
+from django.contrib import admin
+
+from notifications.models import Notification, NotificationBadge
+
+# Register your models here.
+admin.site.register(Notification)
+admin.site.register(NotificationBadge)
@@ -0,0 +1,218 @@
+import uuid
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+# Get the custom User model
+User = get_user_model()
+
+
+class NotificationManager(models.Manager):
+
+    def notify(self, target_model, target_id, verb, actor_id, description, counts):
+        """
+        Record events for several recipients at once, coalescing per target.
+
+        A recipient who still has an unread notification with the same verb for
+        the same target gets that notification's count bumped instead of a new
+        row, so a burst of events becomes one "N new ..." entry.
+
+        Recipients without one first get an empty row from a single
+        `bulk_create` that skips conflicts. At most one unread row may exist per
+        recipient, target and verb, so a concurrent fan-out waits on and then
+        skips rows this one is creating instead of duplicating them. All rows
+        are then locked and bumped with one `bulk_update`, and the unread badge
+        is bumped only for recipients whose row was created here.
+
+        Args:
+            target_model: Model class of the target (e.g. Conversation).
+            target_id: Primary key of the target.
+            verb (str): What happened, e.g. "sent you a message".
+            actor_id: User responsible for the latest event.
+            description (str): Short preview of the latest event.
+            counts (dict): Number of new events per recipient id.
+        """
+        counts = {recipient_id: count for recipient_id, count in counts.items() if count > 0}
+        if not counts:
+            return
+
+        content_type = ContentType.objects.get_for_model(target_model)
+        now = timezone.now()
+
+        with transaction.atomic():
+            self.bulk_create([
+                Notification(
+                    recipient_id=recipient_id,
+                    verb=verb,
+                    target_content_type=content_type,
+                    target_object_id=str(target_id),
+                    count=0,
+                    created_at=now,
+                    updated_at=now
+                )
+                for recipient_id in counts
+            ], ignore_conflicts=True)
+
+            notifications = list(self.select_for_update().filter(
+                recipient_id__in=counts.keys(),
+                target_content_type=content_type,
+                target_object_id=str(target_id),
+                verb=verb,
+                unread=True
+            ))
+            # Rows still empty are the ones inserted above
+            fresh = [notification.recipient_id for notification in notifications if not notification.count]
+            for notification in notifications:
+                notification.count += counts[notification.recipient_id]
+                notification.actor_id = actor_id
+                notification.description = description
+                notification.updated_at = now
+            self.bulk_update(notifications, ['count', 'actor', 'description', 'updated_at'])
+            NotificationBadge.increment(fresh)
+
+
+class Notification(models.Model):
+    """
+    Model to store notifications shown to a user.
+
+    Repeated events on the same target are coalesced into a single unread
+    notification whose `count` grows (see NotificationManager.notify).
+
+    Fields:
+        - id (UUID): Primary key, auto-generated UUID for uniqueness.
+        - recipient (ForeignKey): User the notification is for.
+        - actor (ForeignKey): User who caused the latest event, if any.
+        - verb (CharField): What happened, e.g. "sent you a message".
+        - target (GenericForeignKey): Object the notification is about.
+        - description (CharField): Short preview of the latest event.
+        - count (PositiveInteger): Number of events coalesced into this notification.
+        - unread (Boolean): Whether the recipient has seen it.
+        - created_at (DateTime): When the first event arrived.
+        - updated_at (DateTime): When the latest event arrived.
+    """
+    DESCRIPTION_LENGTH = 100
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        help_text="User the notification is for"
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="User who caused the latest event"
+    )
+    verb = models.CharField(
+        max_length=255,
+        help_text="What happened"
+    )
+    target_content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    target_object_id = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True
+    )
+    target = GenericForeignKey('target_content_type', 'target_object_id')
+    description = models.CharField(
+        max_length=DESCRIPTION_LENGTH,
+        blank=True,
+        default='',
+        help_text="Short preview of the latest event"
+    )
+    count = models.PositiveIntegerField(
+        default=1,
+        help_text="Number of events coalesced into this notification"
+    )
+    unread = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = NotificationManager()
+
+    class Meta:
+        ordering = ['-updated_at', '-id']
+        indexes = [
+            # Backs keyset pagination of a user's notifications.
+            models.Index(fields=['recipient', '-updated_at', '-id'], name='notification_feed_idx'),
+        ]
+        constraints = [
+            # One unread notification to coalesce new events into; also finds it.
+            models.UniqueConstraint(
+                fields=['recipient', 'target_content_type', 'target_object_id', 'verb'],
+                condition=models.Q(unread=True),
+                name='notification_coalesce_unique'
+            ),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the Notification.
+
+        Returns:
+            str: Recipient, verb and count.
+        """
+        return f'{self.recipient}: {self.verb} ({self.count})'
+
+
+class NotificationBadge(models.Model):
+    """
+    Per-user counter of unread notifications.
+
+    Maintained alongside the notifications so the badge is a primary-key read
+    rather than a COUNT over the user's notifications.
+
+    Fields:
+        - user (OneToOne): Owner of the badge; also the primary key.
+        - unread_count (PositiveInteger): Number of unread notifications.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_badge'
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user}: {self.unread_count}'
+
+    @classmethod
+    def increment(cls, user_ids, amount=1):
+        """
+        Add `amount` to the badges of the given users, creating missing ones.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        cls.objects.bulk_create([cls(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+        cls.objects.filter(user_id__in=user_ids).update(unread_count=F('unread_count') + amount)
+
+    @classmethod
+    def decrement(cls, user_id, amount=1):
+        """
+        Subtract `amount` from a user's badge without going below zero.
+        """
+        cls.objects.filter(user_id=user_id, unread_count__gte=amount).update(
+            unread_count=F('unread_count') - amount
+        )
+
+    @classmethod
+    def unread_for(cls, user_id):
+        return cls.objects.filter(user_id=user_id).values_list('unread_count', flat=True).first() or 0
@@ -0,0 +1,8 @@
+from utils.pagination import KeysetPagination
+
+
+class NotificationCursorPagination(KeysetPagination):
+    """
+    Cursor pagination for a user's notifications, most recently updated first.
+    """
+    ordering = ('-updated_at', '-id')
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+from notifications.models import Notification
+from user_profile.serializers import ProfileSerializer
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    actor = ProfileSerializer(source='actor.userprofile', read_only=True)
+    target_type = serializers.CharField(source='target_content_type.model', read_only=True, default=None)
+    target_id = serializers.CharField(source='target_object_id', read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = [
+            'id', 'actor', 'verb', 'target_type', 'target_id', 'description',
+            'count', 'unread', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,42 @@
+from collections import Counter, defaultdict
+from django.dispatch import receiver
+from messaging.models import Conversation, ConversationMember
+from messaging.signals import messages_recorded
+from notifications.models import Notification
+
+NEW_MESSAGE = 'new_message'
+
+
+@receiver(messages_recorded)
+def notify_new_messages(sender, messages, **kwargs):
+    # Runs after commit, once per batch: one membership query for the whole
+    # batch, then one coalescing write per conversation however many messages
+    # or members it has.
+    sent = defaultdict(Counter)
+    latest = {}
+    for message in messages:
+        sent[message.conversation_id][message.sender_id] += 1
+        latest[message.conversation_id] = message
+
+    members = defaultdict(list)
+    for conversation_id, user_id in ConversationMember.objects.filter(
+        conversation_id__in=latest.keys()
+    ).values_list('conversation_id', 'user_id'):
+        members[conversation_id].append(user_id)
+
+    for conversation_id, message in latest.items():
+        per_sender = sent[conversation_id]
+        total = sum(per_sender.values())
+        counts = {
+            user_id: total - per_sender[user_id]
+            for user_id in members[conversation_id]
+            if total - per_sender[user_id] > 0
+        }
+        Notification.objects.notify(
+            Conversation,
+            conversation_id,
+            NEW_MESSAGE,
+            message.sender_id,
+            message.text[:Notification.DESCRIPTION_LENGTH],
+            counts
+        )
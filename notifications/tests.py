@@ -0,0 +1,113 @@
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from messaging.models import Conversation
+from notifications.models import Notification, NotificationBadge
+from notifications.signals import NEW_MESSAGE
+from user_profile.models import UserProfile
+
+User = get_user_model()
+
+
+class NotifyTests(TestCase):
+    """
+    Events coalesce into one unread notification per recipient, target and
+    verb, and only new notifications move the badge.
+    """
+
+    def setUp(self):
+        self.actor, self.alice, self.bob = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='secret')
+            for name in ('actor', 'alice', 'bob')
+        ]
+        self.target = uuid4()
+
+    def notify(self, counts, description='hi'):
+        Notification.objects.notify(Conversation, self.target, NEW_MESSAGE, self.actor.pk, description, counts)
+
+    def state(self, user):
+        notifications = Notification.objects.filter(recipient=user).order_by('created_at')
+        return list(notifications.values_list('count', 'unread')), NotificationBadge.unread_for(user.pk)
+
+    def test_coalesces_unread_events(self):
+        self.notify({self.alice.pk: 2})
+        self.notify({self.alice.pk: 1, self.bob.pk: 3}, description='latest')
+
+        self.assertEqual(self.state(self.alice), ([(3, True)], 1))
+        self.assertEqual(self.state(self.bob), ([(3, True)], 1))
+        self.assertEqual(Notification.objects.get(recipient=self.alice).description, 'latest')
+
+    def test_read_notifications_start_a_new_one(self):
+        self.notify({self.alice.pk: 1})
+        Notification.objects.update(unread=False)
+        NotificationBadge.decrement(self.alice.pk)
+
+        self.notify({self.alice.pk: 1})
+        self.assertEqual(self.state(self.alice), ([(1, False), (1, True)], 1))
+
+    def test_one_unread_notification_per_target(self):
+        self.notify({self.alice.pk: 1})
+        duplicate = Notification.objects.get()
+        duplicate.pk = uuid4()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            duplicate.save(force_insert=True)
+
+        duplicate.unread = False
+        duplicate.save(force_insert=True)
+
+    def test_zero_counts_are_ignored(self):
+        self.notify({self.alice.pk: 0})
+        self.assertEqual(self.state(self.alice), ([], 0))
+
+
+class NotificationViewTests(TestCase):
+    """
+    Users read, count and mark their own notifications only.
+    """
+
+    def setUp(self):
+        self.reader, self.other = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='secret')
+            for name in ('reader', 'other')
+        ]
+        for user in (self.reader, self.other):
+            UserProfile.objects.get_or_create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.reader).key}')
+        for recipient, target in [(self.reader, 'a'), (self.reader, 'b'), (self.other, 'a')]:
+            Notification.objects.notify(User, target, 'poked you', self.other.pk, '', {recipient.pk: 1})
+
+    def unread_count(self):
+        return self.client.get('/api/notifications/unread-count/').json()['unread_count']
+
+    def test_lists_own_notifications(self):
+        results = self.client.get('/api/notifications/').json()['results']
+        self.assertEqual(sorted(row['target_id'] for row in results), ['a', 'b'])
+        self.assertEqual(self.unread_count(), 2)
+
+    def test_mark_read(self):
+        notification = Notification.objects.filter(recipient=self.reader).first()
+        url = f'/api/notifications/{notification.pk}/read/'
+        self.assertEqual(self.client.post(url).status_code, 204)
+        self.assertEqual(self.unread_count(), 1)
+        # Already read: still fine, but the badge does not move again
+        self.assertEqual(self.client.post(url).status_code, 204)
+        self.assertEqual(self.unread_count(), 1)
+
+        self.assertEqual(self.client.post('/api/notifications/read/').status_code, 204)
+        self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(Notification.objects.filter(recipient=self.reader, unread=True).exists())
+
+    def test_others_notifications_are_not_found(self):
+        foreign = Notification.objects.get(recipient=self.other)
+        for pk in (foreign.pk, uuid4()):
+            response = self.client.post(f'/api/notifications/{pk}/read/')
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), {'message': 'Resource not found.', 'errors': 'Notification not found.'})
+        self.assertTrue(Notification.objects.get(pk=foreign.pk).unread)
+        self.assertEqual(NotificationBadge.unread_for(self.other.pk), 1)
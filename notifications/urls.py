@@ -0,0 +1,14 @@
+from django.urls import path
+from notifications.views import (
+    NotificationListView,
+    NotificationMarkAllReadView,
+    NotificationMarkReadView,
+    NotificationUnreadCountView
+)
+
+urlpatterns = [
+    path('', NotificationListView.as_view(), name='notification-list'),
+    path('unread-count/', NotificationUnreadCountView.as_view(), name='notification-unread-count'),
+    path('read/', NotificationMarkAllReadView.as_view(), name='notification-mark-all-read'),
+    path('<uuid:pk>/read/', NotificationMarkReadView.as_view(), name='notification-mark-read'),
+]
@@ -0,0 +1,63 @@
+from django.db import transaction
+from rest_framework import generics, status
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from notifications.models import Notification, NotificationBadge
+from notifications.pagination import NotificationCursorPagination
+from notifications.serializers import NotificationSerializer
+
+
+class NotificationListView(generics.ListAPIView):
+    """
+    List the current user's notifications, most recently updated first
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = NotificationSerializer
+    pagination_class = NotificationCursorPagination
+
+    def get_queryset(self):
+        return Notification.objects.filter(
+            recipient=self.request.user
+        ).select_related('actor__userprofile', 'target_content_type')
+
+
+class NotificationUnreadCountView(APIView):
+    """
+    Return the current user's unread badge; a single primary-key read
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({'unread_count': NotificationBadge.unread_for(request.user.pk)})
+
+
+class NotificationMarkAllReadView(APIView):
+    """
+    Mark every notification of the current user as read
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        with transaction.atomic():
+            Notification.objects.filter(recipient=request.user, unread=True).update(unread=False)
+            NotificationBadge.objects.filter(user=request.user).update(unread_count=0)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class NotificationMarkReadView(APIView):
+    """
+    Mark a single notification of the current user as read
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        with transaction.atomic():
+            updated = Notification.objects.filter(pk=pk, recipient=request.user, unread=True).update(unread=False)
+            if updated:
+                NotificationBadge.decrement(request.user.pk)
+            elif not Notification.objects.filter(pk=pk, recipient=request.user).exists():
+                raise NotFound('Notification not found.')
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        import posts.signals
+        post_migrate.connect(create_caption_index, sender=self)
+
+
+def create_caption_index(using, **kwargs):
+    # The caption search tables are not models (see posts.search)
+    from posts.search import create_index
+    create_index(using)
@@ -0,0 +1,147 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, models, transaction
+from django.utils import timezone
+
+from utils.ids import uuid7
+
+# Key generators compared, in report order.
+KEY_DEFAULTS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+
+def benchmark_model(name, default):
+    """
+    Unmanaged copy of the hot columns of Post (key, owner-like column,
+    timestamp, caption) keyed by `default`, with the same secondary index.
+    """
+    table = f'benchmark_post_{name}'
+    meta = type('Meta', (), {
+        'app_label': 'posts',
+        'db_table': table,
+        'managed': False,
+        'indexes': [models.Index(fields=['-created_at', '-id'], name=f'{table}_created_idx')],
+    })
+    return type(f'BenchmarkPost{name.title()}', (models.Model,), {
+        '__module__': __name__,
+        'Meta': meta,
+        'id': models.UUIDField(primary_key=True, default=default),
+        'author': models.UUIDField(),
+        'created_at': models.DateTimeField(default=timezone.now),
+        'caption': models.TextField(),
+    })
+
+
+def index_sizes(model):
+    """
+    Bytes used by the primary key index and by all indexes of the table, or
+    ``(None, None)`` when the backend cannot tell.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        try:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT pg_relation_size(i.indexrelid), pg_indexes_size(i.indrelid) '
+                    'FROM pg_index i WHERE i.indrelid = %s::regclass AND i.indisprimary',
+                    [table]
+                )
+                return cursor.fetchone()
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    "SELECT s.name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name "
+                    "WHERE m.type = 'index' AND m.tbl_name = %s GROUP BY s.name",
+                    [table]
+                )
+                sizes = dict(cursor.fetchall())
+                primary = sum(size for name, size in sizes.items() if name.startswith('sqlite_autoindex_'))
+                return primary, sum(sizes.values())
+        except DatabaseError:
+            pass
+    return None, None
+
+
+class Command(BaseCommand):
+    """
+    Compare random (UUIDv4) and time-ordered (UUIDv7) primary keys.
+
+    For each key type a scratch table shaped like Post is seeded with
+    `--rows` rows inserted in small transactions, the way posts and messages
+    arrive, and the command reports insert throughput over the last
+    `--measure` rows and the resulting index sizes (PostgreSQL, or SQLite
+    built with dbstat). Scratch tables are dropped afterwards.
+    """
+    help = 'Benchmark insert throughput and index size of uuid4 vs uuid7 primary keys.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=200_000,
+            help='Rows to insert per key type (default: 200000).'
+        )
+        parser.add_argument(
+            '--measure',
+            type=int,
+            default=20_000,
+            help='Trailing rows whose insert rate is reported (default: 20000).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Rows per insert transaction (default: 100).'
+        )
+
+    def handle(self, *args, **options):
+        rows, batch_size = options['rows'], options['batch_size']
+        measure = min(options['measure'], rows)
+        if rows < 1 or batch_size < 1 or measure < 1:
+            raise CommandError('--rows, --measure and --batch-size must be positive.')
+
+        results = {}
+        for name, default in KEY_DEFAULTS.items():
+            model = benchmark_model(name, default)
+            with connection.schema_editor() as editor:
+                editor.create_model(model)
+                # Not created with the table for unmanaged models
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+            try:
+                results[name] = self.run(model, rows, measure, batch_size)
+            finally:
+                with connection.schema_editor() as editor:
+                    editor.delete_model(model)
+
+        self.stdout.write(f'{rows} rows, {batch_size} per transaction, on {connection.vendor}:')
+        self.stdout.write(f'{"key":<6} {"rows/s":>10} {"pk index":>12} {"all indexes":>12}')
+        for name, (rate, primary, total) in results.items():
+            self.stdout.write(f'{name:<6} {rate:>10.0f} {self.format_size(primary):>12} {self.format_size(total):>12}')
+
+    def run(self, model, rows, measure, batch_size):
+        author = uuid.uuid4()
+        measured_from = rows - measure
+        inserted = measured = 0
+        elapsed = 0.0
+        while inserted < rows:
+            count = min(batch_size, rows - inserted)
+            batch = [model(author=author, caption='benchmark caption') for _ in range(count)]
+            started = time.perf_counter()
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            if inserted + count > measured_from:
+                elapsed += time.perf_counter() - started
+                measured += count
+            inserted += count
+
+        primary, total = index_sizes(model)
+        return measured / elapsed if elapsed else 0.0, primary, total
+
+    def format_size(self, size):
+        if size is None:
+            return 'n/a'
+        return f'{size / 2 ** 20:.1f} MiB'
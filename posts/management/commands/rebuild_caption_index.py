@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from posts.models import Post
+from posts.search import get_index
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the caption search index (see posts.search) from the posts table.
+
+    Needed once for posts written before the index existed, after changing
+    the text search configuration, and after `rekey_uuid7`. Posts are indexed
+    in primary-key order in batches, then index entries whose post is gone
+    are dropped, so searches keep working while it runs; captions that did
+    not change are not rewritten.
+    """
+    help = 'Rebuild the caption full-text search index from the posts table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of posts to index per query (default: 1000).'
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database to rebuild the index of (default: "default").'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+        using = options['database']
+        index = get_index(using)
+        if index is None:
+            raise CommandError('Caption search is not supported on this database backend.')
+        index.create()
+
+        posts = Post.objects.using(using).order_by('pk')
+        indexed = 0
+        last_pk = None
+        while True:
+            batch = posts if last_pk is None else posts.filter(pk__gt=last_pk)
+            rows = list(batch.values_list('pk', 'caption')[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            captioned = [(pk, caption) for pk, caption in rows if caption]
+            index.write(captioned)
+            index.delete([pk for pk, caption in rows if not caption])
+            indexed += len(captioned)
+            self.stdout.write(f'Indexed up to {last_pk}, {indexed} captions so far.')
+
+        dropped = 0
+        last_pk = None
+        while True:
+            post_ids = index.indexed_ids(last_pk, batch_size)
+            if not post_ids:
+                break
+            last_pk = post_ids[-1]
+            stale = set(post_ids) - set(Post.objects.using(using).filter(pk__in=post_ids).values_list('pk', flat=True))
+            if stale:
+                index.delete(stale)
+                dropped += len(stale)
+
+        index.optimize()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} captions, dropped {dropped} stale entries.'))
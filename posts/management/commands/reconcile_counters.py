@@ -0,0 +1,103 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Like, Post
+from user_profile.models import Follow, UserProfile
+
+# Counter columns and the rows they count: model -> (field the counted rows
+# point at, {column: (counted model, foreign key)}).
+COUNTED = {
+    Post: ('pk', {'like_count': (Like, 'post'), 'comment_count': (Comment, 'post')}),
+    UserProfile: ('user_id', {
+        'post_count': (Post, 'user'),
+        'follower_count': (Follow, 'followee'),
+        'following_count': (Follow, 'follower'),
+    }),
+}
+
+
+def exact_count(counted, foreign_key, key_field):
+    """
+    Correlated ``COUNT(*)`` of the rows of `counted` pointing at the outer row.
+    """
+    return Coalesce(Subquery(
+        counted.objects.filter(**{foreign_key: OuterRef(key_field)}).order_by().values(
+            foreign_key
+        ).annotate(total=Count('*')).values('total'),
+        output_field=IntegerField()
+    ), Value(0))
+
+
+class Command(BaseCommand):
+    """
+    Recompute the denormalized like, comment, post and follow counts from
+    the rows they count.
+
+    The counts are written behind (see utils.counters) or by signals (see
+    user_profile.signals): increments buffered by a process that dies are
+    lost, and writes that bypass them (cascading deletes of likes, queryset
+    updates) are not counted. Rows are checked in primary-key order in batches;
+    only drifted rows are rewritten, from a fresh count, with their version
+    bumped. Increments still buffered while the command runs are applied on
+    top, so run it at a quiet time, or simply again.
+    """
+    help = 'Recompute denormalized engagement and follow counters from the rows they count.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows to check per query (default: 1000).'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted rows without fixing them.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        for model, (key_field, columns) in COUNTED.items():
+            fixed = self.reconcile(model, key_field, columns, batch_size, options['dry_run'])
+            verb = 'Would fix' if options['dry_run'] else 'Fixed'
+            self.stdout.write(self.style.SUCCESS(f'{verb} {fixed} {model._meta.verbose_name_plural}.'))
+
+    def reconcile(self, model, key_field, columns, batch_size, dry_run):
+        exact = {
+            f'exact_{column}': exact_count(counted, foreign_key, key_field)
+            for column, (counted, foreign_key) in columns.items()
+        }
+        drifted = Q()
+        for column in columns:
+            drifted |= ~Q(**{column: F(f'exact_{column}')})
+
+        fixed = 0
+        last_pk = None
+        while True:
+            batch = model.objects.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+
+            stale = list(model.objects.filter(pk__in=pks).annotate(**exact).filter(drifted).values_list('pk', flat=True))
+            if stale and not dry_run:
+                with transaction.atomic():
+                    model.objects.filter(pk__in=stale).update(
+                        version=F('version') + 1,
+                        **{
+                            column: exact_count(counted, foreign_key, key_field)
+                            for column, (counted, foreign_key) in columns.items()
+                        }
+                    )
+            fixed += len(stale)
+            self.stdout.write(f'{model.__name__}: processed up to {last_pk}, {fixed} drifted so far.')
+        return fixed
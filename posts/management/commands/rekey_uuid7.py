@@ -0,0 +1,157 @@
+from django.apps import apps
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Case, Value, When
+
+from utils.ids import UUID7Generator
+
+# Models keyed by uuid7, with the timestamp their new ids are derived from.
+REKEYED_MODELS = {
+    'auth_user.User': 'date_joined',
+    'user_profile.UserProfile': 'user__date_joined',
+    'messaging.Conversation': 'created_at',
+    'posts.Post': 'created_at',
+    'messaging.Message': 'created_at',
+}
+
+
+def foreign_keys_to(model):
+    """
+    Concrete foreign keys (one-to-one and many-to-many through tables
+    included) pointing at the primary key of `model`.
+    """
+    return [
+        field
+        for related in apps.get_models(include_auto_created=True)
+        for field in related._meta.concrete_fields
+        if field.many_to_one or field.one_to_one
+        if field.related_model is model and field.target_field.primary_key
+    ]
+
+
+def generic_keys():
+    """
+    ``(model, content type field, object id field)`` of every generic
+    reference, including the admin log which stores one without a
+    GenericForeignKey.
+    """
+    references = [
+        (model, field.ct_field, field.fk_field)
+        for model in apps.get_models()
+        for field in model._meta.private_fields
+        if isinstance(field, GenericForeignKey)
+    ]
+    if apps.is_installed('django.contrib.admin'):
+        references.append((apps.get_model('admin', 'LogEntry'), 'content_type', 'object_id'))
+    return references
+
+
+def remap(column, mapping, output_field):
+    """
+    ``CASE column WHEN old THEN new ... END`` for a bulk UPDATE.
+    """
+    return Case(
+        *[When(**{column: old}, then=Value(new, output_field=output_field)) for old, new in mapping.items()],
+        output_field=output_field
+    )
+
+
+class Command(BaseCommand):
+    """
+    Replace the random (UUIDv4) primary keys of existing rows with UUIDv7.
+
+    New ids embed each row's creation time, so rows created before the switch
+    to uuid7 defaults sort chronologically with the ones created after it and
+    keyset pagination can order by primary key alone. Rows are processed in
+    creation order, in batches of whole timestamps, each in its own
+    transaction: the row's key, every foreign key to it and every generic
+    reference (notification targets, admin log) are rewritten together,
+    relying on deferred foreign key checks. Rows already keyed by uuid7 are
+    skipped, so the command can be interrupted and re-run.
+
+    Ids are part of URLs, cached responses and sessions: run it with the
+    application stopped; users have to log in again afterwards.
+    """
+    help = 'Rekey existing users, profiles, posts, conversations and messages with time-ordered UUIDs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows to rekey per transaction (default: 500).'
+        )
+        parser.add_argument(
+            '--model',
+            action='append',
+            choices=list(REKEYED_MODELS),
+            help='Only rekey this model (repeatable; default: all).'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count the rows that would be rekeyed without changing anything.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+        if not connection.features.can_defer_constraint_checks:
+            raise CommandError('Rekeying needs deferrable foreign key constraints.')
+
+        for label in options['model'] or REKEYED_MODELS:
+            model = apps.get_model(label)
+            rekeyed = self.rekey(model, REKEYED_MODELS[label], batch_size, options['dry_run'])
+            verb = 'Would rekey' if options['dry_run'] else 'Rekeyed'
+            self.stdout.write(self.style.SUCCESS(f'{verb} {rekeyed} {model._meta.verbose_name_plural}.'))
+
+    def rekey(self, model, timestamp, batch_size, dry_run):
+        generate = UUID7Generator()
+        foreign_keys = foreign_keys_to(model)
+        generic = generic_keys()
+        content_type = ContentType.objects.get_for_model(model)
+        rows_by_time = model._base_manager.order_by(timestamp, 'pk').values_list('pk', timestamp)
+        rekeyed = 0
+        last_time = None
+
+        while True:
+            batch = rows_by_time
+            if last_time is not None:
+                batch = batch.filter(**{f'{timestamp}__gt': last_time})
+            rows = list(batch[:batch_size])
+            if not rows:
+                break
+            # Keys change under the loop, so it seeks on the timestamp alone:
+            # the batch takes every row of its last timestamp, and the next
+            # one starts strictly after it.
+            last_time = rows[-1][1]
+            rows = [row for row in rows if row[1] != last_time] + list(rows_by_time.filter(**{timestamp: last_time}))
+
+            # Creation order is kept within the batch by the generator's counter
+            mapping = {pk: generate(created) for pk, created in rows if pk.version != 7}
+            if mapping and not dry_run:
+                self.apply(model, mapping, foreign_keys, generic, content_type)
+            rekeyed += len(mapping)
+            self.stdout.write(f'{model.__name__}: {rekeyed} rows rekeyed so far.')
+        return rekeyed
+
+    def apply(self, model, mapping, foreign_keys, generic, content_type):
+        with transaction.atomic():
+            for field in foreign_keys:
+                field.model._base_manager.filter(**{f'{field.attname}__in': list(mapping)}).update(
+                    **{field.attname: remap(field.attname, mapping, field.target_field)}
+                )
+
+            names = {str(old): str(new) for old, new in mapping.items()}
+            for related, ct_field, fk_field in generic:
+                related._base_manager.filter(**{ct_field: content_type, f'{fk_field}__in': list(names)}).update(
+                    **{fk_field: remap(fk_field, names, related._meta.get_field(fk_field))}
+                )
+
+            pk = model._meta.pk
+            model._base_manager.filter(pk__in=list(mapping)).update(
+                **{pk.attname: remap(pk.attname, mapping, pk)}
+            )
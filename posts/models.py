@@ -1,7 +1,9 @@
-import uuid
 from django.db import models
+from django.db.models import F
 from django.contrib.auth import get_user_model
 
+from utils.ids import uuid7
+
 # Get the custom User model
 User = get_user_model()
 
@@ -10,15 +12,19 @@ class Post(models.Model):
     Model to store user-generated posts.
 
     Fields:
-        - id (UUID): Primary key, auto-generated UUID for uniqueness.
+        - id (UUID): Primary key, time-ordered UUIDv7 (see utils.ids).
         - user (ForeignKey): Reference to the user who created the post.
         - caption (TextField): Optional text caption describing the post.
         - post_image (ImageField): Optional image uploaded with the post.
         - created_at (DateTime): Timestamp when the post was created.
+        - updated_at (DateTime): Timestamp of the last edit.
+        - like_count / comment_count (PositiveInteger): Denormalized, written
+          behind by utils.counters.
+        - version (PositiveInteger): Bumped on every update; keys cached responses.
     """
     id = models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         editable=False
     )
     user = models.ForeignKey(
@@ -42,6 +48,38 @@ class Post(models.Model):
         auto_now_add=True,
         help_text="Timestamp of post creation"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Timestamp of the last edit"
+    )
+    like_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of likes"
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of comments"
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text="Incremented on every update"
+    )
+
+    # Written behind by utils.counters; `save()` leaves them alone so an
+    # edit cannot overwrite increments flushed while it was in flight.
+    counter_fields = ('like_count', 'comment_count')
+
+    class Meta:
+        # Ids are time-ordered, so the primary key index serves the feed
+        ordering = ['-id']
+        indexes = [
+            # An author's posts, newest first (timeline backfill and
+            # fan-out-on-read, see posts.timeline).
+            models.Index(fields=['user', '-id'], name='post_user_id_idx'),
+        ]
 
     def __str__(self):
         """
@@ -52,3 +90,140 @@ class Post(models.Model):
         """
         return f'{self.user.username}: {self.caption[:40] if self.caption else ""}'
 
+    def save(self, *args, **kwargs):
+        """
+        Save the post, atomically bumping `version` when updating.
+
+        Updates write every column but the counters (see `counter_fields`),
+        which are reloaded instead, unless `update_fields` names them.
+        """
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        self.version = F('version') + 1
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = {
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            }
+        kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version', *self.counter_fields])
+
+
+class TimelineEntry(models.Model):
+    """
+    A post materialized into a user's home timeline (see posts.timeline).
+
+    Fields:
+        - owner (ForeignKey): User whose timeline holds the entry.
+        - post (ForeignKey): The post shown.
+
+    Post ids are time-ordered, so the unique (owner, post) index is also the
+    timeline's order: a page is one range scan of it.
+    """
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text="Owner of the timeline"
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text="Post in the timeline"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='unique_timeline_entry'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} in timeline of {self.owner_id}"
+
+
+class Like(models.Model):
+    """
+    A user liking a post.
+
+    Fields:
+        - post (ForeignKey): The liked post.
+        - user (ForeignKey): The user who liked it.
+        - created_at (DateTime): When the like was given.
+
+    Counted into `Post.like_count` (see utils.counters).
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='likes',
+        help_text="Liked post"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='likes',
+        help_text="User who liked the post"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp of the like"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'user'], name='unique_like'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} likes {self.post_id}"
+
+
+class Comment(models.Model):
+    """
+    A comment on a post.
+
+    Fields:
+        - id (UUID): Primary key, time-ordered UUIDv7 (see utils.ids).
+        - post (ForeignKey): The post commented on.
+        - user (ForeignKey): Author of the comment.
+        - text (TextField): The comment.
+        - created_at (DateTime): Timestamp when the comment was posted.
+
+    Counted into `Post.comment_count` (see utils.counters).
+    """
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid7,
+        editable=False
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        help_text="Post commented on"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        help_text="Author of the comment"
+    )
+    text = models.TextField(
+        help_text="Comment text"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp of the comment"
+    )
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Backs keyset pagination of a post's comments.
+            models.Index(fields=['post', 'id'], name='comment_post_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} on {self.post_id}: {self.text[:40]}'
@@ -0,0 +1,97 @@
+from uuid import UUID
+
+from rest_framework.exceptions import NotFound
+
+from posts.search import search_posts
+from utils.pagination import KeysetPagination
+
+
+class PostCursorPagination(KeysetPagination):
+    """
+    Cursor pagination for the post feed, newest first.
+
+    Post ids are UUIDv7 (see utils.ids), ordered by creation time, so the
+    primary key alone is a unique chronological ordering served by its own
+    index.
+    """
+    ordering = ('-id',)
+
+
+class FeedPagination(PostCursorPagination):
+    """
+    Cursor pagination for a home feed whose post ids come from several
+    sources (see posts.timeline.feed_sources): the materialized timeline and
+    the posts of followed celebrities.
+
+    Each source is read with its own keyset range query on its id column,
+    one page deep; the ids are merged, and the page's posts are then loaded
+    by primary key from the view's queryset. `sources` is set by the view
+    before paginating.
+    """
+    sources = ()
+
+    def fetch(self, queryset, position, reverse, limit):
+        if position is not None:
+            position = self.coerce_position(queryset, position)
+        lookup, order = ('gt', '{}') if reverse else ('lt', '-{}')
+        ids = set()
+        for source, column in self.sources:
+            source = source.order_by(order.format(column))
+            if position is not None:
+                source = source.filter(**{f'{column}__{lookup}': position[0]})
+            ids.update(source.values_list(column, flat=True)[:limit + 1])
+
+        ids = sorted(ids, reverse=not reverse)
+        has_more = len(ids) > limit
+        ids = ids[:limit]
+        rows = list(queryset.filter(pk__in=ids))
+        rows.sort(key=lambda row: row['id'] if isinstance(row, dict) else row.pk, reverse=True)
+        return rows, has_more
+
+
+class CaptionSearchPagination(KeysetPagination):
+    """
+    Cursor pagination for caption search results, best match first.
+
+    Hits come from the full-text index (see posts.search.search_posts),
+    which seeks past the boundary hit's ``(rank, id)`` itself; the page's
+    posts are then loaded by primary key from the view's queryset, carrying
+    their `search_rank` and `snippet`. `query` is set by the view before
+    paginating. Ranks depend on the whole index, so posts indexed between
+    two requests can shift later pages slightly.
+    """
+    ordering = ('search_rank', 'id')
+    query = ''
+
+    def fetch(self, queryset, position, reverse, limit):
+        if position is not None:
+            try:
+                position = (float(position[0]), UUID(position[1]))
+            except (TypeError, ValueError, AttributeError):
+                raise NotFound(self.invalid_cursor_message)
+
+        hits = search_posts(self.query, position, reverse, limit + 1, using=queryset.db)
+        has_more = len(hits) > limit
+        hits = hits[:limit]
+        if reverse:
+            hits.reverse()
+
+        posts = queryset.in_bulk([hit.post_id for hit in hits])
+        rows = []
+        for hit in hits:
+            # Missing if deleted since it was indexed
+            post = posts.get(hit.post_id)
+            if post is not None:
+                post.search_rank, post.snippet = hit.rank, hit.snippet
+                rows.append(post)
+        return rows, has_more
+
+
+class CommentCursorPagination(KeysetPagination):
+    """
+    Cursor pagination for a post's comments, oldest first.
+
+    Comment ids are time-ordered UUIDv7 (see utils.ids); served by the
+    ``comment_post_id_idx`` index on ``Comment``.
+    """
+    ordering = ('id',)
@@ -0,0 +1,430 @@
+import re
+from collections import namedtuple
+from functools import partial
+from uuid import UUID
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.html import escape
+
+from utils import app_settings
+
+DEFAULTS = {
+    # Ranking looks at the newest this many matches only, so its cost does
+    # not grow with the number of posts a common term matches.
+    'MAX_CANDIDATES': 1000,
+    # Terms read from a query; the rest are ignored.
+    'MAX_TERMS': 8,
+    # Shortest term matched as a prefix (shorter ones match whole words).
+    'MIN_PREFIX': 2,
+    # Words in a highlighted snippet.
+    'SNIPPET_WORDS': 12,
+    # Opening and closing tags around matched words in snippets.
+    'HIGHLIGHT': ('<mark>', '</mark>'),
+    # PostgreSQL text search configuration; rebuild the index after changing it.
+    'TEXT_SEARCH_CONFIG': 'simple',
+}
+
+# Placeholders the database wraps matches in; the snippet is HTML-escaped
+# before they are swapped for HIGHLIGHT, so captions cannot inject markup.
+START_MARK, STOP_MARK = '\ue000', '\ue001'
+
+TERM_RE = re.compile(r'(\w+)(\*?)')
+
+SearchHit = namedtuple('SearchHit', ['post_id', 'rank', 'snippet'])
+
+
+get_setting = partial(app_settings.get_setting, 'POST_SEARCH', DEFAULTS)
+
+
+def parse_query(query):
+    """
+    Split a search query into ``(term, prefix)`` pairs.
+
+    Terms are runs of word characters, all required. A term followed by
+    ``*`` matches as a prefix, and so does the last one, so results follow
+    the query as it is typed; terms shorter than MIN_PREFIX always match
+    whole words.
+    """
+    terms = [(term, bool(star)) for term, star in TERM_RE.findall(query or '')][:get_setting('MAX_TERMS')]
+    if terms:
+        terms[-1] = (terms[-1][0], True)
+    min_prefix = get_setting('MIN_PREFIX')
+    return [(term, prefix and len(term) >= min_prefix) for term, prefix in terms]
+
+
+def highlight(snippet):
+    """
+    HTML-escape a snippet and wrap its matches in the HIGHLIGHT tags.
+    """
+    start, stop = get_setting('HIGHLIGHT')
+    return escape(snippet or '').replace(START_MARK, start).replace(STOP_MARK, stop)
+
+
+class CaptionIndex:
+    """
+    Full-text side index of post captions on one database.
+
+    Holds a copy of every non-empty caption keyed by post id, kept in sync
+    by the Post save and delete hooks (see posts.signals) and rebuilt by the
+    `rebuild_caption_index` command. Ranks are ascending, best first.
+    """
+    schema = []
+
+    def __init__(self, using):
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def db_id(self, post_id):
+        """
+        Post id as stored in the index.
+        """
+        return post_id
+
+    def create(self):
+        """
+        Create the index tables (`schema`) if they do not exist.
+        """
+        with self.connection.cursor() as cursor:
+            for statement in self.schema:
+                cursor.execute(statement)
+
+    def write(self, rows):
+        """
+        Index ``(post_id, caption)`` rows, replacing earlier captions.
+        """
+        raise NotImplementedError
+
+    def delete(self, post_ids):
+        raise NotImplementedError
+
+    def indexed_ids(self, after, limit):
+        """
+        Indexed post ids in ascending order, past `after` (None from the start).
+        """
+        raise NotImplementedError
+
+    def optimize(self):
+        pass
+
+    def search(self, terms, position, reverse, limit):
+        """
+        Rank the posts matching all `terms`.
+
+        Args:
+            terms (list): ``(term, prefix)`` pairs (see parse_query).
+            position (tuple | None): ``(rank, post_id)`` of the boundary hit,
+                exclusive.
+            reverse (bool): Walk towards better ranks.
+            limit (int): Most hits returned.
+
+        Returns:
+            list: SearchHits in the direction of travel.
+        """
+        raise NotImplementedError
+
+
+class SQLiteCaptionIndex(CaptionIndex):
+    """
+    Captions in an FTS5 table with external content.
+
+    ``posts_caption_doc`` holds the captions under an integer id in indexing
+    order, and triggers on it maintain the ``posts_caption_fts`` inverted
+    index (with prefix indexes for two- and three-character prefixes).
+    Matching reads the posting lists of the query terms only; BM25 then
+    ranks the newest MAX_CANDIDATES matches, found by walking the match
+    list backwards from the highest id, and snippets are cut for the page
+    alone.
+    """
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS posts_caption_doc (
+            id INTEGER PRIMARY KEY,
+            post_id TEXT NOT NULL UNIQUE,
+            caption TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS posts_caption_fts USING fts5(
+            caption,
+            content='posts_caption_doc',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS posts_caption_doc_ai AFTER INSERT ON posts_caption_doc BEGIN
+            INSERT INTO posts_caption_fts (rowid, caption) VALUES (new.id, new.caption);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS posts_caption_doc_ad AFTER DELETE ON posts_caption_doc BEGIN
+            INSERT INTO posts_caption_fts (posts_caption_fts, rowid, caption) VALUES ('delete', old.id, old.caption);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS posts_caption_doc_au AFTER UPDATE ON posts_caption_doc BEGIN
+            INSERT INTO posts_caption_fts (posts_caption_fts, rowid, caption) VALUES ('delete', old.id, old.caption);
+            INSERT INTO posts_caption_fts (rowid, caption) VALUES (new.id, new.caption);
+        END
+        """,
+    ]
+
+    def db_id(self, post_id):
+        # Django stores UUIDs as 32 hex digits on SQLite
+        return post_id.hex
+
+    def write(self, rows):
+        with self.connection.cursor() as cursor:
+            # Updating in place keeps the id, and so the post's place in the
+            # candidate window; unchanged captions are not rewritten at all.
+            cursor.executemany(
+                """
+                INSERT INTO posts_caption_doc (post_id, caption) VALUES (%s, %s)
+                ON CONFLICT (post_id) DO UPDATE SET caption = excluded.caption
+                WHERE caption IS NOT excluded.caption
+                """,
+                [(self.db_id(post_id), caption) for post_id, caption in rows]
+            )
+
+    def delete(self, post_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                'DELETE FROM posts_caption_doc WHERE post_id = %s',
+                [(self.db_id(post_id),) for post_id in post_ids]
+            )
+
+    def indexed_ids(self, after, limit):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT post_id FROM posts_caption_doc WHERE post_id > %s ORDER BY post_id LIMIT %s',
+                ['' if after is None else self.db_id(after), limit]
+            )
+            return [UUID(post_id) for post_id, in cursor.fetchall()]
+
+    def optimize(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("INSERT INTO posts_caption_fts (posts_caption_fts) VALUES ('optimize')")
+
+    def match_expression(self, terms):
+        return ' '.join('"{}"{}'.format(term, '*' if prefix else '') for term, prefix in terms)
+
+    def search(self, terms, position, reverse, limit):
+        match = self.match_expression(terms)
+        seek, params = '', [match, match, get_setting('MAX_CANDIDATES') - 1]
+        if position is not None:
+            rank, post_id = position
+            op = '<' if reverse else '>'
+            seek = f'WHERE c.rank {op} %s OR (c.rank = %s AND d.post_id {op} %s)'
+            params += [rank, rank, self.db_id(post_id)]
+        direction = 'DESC' if reverse else 'ASC'
+        params.append(limit)
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT d.id, d.post_id, c.rank FROM (
+                    SELECT rowid AS id, bm25(posts_caption_fts) AS rank
+                    FROM posts_caption_fts
+                    WHERE posts_caption_fts MATCH %s AND rowid >= COALESCE((
+                        SELECT rowid FROM posts_caption_fts WHERE posts_caption_fts MATCH %s
+                        ORDER BY rowid DESC LIMIT 1 OFFSET %s
+                    ), 0)
+                ) c
+                JOIN posts_caption_doc d ON d.id = c.id
+                {seek}
+                ORDER BY c.rank {direction}, d.post_id {direction}
+                LIMIT %s
+                """,
+                params
+            )
+            page = cursor.fetchall()
+            if not page:
+                return []
+
+            cursor.execute(
+                """
+                SELECT rowid, snippet(posts_caption_fts, 0, %s, %s, %s, %s)
+                FROM posts_caption_fts
+                WHERE posts_caption_fts MATCH %s AND rowid IN ({})
+                """.format(', '.join(['%s'] * len(page))),
+                [START_MARK, STOP_MARK, '…', get_setting('SNIPPET_WORDS'), match, *(doc_id for doc_id, _, _ in page)]
+            )
+            snippets = dict(cursor.fetchall())
+
+        return [
+            SearchHit(UUID(post_id), rank, highlight(snippets.get(doc_id)))
+            for doc_id, post_id, rank in page
+        ]
+
+
+class PostgresCaptionIndex(CaptionIndex):
+    """
+    Captions and their ``tsvector`` in ``posts_caption_search``, with a GIN
+    index on the vector.
+
+    Matches are found through the GIN index; ``ts_rank_cd`` (negated, so
+    ranks ascend like BM25's) ranks the newest MAX_CANDIDATES of them, and
+    ``ts_headline`` cuts snippets for the page alone.
+    """
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS posts_caption_search (
+            post_id uuid PRIMARY KEY,
+            caption text NOT NULL,
+            document tsvector NOT NULL
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS posts_caption_search_document_idx
+        ON posts_caption_search USING gin (document)
+        """,
+    ]
+
+    def write(self, rows):
+        config = get_setting('TEXT_SEARCH_CONFIG')
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                """
+                INSERT INTO posts_caption_search (post_id, caption, document)
+                VALUES (%s, %s, to_tsvector(%s::regconfig, %s))
+                ON CONFLICT (post_id) DO UPDATE SET caption = excluded.caption, document = excluded.document
+                WHERE posts_caption_search.caption IS DISTINCT FROM excluded.caption
+                """,
+                [(post_id, caption, config, caption) for post_id, caption in rows]
+            )
+
+    def delete(self, post_ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_caption_search WHERE post_id = ANY(%s)', [list(post_ids)])
+
+    def indexed_ids(self, after, limit):
+        with self.connection.cursor() as cursor:
+            if after is None:
+                cursor.execute('SELECT post_id FROM posts_caption_search ORDER BY post_id LIMIT %s', [limit])
+            else:
+                cursor.execute(
+                    'SELECT post_id FROM posts_caption_search WHERE post_id > %s ORDER BY post_id LIMIT %s',
+                    [after, limit]
+                )
+            return [post_id for post_id, in cursor.fetchall()]
+
+    def tsquery(self, terms):
+        # Terms are word characters only, so quoting them is enough
+        return ' & '.join("'{}'{}".format(term, ':*' if prefix else '') for term, prefix in terms)
+
+    def search(self, terms, position, reverse, limit):
+        config, tsquery = get_setting('TEXT_SEARCH_CONFIG'), self.tsquery(terms)
+        params = [config, tsquery, get_setting('MAX_CANDIDATES')]
+        seek = ''
+        if position is not None:
+            seek = 'WHERE (rank, post_id) {} (%s, %s)'.format('<' if reverse else '>')
+            params += list(position)
+        direction = 'DESC' if reverse else 'ASC'
+        words = get_setting('SNIPPET_WORDS')
+        options = f'StartSel={START_MARK}, StopSel={STOP_MARK}, MaxWords={words}, MinWords={max(1, words // 2)}'
+        params += [limit, config, options]
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH candidates AS (
+                    SELECT post_id, caption, document, query
+                    FROM posts_caption_search, to_tsquery(%s::regconfig, %s) query
+                    WHERE document @@ query
+                    ORDER BY post_id DESC
+                    LIMIT %s
+                ), page AS (
+                    SELECT * FROM (
+                        SELECT post_id, caption, query, -ts_rank_cd(document, query) AS rank FROM candidates
+                    ) ranked
+                    {seek}
+                    ORDER BY rank {direction}, post_id {direction}
+                    LIMIT %s
+                )
+                SELECT post_id, rank, ts_headline(%s::regconfig, caption, query, %s)
+                FROM page
+                ORDER BY rank {direction}, post_id {direction}
+                """,
+                params
+            )
+            return [SearchHit(post_id, rank, highlight(snippet)) for post_id, rank, snippet in cursor.fetchall()]
+
+
+INDEXES = {
+    'sqlite': SQLiteCaptionIndex,
+    'postgresql': PostgresCaptionIndex,
+}
+
+
+def get_index(using=DEFAULT_DB_ALIAS):
+    """
+    The caption index of database `using`, or None if its backend has no
+    full-text search supported here.
+    """
+    index_class = INDEXES.get(connections[using].vendor)
+    return index_class(using) if index_class is not None else None
+
+
+def create_index(using=DEFAULT_DB_ALIAS):
+    """
+    Create the side index tables if they do not exist.
+    """
+    index = get_index(using)
+    if index is not None:
+        index.create()
+
+
+def index_posts(posts, using=DEFAULT_DB_ALIAS):
+    """
+    Bring the index up to date with the captions of `posts`.
+    """
+    index = get_index(using)
+    if index is None:
+        return
+    posts = list(posts)
+    index.write([(post.pk, post.caption) for post in posts if post.caption])
+    blank = [post.pk for post in posts if not post.caption]
+    if blank:
+        index.delete(blank)
+
+
+def unindex_posts(post_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Drop the given posts from the index.
+    """
+    index = get_index(using)
+    if index is not None:
+        index.delete(list(post_ids))
+
+
+def search_posts(query, position=None, reverse=False, limit=20, using=DEFAULT_DB_ALIAS):
+    """
+    Full-text search of post captions, best match first.
+
+    Every query term must match (see parse_query). Hits are ranked by BM25
+    on SQLite and by cover density on PostgreSQL, ties broken by post id,
+    among the newest MAX_CANDIDATES matches: term lookups go through the
+    inverted index, and ranking and snippets are bounded by MAX_CANDIDATES
+    and the page size, so the cost of a search does not grow with the
+    number of posts.
+
+    Args:
+        query (str): Text typed by the user.
+        position (tuple | None): ``(rank, post_id)`` of the hit to continue
+            after (see CaptionSearchPagination).
+        reverse (bool): Walk back towards better matches.
+        limit (int): Most hits returned.
+
+    Returns:
+        list: SearchHits (post id, rank, HTML snippet) in the direction of
+        travel.
+    """
+    terms = parse_query(query)
+    index = get_index(using)
+    if not terms or index is None:
+        return []
+    return index.search(terms, position, reverse, limit)
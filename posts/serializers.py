@@ -1,8 +1,10 @@
 from rest_framework import serializers
-from posts.models import Post
+from media_files.fields import ImageVariantsField
+from posts.models import Comment, Post
+from utils.dynamic_fields import DynamicFieldsMixin
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the Post model.
 
@@ -14,19 +16,55 @@ class PostSerializer(serializers.ModelSerializer):
         - username (str): Read-only field displaying the post owner's username.
         - caption (str): Optional caption text.
         - post_image (ImageField): Optional image file.
+        - post_image_variants (dict): Resized WebP/JPEG renditions of the
+          image by variant and format (see media_files), or null.
+        - like_count / comment_count (int): Engagement counts, written behind
+          (see utils.counters) so they may lag by a second.
         - created_at (datetime): Timestamp when the post was created.
+
+    Supports sparse fieldsets (`?fields=`, see DynamicFieldsMixin).
     """
+    # Model columns each output field reads
+    field_columns = {
+        'id': ['id'],
+        'username': ['user__username'],
+        'caption': ['caption'],
+        'post_image': ['post_image'],
+        'post_image_variants': ['post_image'],
+        'like_count': ['like_count'],
+        'comment_count': ['comment_count'],
+        'created_at': ['created_at'],
+    }
     username = serializers.CharField(
         source='user.username',
         read_only=True,
         help_text="Username of the post creator"
     )
+    post_image_variants = ImageVariantsField(source='post_image')
 
     class Meta:
         model = Post
-        fields = ['id', 'username', 'caption', 'post_image', 'created_at']
+        fields = [
+            'id', 'username', 'caption', 'post_image', 'post_image_variants', 'like_count', 'comment_count',
+            'created_at'
+        ]
         read_only_fields = ['user']
 
+    @classmethod
+    def optimize_queryset(cls, queryset, fields=None, expand=None):
+        """
+        Load only the requested columns, joining the owner only for `username`.
+        """
+        if fields is None:
+            return queryset
+        # Ordering and conditional-request columns are always needed
+        columns = {'id', 'created_at', 'version', 'updated_at'}
+        for name in fields:
+            columns.update(cls.field_columns.get(name, ()))
+        if 'username' not in fields:
+            queryset = queryset.select_related(None)
+        return queryset.only(*columns)
+
     def validate(self, data):
         # Get the caption and post_image from incoming data or instance (on update)
         caption = data.get('caption') if 'caption' in data else getattr(self.instance, 'caption', None)
@@ -38,3 +76,39 @@ class PostSerializer(serializers.ModelSerializer):
 
         return data
 
+
+class PostSearchSerializer(PostSerializer):
+    """
+    Serializer for posts in caption search results.
+
+    Fields (besides PostSerializer's):
+        - snippet (str): Excerpt of the caption around the matched words,
+          HTML-escaped, with the matches wrapped in <mark> tags (see
+          posts.search).
+    """
+    field_columns = {**PostSerializer.field_columns, 'snippet': []}
+    snippet = serializers.CharField(read_only=True)
+
+    class Meta(PostSerializer.Meta):
+        fields = [*PostSerializer.Meta.fields, 'snippet']
+
+
+class CommentSerializer(serializers.ModelSerializer):
+    """
+    Serializer for comments on a post.
+
+    Fields:
+        - id (UUID): Unique identifier of the comment.
+        - username (str): Read-only username of the author.
+        - text (str): The comment.
+        - created_at (datetime): Timestamp when the comment was posted.
+    """
+    username = serializers.CharField(
+        source='user.username',
+        read_only=True,
+        help_text="Username of the comment author"
+    )
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'username', 'text', 'created_at']
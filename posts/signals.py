@@ -0,0 +1,50 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from posts.models import Post
+from posts.search import index_posts, unindex_posts
+from posts.timeline import backfill_timeline, fan_out_post, remove_from_timeline
+from user_profile.models import Follow, UserProfile
+from utils.background import background
+from utils.counters import counters
+
+
+@receiver(post_save, sender=Post)
+def schedule_fan_out(sender, instance, created, **kwargs):
+    # Timelines are written off the request, once the post is committed
+    if created:
+        background.submit_on_commit(fan_out_post, instance.pk, key=('fan-out', instance.pk))
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.add(UserProfile, instance.user_id, 'post_count', 1, key_field='user_id')
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.add(UserProfile, instance.user_id, 'post_count', -1, key_field='user_id')
+
+
+@receiver(post_save, sender=Post)
+def sync_caption_index(sender, instance, using, update_fields, **kwargs):
+    # In the saving transaction, so the index commits or rolls back with the post
+    if update_fields is None or 'caption' in update_fields:
+        index_posts([instance], using=using)
+
+
+@receiver(post_delete, sender=Post)
+def drop_from_caption_index(sender, instance, using, **kwargs):
+    unindex_posts([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Follow)
+def schedule_backfill(sender, instance, created, **kwargs):
+    if created:
+        background.submit_on_commit(backfill_timeline, instance.follower_id, instance.followee_id)
+
+
+@receiver(post_delete, sender=Follow)
+def schedule_removal(sender, instance, **kwargs):
+    background.submit_on_commit(remove_from_timeline, instance.follower_id, instance.followee_id)
@@ -1,3 +1,462 @@
-from django.test import TestCase
+import base64
+import json
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from uuid import uuid4
 
-# Create your tests here.
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from posts.models import Like, Post, TimelineEntry
+from posts.serializers import PostSerializer
+from posts.views import PostViewSet
+from user_profile.models import Follow, UserProfile
+from utils.fast_serializers import compile_serializer
+from utils.ids import UUID7Generator
+from utils.renderers import FastJSONRenderer
+from utils.response_cache import VersionedResponseCache, response_cache
+
+User = get_user_model()
+
+
+class FastJSONRendererTests(TestCase):
+    """
+    FastJSONRenderer must produce JSONRenderer's bytes.
+    """
+
+    def test_matches_json_renderer(self):
+        import datetime
+        import decimal
+        import uuid
+
+        data = {
+            'text': 'ünïcödé "quoted"     </script>',
+            'uuid': uuid.uuid4(),
+            'datetime': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'date': datetime.date(2024, 5, 1),
+            'decimal': decimal.Decimal('1.50'),
+            'nested': [{'a': None, 'b': True, 'c': 1.5}, (1, 2)],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indented_output_falls_back(self):
+        data = {'a': [1, 2]}
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4')
+        )
+
+
+class FastPostListTests(TestCase):
+    """
+    The compiled list path must render the same bytes as PostSerializer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f'poster{i}', email=f'poster{i}@example.com', password='secret')
+            for i in range(3)
+        ]
+        for i in range(12):
+            Post.objects.create(
+                user=cls.users[i % 3],
+                caption=f'caption {i} ünï' if i % 4 else '',
+                post_image='posts/image.jpg' if i % 2 else ''
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        token, _ = Token.objects.get_or_create(user=self.users[0])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def get_both(self, url):
+        PostViewSet.fast_list = False
+        try:
+            regular = self.client.get(url)
+        finally:
+            PostViewSet.fast_list = True
+        fast = self.client.get(url)
+        self.assertEqual(regular.status_code, 200)
+        self.assertEqual(fast.status_code, 200)
+        return regular, fast
+
+    def test_serializer_compiles(self):
+        self.assertIsNotNone(compile_serializer(PostSerializer))
+        self.assertIsNotNone(compile_serializer(PostSerializer, {'id': None, 'username': None}))
+
+    def test_list_is_byte_identical(self):
+        for url in ['/api/posts/', '/api/posts/?page_size=5', '/api/posts/?fields=id,username,post_image']:
+            regular, fast = self.get_both(url)
+            self.assertEqual(regular.content, fast.content, url)
+            self.assertEqual(regular['ETag'], fast['ETag'], url)
+
+    def test_cursor_pages_are_byte_identical(self):
+        next_url = self.client.get('/api/posts/?page_size=5').json()['next']
+        regular, fast = self.get_both(next_url)
+        self.assertEqual(regular.content, fast.content)
+
+    def test_conditional_list(self):
+        response = self.client.get('/api/posts/')
+        not_modified = self.client.get('/api/posts/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+
+def forged_cursor(*position):
+    payload = json.dumps({'p': list(position), 'r': 0}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+class ForgedCursorTests(TestCase):
+    """
+    Cursors whose values do not fit their ordering fields are not found
+    rather than reaching the database.
+    """
+
+    def test_forged_cursors_are_not_found(self):
+        user = User.objects.create_user(username='reader', email='reader@example.com', password='secret')
+        Post.objects.create(user=user, caption='hello')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+        for url in ('/api/posts/', '/api/posts/feed/'):
+            for value in ('nope', None, {'a': 1}, [1]):
+                response = client.get(url, {'cursor': forged_cursor(value)})
+                self.assertEqual(response.status_code, 404, (url, value))
+                self.assertIn('message', response.json())
+
+
+class ResponseCacheTests(TestCase):
+    """
+    Post payloads are cached per version, scheme and host, and each miss is
+    computed once.
+    """
+
+    def setUp(self):
+        self.cache = caches['responses']
+        self.cache.clear()
+        response_cache.reset_stats()
+        self.addCleanup(self.cache.clear)
+        user = User.objects.create_user(username='author', email='author@example.com', password='secret')
+        self.post = Post.objects.create(user=user, caption='first', post_image='posts/image.jpg')
+        self.url = f'/api/posts/{self.post.pk}/'
+
+    def test_hits_misses_and_version_bumps(self):
+        first = self.client.get(self.url).json()
+        self.assertEqual(self.client.get(self.url).json(), first)
+        self.assertEqual(response_cache.stats()['post'], {'hits': 1, 'misses': 1, 'coalesced': 0, 'hit_ratio': 0.5})
+
+        self.post.caption = 'edited'
+        self.post.save()
+        self.assertEqual(self.client.get(self.url).json()['caption'], 'edited')
+        self.assertEqual(response_cache.stats()['post']['misses'], 2)
+
+    def test_scheme_is_part_of_the_key(self):
+        plain = self.client.get(self.url)
+        secure = self.client.get(self.url, secure=True)
+        self.assertTrue(plain.json()['post_image'].startswith('http://'))
+        self.assertTrue(secure.json()['post_image'].startswith('https://'))
+        self.assertNotEqual(plain['ETag'], secure['ETag'])
+        self.assertEqual(response_cache.stats()['post']['misses'], 2)
+
+    def test_concurrent_misses_compute_once(self):
+        cache, calls = VersionedResponseCache(), []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return {'computed': True}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_compute('post', ('a', 1), compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual((len(calls), results), (1, [{'computed': True}] * 5))
+        self.assertEqual(cache.stats()['post'], {'hits': 0, 'misses': 1, 'coalesced': 4, 'hit_ratio': 0.8})
+
+    def test_waits_for_another_workers_lease(self):
+        cache = VersionedResponseCache()
+        key = cache.make_key('post', ('a', 1))
+        # Another process holds the lease and publishes shortly
+        self.assertTrue(self.cache.add(f'{key}:lease', 1))
+        timer = threading.Timer(0.05, self.cache.set, (key, {'shared': True}))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        payload = cache.get_or_compute('post', ('a', 1), lambda: self.fail('computed despite the lease'))
+        self.assertEqual(payload, {'shared': True})
+        self.assertEqual(cache.stats()['post']['coalesced'], 1)
+
+
+@override_settings(
+    BACKGROUND_TASKS={'EAGER': True}, COUNTERS={'EAGER': True}, HOME_TIMELINE={'CELEBRITY_FOLLOWERS': 2}
+)
+class FeedTests(TestCase):
+    """
+    The home feed merges fanned-out posts with celebrities' posts read on
+    demand, and follows shape it.
+    """
+
+    def setUp(self):
+        self.reader, self.friend, self.celebrity, self.fan = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='secret')
+            for name in ('reader', 'friend', 'celebrity', 'fan')
+        ]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.reader).key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            for follower, followee in [(self.reader, self.friend), (self.reader, self.celebrity), (self.fan, self.celebrity)]:
+                Follow.objects.create(follower=follower, followee=followee)
+
+    def post(self, user, caption):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(user=user, caption=caption)
+
+    def feed(self, query=''):
+        response = self.client.get(f'/api/posts/feed/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_merges_timeline_and_celebrity_posts(self):
+        self.post(self.friend, 'friend 1')
+        self.post(self.celebrity, 'celebrity 1')
+        self.post(self.fan, 'not followed')
+        self.post(self.reader, 'own')
+        self.post(self.friend, 'friend 2')
+
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.reader, post__user=self.celebrity).exists())
+        expected = ['friend 2', 'own', 'celebrity 1', 'friend 1']
+        self.assertEqual([post['caption'] for post in self.feed()['results']], expected)
+
+        captions, page = [], self.feed('?page_size=1')
+        captions += [post['caption'] for post in page['results']]
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            captions += [post['caption'] for post in page['results']]
+        self.assertEqual(captions, expected)
+
+    def test_unfollow_removes_posts(self):
+        self.post(self.friend, 'friend 1')
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.get(follower=self.reader, followee=self.friend).delete()
+        self.assertEqual(self.feed()['results'], [])
+        self.assertEqual(UserProfile.objects.get(user=self.friend).follower_count, 0)
+
+
+@override_settings(BACKGROUND_TASKS={'EAGER': True}, COUNTERS={'EAGER': True})
+class CounterTests(TestCase):
+    """
+    Engagement counts follow likes and comments, and can be reconciled.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='secret')
+        self.fan = User.objects.create_user(username='fan', email='fan@example.com', password='secret')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.fan).key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Post.objects.create(user=self.author, caption='hello')
+
+    def test_likes_and_comments_are_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(f'/api/posts/{self.post.pk}/like/').status_code, 201)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(f'/api/posts/{self.post.pk}/like/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/posts/{self.post.pk}/comments/', {'text': 'nice'})
+        self.assertEqual(response.status_code, 201)
+
+        data = self.client.get(f'/api/posts/{self.post.pk}/').json()
+        self.assertEqual((data['like_count'], data['comment_count']), (1, 1))
+        self.assertEqual(UserProfile.objects.get(user=self.author).post_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/posts/{self.post.pk}/like/')
+        self.assertEqual(self.client.get(f'/api/posts/{self.post.pk}/').json()['like_count'], 0)
+
+    def test_edits_keep_counts_flushed_meanwhile(self):
+        post = Post.objects.get(pk=self.post.pk)
+        profile = UserProfile.objects.get(user=self.author)
+        # Flushed by the counter buffer while the edits are in flight
+        Post.objects.filter(pk=post.pk).update(like_count=5, comment_count=2)
+        UserProfile.objects.filter(user=self.author).update(post_count=9)
+
+        post.caption = 'edited'
+        post.save()
+        profile.bio = 'edited'
+        profile.save()
+
+        self.assertEqual(
+            Post.objects.values_list('caption', 'like_count', 'comment_count').get(pk=post.pk), ('edited', 5, 2)
+        )
+        self.assertEqual((post.like_count, post.comment_count), (5, 2))
+        self.assertEqual(UserProfile.objects.values_list('bio', 'post_count').get(pk=profile.pk), ('edited', 9))
+
+    def test_reconcile_fixes_drift(self):
+        Like.objects.create(post=self.post, user=self.fan)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=5)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+
+
+class CaptionSearchTests(TestCase):
+    """
+    Caption search follows post edits and deletes, pages by rank and escapes
+    captions in snippets.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='secret')
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get(f'/api/posts/search/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_matches_prefixes_and_highlights(self):
+        Post.objects.create(user=self.author, caption='Sunset over the <b>bay</b>')
+        Post.objects.create(user=self.author, caption='Morning coffee')
+
+        results = self.search('?q=sun')['results']
+        self.assertEqual([post['caption'] for post in results], ['Sunset over the <b>bay</b>'])
+        self.assertEqual(
+            self.search('?q=bay')['results'][0]['snippet'], 'Sunset over the &lt;b&gt;<mark>bay</mark>&lt;/b&gt;'
+        )
+        self.assertEqual(self.search('?q=sunset coffee')['results'], [])
+
+    def test_follows_edits_and_deletes(self):
+        post = Post.objects.create(user=self.author, caption='harbour lights')
+        post.caption = 'mountain trail'
+        post.save()
+        self.assertEqual(self.search('?q=harbour')['results'], [])
+        self.assertEqual(len(self.search('?q=mountain')['results']), 1)
+
+        post.delete()
+        self.assertEqual(self.search('?q=mountain')['results'], [])
+
+    def test_pages_best_match_first(self):
+        best = Post.objects.create(user=self.author, caption='tide tide tide')
+        for i in range(4):
+            Post.objects.create(user=self.author, caption=f'tide pools and rocks {i}')
+
+        ids, page = [], self.search('?q=tide&page_size=2')
+        ids += [post['id'] for post in page['results']]
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            ids += [post['id'] for post in page['results']]
+        self.assertEqual(len(set(ids)), 5)
+        self.assertEqual(ids[0], str(best.pk))
+
+    def test_rebuild_indexes_existing_posts(self):
+        post = Post.objects.create(user=self.author, caption='old lighthouse')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_caption_doc')
+        self.assertEqual(self.search('?q=lighthouse')['results'], [])
+
+        call_command('rebuild_caption_index', stdout=StringIO())
+        self.assertEqual([result['id'] for result in self.search('?q=lighthouse')['results']], [str(post.pk)])
+
+
+class UUID7Tests(SimpleTestCase):
+    """
+    Generated ids are version 7 and strictly increasing, as integers and as
+    the hex text SQLite stores.
+    """
+
+    def assert_increasing(self, ids):
+        self.assertTrue(all(uid.version == 7 for uid in ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(sorted(ids), ids)
+        self.assertEqual(sorted(uid.hex for uid in ids), [uid.hex for uid in ids])
+
+    def test_burst_is_monotonic(self):
+        generate = UUID7Generator()
+        self.assert_increasing([generate() for _ in range(20_000)])
+
+    def test_embedded_times_and_clock_steps(self):
+        generate = UUID7Generator()
+        now = timezone.now()
+        ids = [generate(now) for _ in range(5000)]
+        # A clock stepping back still yields larger ids
+        ids += [generate(now - timedelta(seconds=1)) for _ in range(10)]
+        self.assert_increasing(ids)
+        self.assertEqual(ids[0].int >> 80, int(now.timestamp() * 1000))
+
+
+class RekeyTests(TestCase):
+    """
+    rekey_uuid7 rewrites random keys and every reference to them, keeping
+    creation order.
+    """
+
+    def setUp(self):
+        start = timezone.now() - timedelta(days=1)
+        self.users = []
+        for i in range(3):
+            user = User.objects.create_user(
+                id=uuid4(), username=f'old{i}', email=f'old{i}@example.com', password='secret'
+            )
+            User.objects.filter(pk=user.pk).update(date_joined=start + timedelta(minutes=i))
+            UserProfile.objects.get_or_create(user=user)
+            self.users.append(user)
+        Follow.objects.create(follower=self.users[1], followee=self.users[0])
+
+        # Several posts share a timestamp, so batches split inside a tie
+        times = [start + timedelta(hours=hour) for hour in (1, 2, 2, 2, 3)]
+        self.posts = []
+        for i, created in enumerate(times):
+            post = Post.objects.create(id=uuid4(), user=self.users[i % 3], caption=f'post {i}')
+            Post.objects.filter(pk=post.pk).update(created_at=created)
+            Like.objects.create(post=post, user=self.users[(i + 1) % 3])
+            TimelineEntry.objects.create(owner=self.users[2], post=post)
+            self.posts.append(post)
+        LogEntry.objects.log_actions(
+            self.users[0].pk, [self.posts[0]], ADDITION, single_object=True
+        )
+
+    def test_rekeys_everything_in_creation_order(self):
+        captions = list(Post.objects.order_by('created_at', 'pk').values_list('caption', flat=True))
+        out = StringIO()
+        call_command('rekey_uuid7', batch_size=2, stdout=out)
+        self.assertIn('Rekeyed 5 posts.', out.getvalue())
+        # The tie at the end of the first batch is finished in it; no row is visited twice
+        progress = [line for line in out.getvalue().splitlines() if line.startswith('Post:')]
+        self.assertEqual(progress, ['Post: 4 rows rekeyed so far.', 'Post: 5 rows rekeyed so far.'])
+        self.assertIn('Rekeyed 3 users.', out.getvalue())
+
+        self.assertTrue(all(pk.version == 7 for pk in Post.objects.values_list('pk', flat=True)))
+        self.assertTrue(all(pk.version == 7 for pk in User.objects.values_list('pk', flat=True)))
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('caption', flat=True)), captions)
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA foreign_key_check')
+            self.assertEqual(cursor.fetchall(), [])
+        self.assertEqual(Like.objects.filter(post__in=Post.objects.all()).count(), 5)
+        self.assertEqual(TimelineEntry.objects.filter(owner__username='old2').count(), 5)
+        self.assertTrue(Follow.objects.filter(follower__username='old1', followee__username='old0').exists())
+        self.assertEqual(
+            LogEntry.objects.get().object_id, str(Post.objects.get(caption='post 0').pk)
+        )
+
+        # Nothing is left to do on a second run
+        out = StringIO()
+        call_command('rekey_uuid7', stdout=out)
+        self.assertIn('Rekeyed 0 posts.', out.getvalue())
@@ -0,0 +1,132 @@
+import random
+from functools import partial
+
+from posts.models import Post, TimelineEntry
+from user_profile.models import Follow, UserProfile
+from utils import app_settings
+
+DEFAULTS = {
+    # Entries kept per timeline; older posts fall off.
+    'MAX_LENGTH': 800,
+    # Authors with at least this many followers are not fanned out on write;
+    # their posts are merged into followers' feeds on read instead.
+    'CELEBRITY_FOLLOWERS': 10_000,
+    # Followers written per INSERT during fan-out.
+    'FAN_OUT_BATCH': 1000,
+    # Each write trims about one in this many of the timelines it touched, so
+    # a timeline overshoots MAX_LENGTH by this much on average.
+    'TRIM_EVERY': 50,
+    # Recent posts copied into a timeline when its owner follows someone.
+    'BACKFILL': 50,
+}
+
+
+get_setting = partial(app_settings.get_setting, 'HOME_TIMELINE', DEFAULTS)
+
+
+def is_celebrity(user_id):
+    """
+    Whether `user_id`'s posts are fanned out on read rather than on write.
+    """
+    followers = UserProfile.objects.filter(user_id=user_id).values_list('follower_count', flat=True).first()
+    return (followers or 0) >= get_setting('CELEBRITY_FOLLOWERS')
+
+
+def celebrity_followees(user_id):
+    """
+    Accounts followed by `user_id` whose posts are fanned out on read.
+    """
+    return list(Follow.objects.filter(
+        follower_id=user_id,
+        followee__userprofile__follower_count__gte=get_setting('CELEBRITY_FOLLOWERS')
+    ).values_list('followee_id', flat=True))
+
+
+def feed_sources(user_id):
+    """
+    Id sources of `user_id`'s home feed, for FeedPagination: the materialized
+    timeline, plus the posts of followed celebrities.
+
+    Returns:
+        list: ``(queryset, id column)`` pairs.
+    """
+    sources = [(TimelineEntry.objects.filter(owner_id=user_id), 'post_id')]
+    celebrities = celebrity_followees(user_id)
+    if celebrities:
+        sources.append((Post.objects.filter(user_id__in=celebrities), 'id'))
+    return sources
+
+
+def add_to_timelines(owner_ids, post_ids):
+    """
+    Insert every post into every owner's timeline, skipping existing entries,
+    and trim a sample of the timelines touched.
+    """
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(owner_id=owner_id, post_id=post_id) for owner_id in owner_ids for post_id in post_ids],
+        ignore_conflicts=True
+    )
+    trim_every = get_setting('TRIM_EVERY')
+    for owner_id in owner_ids:
+        if random.random() * trim_every < 1:
+            trim_timeline(owner_id)
+
+
+def trim_timeline(owner_id):
+    """
+    Drop the entries of `owner_id`'s timeline beyond MAX_LENGTH.
+    """
+    max_length = get_setting('MAX_LENGTH')
+    cutoff = list(TimelineEntry.objects.filter(
+        owner_id=owner_id
+    ).order_by('-post_id').values_list('post_id', flat=True)[max_length:max_length + 1])
+    if cutoff:
+        TimelineEntry.objects.filter(owner_id=owner_id, post_id__lte=cutoff[0]).delete()
+
+
+def fan_out_post(post_id):
+    """
+    Write a new post into its author's timeline and, unless the author is a
+    celebrity, into every follower's, in batches walked by follower id.
+    """
+    author_id = Post.objects.filter(pk=post_id).values_list('user_id', flat=True).first()
+    if author_id is None:
+        return
+    add_to_timelines([author_id], [post_id])
+    if is_celebrity(author_id):
+        return
+
+    batch_size = get_setting('FAN_OUT_BATCH')
+    followers = Follow.objects.filter(followee_id=author_id).order_by('follower_id')
+    last_id = None
+    while True:
+        batch = followers if last_id is None else followers.filter(follower_id__gt=last_id)
+        follower_ids = list(batch.values_list('follower_id', flat=True)[:batch_size])
+        if not follower_ids:
+            break
+        add_to_timelines(follower_ids, [post_id])
+        last_id = follower_ids[-1]
+
+
+def backfill_timeline(follower_id, followee_id):
+    """
+    Copy the followee's recent posts into a new follower's timeline; a
+    celebrity's are read on demand instead.
+    """
+    if is_celebrity(followee_id):
+        return
+    post_ids = list(Post.objects.filter(
+        user_id=followee_id
+    ).order_by('-id').values_list('id', flat=True)[:get_setting('BACKFILL')])
+    if post_ids:
+        add_to_timelines([follower_id], post_ids)
+        # An unfollow whose cleanup ran before this insert would leave these behind
+        if not Follow.objects.filter(follower_id=follower_id, followee_id=followee_id).exists():
+            remove_from_timeline(follower_id, followee_id)
+
+
+def remove_from_timeline(follower_id, followee_id):
+    """
+    Drop the followee's posts from a former follower's timeline.
+    """
+    TimelineEntry.objects.filter(owner_id=follower_id, post__user_id=followee_id).delete()
@@ -1,9 +1,16 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from posts.views import PostViewSet
+from posts.views import CommentViewSet, PostViewSet
 
 router = DefaultRouter()
 router.register('', PostViewSet, basename='posts')
 
-urlpatterns = router.urls
+# Nested under a post; declared by hand as the posts router has no prefix
+comment_list = CommentViewSet.as_view({'get': 'list', 'post': 'create'})
+comment_detail = CommentViewSet.as_view({'get': 'retrieve', 'delete': 'destroy'})
+
+urlpatterns = [
+    path('<uuid:post_pk>/comments/', comment_list, name='post-comments-list'),
+    path('<uuid:post_pk>/comments/<uuid:pk>/', comment_detail, name='post-comments-detail'),
+] + router.urls
@@ -1,13 +1,29 @@
-from rest_framework import viewsets
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.response import Response
 
-from posts.models import Post
-from posts.serializers import PostSerializer
+from media_files.uploads import BoundedImageUploadMixin
+from posts.models import Comment, Like, Post
+from posts.pagination import CaptionSearchPagination, CommentCursorPagination, FeedPagination, PostCursorPagination
+from posts.serializers import CommentSerializer, PostSearchSerializer, PostSerializer
 from posts.permissions import IsOwnerOrReadOnly
+from posts.timeline import feed_sources
+from utils.conditional import ConditionalMixin
+from utils.counters import counters
+from utils.dynamic_fields import DynamicFieldsViewMixin
+from utils.fast_serializers import FastListMixin
+from utils.response_cache import VersionedCacheMixin
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(
+    BoundedImageUploadMixin, FastListMixin, ConditionalMixin, VersionedCacheMixin, DynamicFieldsViewMixin,
+    viewsets.ModelViewSet
+):
     """
     ViewSet for managing user posts.
 
@@ -17,16 +33,88 @@ class PostViewSet(viewsets.ModelViewSet):
         - Only post owners can update or delete their posts.
         - Unauthenticated users have read-only access.
 
+    Listing is cursor paginated, newest first (see PostCursorPagination), and the
+    post owner is joined in so serializing `username` costs no extra queries.
+    Retrieval is cached per post version (see VersionedCacheMixin), and both
+    list and retrieve answer conditional requests (see ConditionalMixin).
+    `?fields=` trims the output and the columns loaded (see DynamicFieldsMixin).
+    Pages are rendered from values() rows by the compiled serializer (see
+    FastListMixin). Image uploads are size-checked from their headers while
+    streaming (see BoundedImageUploadMixin).
+
     Supported Actions:
-        - GET (list): Retrieve a list of all posts.
+        - GET (list): Retrieve a page of posts.
+        - GET (feed): Retrieve a page of the requester's home timeline.
+        - GET (search): Search captions (`?q=`), best match first.
+        - POST/DELETE (like): Like or unlike a post (authenticated users only).
         - GET (retrieve): Retrieve a specific post by its ID.
         - POST (create): Create a new post (authenticated users only).
         - PUT/PATCH (update): Update an existing post (owners only).
         - DELETE (destroy): Delete a post (owners only).
     """
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    queryset = Post.objects.all()
+    queryset = Post.objects.select_related('user')
     serializer_class = PostSerializer
+    pagination_class = PostCursorPagination
+    cache_endpoint = 'post'
+    fast_list_columns = ('version',)
+
+    def get_queryset(self):
+        return self.optimize_queryset(super().get_queryset())
+
+    @action(detail=False, permission_classes=[IsAuthenticated], pagination_class=FeedPagination)
+    def feed(self, request, *args, **kwargs):
+        """
+        Page through the requester's home timeline, newest first: their own
+        posts and those of the accounts they follow.
+
+        The timeline is materialized on write (see posts.timeline), so a page
+        is one range query on the requester's entries however many accounts
+        they follow, plus one on the posts of followed celebrities, whose
+        posts are merged in on read.
+        """
+        self.paginator.sources = feed_sources(request.user.pk)
+        return self.list(request, *args, **kwargs)
+
+    @action(detail=False, pagination_class=CaptionSearchPagination, serializer_class=PostSearchSerializer)
+    def search(self, request, *args, **kwargs):
+        """
+        Page through the posts whose captions match `?q=`, best match first,
+        each with a highlighted `snippet` of its caption.
+
+        All words must match; the last one (and any followed by ``*``) also
+        matches as a prefix. Matches come from the full-text side index (see
+        posts.search), never from a scan of the posts table.
+        """
+        self.paginator.query = request.query_params.get('q', '')
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
+    def like(self, request, *args, **kwargs):
+        """
+        Like (POST) or unlike (DELETE) a post.
+
+        POST answers 201 for a new like and 200 if it existed; DELETE answers
+        204 either way. `like_count` follows within a flush interval (see
+        utils.counters).
+        """
+        post = self.get_object()
+        if request.method == 'DELETE':
+            deleted, _ = Like.objects.filter(post=post, user=request.user).delete()
+            if deleted:
+                counters.add(Post, post.pk, 'like_count', -1)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        try:
+            with transaction.atomic():
+                _, created = Like.objects.get_or_create(post=post, user=request.user)
+        except IntegrityError:
+            # A concurrent request created it first
+            created = False
+        if created:
+            counters.add(Post, post.pk, 'like_count', 1)
+        return Response({'liked': True}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
     def get_object(self):
         """
@@ -43,6 +131,51 @@ class PostViewSet(viewsets.ModelViewSet):
         except NotFound:
             raise NotFound(detail="Post not found with given identifier.")
 
+    def get_cache_version(self):
+        """
+        Identify the cached response by post id, version and owner username.
+
+        The username is part of the key because the payload flattens it and
+        renaming a user does not touch their posts.
+
+        Returns:
+            tuple | None: Version tuple, or None if there is no such post.
+        """
+        try:
+            return Post.objects.filter(
+                pk=self.kwargs[self.lookup_field]
+            ).values_list('pk', 'version', 'user__username', 'updated_at').first()
+        except ValidationError:
+            return None
+
+    def get_object_validators(self):
+        """
+        Validators of a single post, from the same lookup as the cache key.
+
+        Last-Modified follows the post's own edits; the ETag also covers the
+        owner's username.
+        """
+        version = self.get_current_version()
+        if version is None:
+            return None
+        return version, version[3]
+
+    def get_list_validators(self, rows):
+        """
+        Validators of a feed page: every post's version and owner, plus whether
+        neighbouring pages exist (the links in the body).
+
+        Rows are posts, or values() dicts on the fast path.
+        """
+        parts = [
+            # The owner is only joined when `username` is rendered
+            (post['id'], post['version'], post.get('user__username')) if isinstance(post, dict)
+            else (post.pk, post.version, post.user.username if Post.user.is_cached(post) else None)
+            for post in rows
+        ]
+        parts.append((self.paginator.has_next, self.paginator.has_previous))
+        return parts, None
+
     def perform_create(self, serializer):
         """
         Save a new Post instance with the current authenticated user as the owner.
@@ -52,3 +185,53 @@ class PostViewSet(viewsets.ModelViewSet):
         """
         serializer.save(user=self.request.user)
 
+
+class CommentViewSet(
+    mixins.ListModelMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin,
+    viewsets.GenericViewSet
+):
+    """
+    ViewSet for the comments of a post, nested under it.
+
+    Permissions:
+        - Authenticated users can comment.
+        - Only comment authors can delete their comments.
+        - Unauthenticated users have read-only access.
+
+    Listing is cursor paginated, oldest first (see CommentCursorPagination).
+    `Post.comment_count` is maintained on create and delete (see
+    utils.counters).
+
+    Supported Actions:
+        - GET (list): Retrieve a page of a post's comments.
+        - GET (retrieve): Retrieve a specific comment.
+        - POST (create): Comment on the post.
+        - DELETE (destroy): Delete a comment (authors only).
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    serializer_class = CommentSerializer
+    pagination_class = CommentCursorPagination
+
+    def get_post(self):
+        """
+        Return the post from the URL.
+
+        Raises:
+            Http404: If no Post with the given ID exists.
+        """
+        return get_object_or_404(Post.objects.only('pk'), pk=self.kwargs['post_pk'])
+
+    def get_queryset(self):
+        return Comment.objects.filter(post_id=self.kwargs['post_pk']).select_related('user')
+
+    def list(self, request, *args, **kwargs):
+        self.get_post()
+        return super().list(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        comment = serializer.save(post=self.get_post(), user=self.request.user)
+        counters.add(Post, comment.post_id, 'comment_count', 1)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        counters.add(Post, instance.post_id, 'comment_count', -1)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from user_profile.models import UserProfile
+from user_profile.models import Follow, UserProfile
 
 # Register your models here.
-admin.site.register(UserProfile)
\ No newline at end of file
+admin.site.register(UserProfile)
+admin.site.register(Follow)
@@ -1,7 +1,9 @@
-import uuid
 from django.db import models
+from django.db.models import F, Q
 from django.contrib.auth import get_user_model
 
+from utils.ids import uuid7
+
 # Get the custom User model
 User = get_user_model()
 
@@ -10,14 +12,20 @@ class UserProfile(models.Model):
     Model to store additional user profile information.
 
     Fields:
-        - id (UUID): Primary key, auto-generated UUID for uniqueness.
+        - id (UUID): Primary key, time-ordered UUIDv7 (see utils.ids).
         - user (OneToOne): One-to-one link to the User model.
         - profile_pic (ImageField): Optional profile image uploaded by the user.
         - bio (TextField): Optional short biography or user description.
+        - follower_count / following_count (PositiveInteger): Denormalized
+          from Follow by user_profile.signals.
+        - post_count (PositiveInteger): Denormalized, written behind by
+          utils.counters.
+        - version (PositiveInteger): Bumped whenever the profile or the user
+          fields it exposes change; keys cached responses.
     """
     id = models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         editable=False
     )
     user = models.OneToOneField(
@@ -36,6 +44,31 @@ class UserProfile(models.Model):
         blank=True,
         help_text="Optional bio or user description"
     )
+    follower_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of users following this user"
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of users this user follows"
+    )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of posts by this user"
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text="Incremented on every update"
+    )
+
+    # Columns only changed by ``UPDATE ... SET col = col + n`` (signals and
+    # utils.counters); `save()` leaves them alone so it cannot overwrite
+    # concurrent changes with stale values.
+    counter_fields = ('follower_count', 'following_count', 'post_count')
 
     def __str__(self):
         """
@@ -45,3 +78,72 @@ class UserProfile(models.Model):
             str: Username of the associated user.
         """
         return self.user.username
+
+    def save(self, *args, **kwargs):
+        """
+        Save the profile, atomically bumping `version` when updating.
+
+        Updates write every column but the counters (see `counter_fields`),
+        which are reloaded instead, unless `update_fields` names them.
+        """
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        self.version = F('version') + 1
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = {
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            }
+        kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version', *self.counter_fields])
+
+    @classmethod
+    def bump_version(cls, user):
+        """
+        Invalidate cached responses of `user`'s profile.
+        """
+        cls.objects.filter(user=user).update(version=F('version') + 1)
+
+
+class Follow(models.Model):
+    """
+    A user following another user's posts.
+
+    Fields:
+        - follower (ForeignKey): User who follows.
+        - followee (ForeignKey): User being followed.
+        - created_at (DateTime): When the follow started.
+
+    The unique (follower, followee) constraint doubles as the index for "who
+    does this user follow"; (followee, follower) serves fan-out over an
+    author's followers (see posts.timeline).
+    """
+    follower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        help_text="User who follows"
+    )
+    followee = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='followers',
+        help_text="User being followed"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp of the follow"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followee'], name='unique_follow'),
+            models.CheckConstraint(condition=~Q(follower=F('followee')), name='follow_not_self'),
+        ]
+        indexes = [
+            models.Index(fields=['followee', 'follower'], name='follow_followee_follower_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.follower_id} follows {self.followee_id}"
@@ -0,0 +1,10 @@
+from utils.pagination import KeysetPagination
+
+
+class FollowCursorPagination(KeysetPagination):
+    """
+    Cursor pagination for follower and following lists, newest follow first.
+
+    Follow ids are sequential, so they order follows by creation on their own.
+    """
+    ordering = ('-id',)
@@ -1,22 +1,44 @@
 from rest_framework import serializers
-from user_profile.models import UserProfile
+from media_files.fields import ImageVariantsField
+from user_profile.models import Follow, UserProfile
+from utils.dynamic_fields import DynamicFieldsMixin
 from django.contrib.auth import get_user_model
 
 # Get the user model (custom or default)
 User = get_user_model()
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the UserProfile model with flattened user fields.
 
-    Exposes the related User model's fields (username, email, etc.) directly in the output.
+    Exposes the related User model's fields (username, email, etc.) directly in the output,
+    the profile picture's resized variants (see media_files) and the
+    read-only follower, following and post counts.
     Also performs validation to ensure the uniqueness of username and email.
+    Supports sparse fieldsets (`?fields=`, see DynamicFieldsMixin).
     """
     user_id = serializers.CharField(source='user.id', read_only=True)
     username = serializers.CharField(source='user.username')
     email = serializers.EmailField(source='user.email')
     first_name = serializers.CharField(source='user.first_name', allow_blank=True)
     last_name = serializers.CharField(source='user.last_name', allow_blank=True)
+    profile_pic_variants = ImageVariantsField(source='profile_pic')
+
+    # Model columns each output field reads
+    field_columns = {
+        'id': ['id'],
+        'user_id': ['user__id'],
+        'username': ['user__username'],
+        'email': ['user__email'],
+        'first_name': ['user__first_name'],
+        'last_name': ['user__last_name'],
+        'profile_pic': ['profile_pic'],
+        'profile_pic_variants': ['profile_pic'],
+        'bio': ['bio'],
+        'follower_count': ['follower_count'],
+        'following_count': ['following_count'],
+        'post_count': ['post_count'],
+    }
 
     class Meta:
         model = UserProfile
@@ -28,9 +50,28 @@ class ProfileSerializer(serializers.ModelSerializer):
             'first_name',
             'last_name',
             'profile_pic',
-            'bio'
+            'profile_pic_variants',
+            'bio',
+            'follower_count',
+            'following_count',
+            'post_count'
         ]
 
+    @classmethod
+    def optimize_queryset(cls, queryset, fields=None, expand=None):
+        """
+        Load only the requested columns, joining the user only when one of its
+        fields is rendered.
+        """
+        if fields is None:
+            return queryset
+        columns = {'id', 'user'}
+        for name in fields:
+            columns.update(cls.field_columns.get(name, ()))
+        if not any(column.startswith('user__') for column in columns):
+            queryset = queryset.select_related(None)
+        return queryset.only(*columns)
+
     def validate(self, attrs):
         """
         Validate nested user data to ensure uniqueness of username and email.
@@ -90,3 +131,29 @@ class ProfileSerializer(serializers.ModelSerializer):
         user.save()
 
         return instance
+
+
+class FollowerSerializer(serializers.ModelSerializer):
+    """
+    A follow as listed among a user's followers: who follows and since when.
+    """
+    user_id = serializers.CharField(source='follower.id', read_only=True)
+    username = serializers.CharField(source='follower.username', read_only=True)
+    followed_at = serializers.DateTimeField(source='created_at', read_only=True)
+
+    class Meta:
+        model = Follow
+        fields = ['user_id', 'username', 'followed_at']
+
+
+class FollowingSerializer(serializers.ModelSerializer):
+    """
+    A follow as listed among the accounts a user follows: who and since when.
+    """
+    user_id = serializers.CharField(source='followee.id', read_only=True)
+    username = serializers.CharField(source='followee.username', read_only=True)
+    followed_at = serializers.DateTimeField(source='created_at', read_only=True)
+
+    class Meta:
+        model = Follow
+        fields = ['user_id', 'username', 'followed_at']
@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import UserProfile
+from .models import Follow, UserProfile
 
 User = get_user_model()
 
@@ -11,3 +12,39 @@ def create_user_profile(sender, instance, created, **kwargs):
         # Automatically create a UserProfile for every new user
         UserProfile.objects.create(user=instance)
 
+
+# User fields that ProfileSerializer exposes
+PROFILE_USER_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def bump_profile_version(sender, instance, created, update_fields=None, **kwargs):
+    # Cached profile responses flatten these user fields; logins and password
+    # changes (saved with update_fields) leave them untouched.
+    if created:
+        return
+    if update_fields is None or PROFILE_USER_FIELDS & set(update_fields):
+        UserProfile.bump_version(instance)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    # Profiles render the counts, so cached responses are invalidated too
+    if created:
+        UserProfile.objects.filter(user_id=instance.followee_id).update(
+            follower_count=F('follower_count') + 1, version=F('version') + 1
+        )
+        UserProfile.objects.filter(user_id=instance.follower_id).update(
+            following_count=F('following_count') + 1, version=F('version') + 1
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    # Also runs for follows cascading from a deleted user
+    UserProfile.objects.filter(user_id=instance.followee_id, follower_count__gt=0).update(
+        follower_count=F('follower_count') - 1, version=F('version') + 1
+    )
+    UserProfile.objects.filter(user_id=instance.follower_id, following_count__gt=0).update(
+        following_count=F('following_count') - 1, version=F('version') + 1
+    )
@@ -1,3 +1,47 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from user_profile.models import Follow, UserProfile
+from user_profile.serializers import ProfileSerializer
+
+User = get_user_model()
+
+
+class FollowCountTests(TestCase):
+    """
+    Follow counts survive concurrent profile edits and can be reconciled.
+    """
+
+    def setUp(self):
+        self.alice, self.bob = [
+            User.objects.create_user(username=name, email=f'{name}@example.com', password='secret')
+            for name in ('alice', 'bob')
+        ]
+
+    def counts(self, user):
+        return UserProfile.objects.values_list('follower_count', 'following_count').get(user=user)
+
+    def test_profile_edit_keeps_concurrent_follows(self):
+        profile = UserProfile.objects.get(user=self.alice)
+        # Counted by UPDATE while the edit is in flight
+        Follow.objects.create(follower=self.bob, followee=self.alice)
+
+        serializer = ProfileSerializer(profile, data={'bio': 'hello'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(self.counts(self.alice), (1, 0))
+        self.assertEqual(profile.follower_count, 1)
+        self.assertEqual(UserProfile.objects.get(user=self.alice).bio, 'hello')
+
+    def test_reconcile_fixes_follow_counts(self):
+        Follow.objects.create(follower=self.bob, followee=self.alice)
+        UserProfile.objects.filter(user=self.alice).update(follower_count=7)
+        UserProfile.objects.filter(user=self.bob).update(following_count=0)
+
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.counts(self.alice), (1, 0))
+        self.assertEqual(self.counts(self.bob), (0, 1))
@@ -1,9 +1,14 @@
 from django.urls import path
 
-from user_profile.views import UserProfileView, UserDeleteProfileView
+from user_profile.views import (
+    FollowerListView, FollowingListView, FollowView, UserDeleteProfileView, UserProfileView
+)
 
 urlpatterns = [
     path('profile/<str:username>/', UserProfileView.as_view(), name='profile'),
     path('profile/<str:username>/delete/', UserDeleteProfileView.as_view(), name='delete-profile'),
+    path('profile/<str:username>/follow/', FollowView.as_view(), name='follow'),
+    path('profile/<str:username>/followers/', FollowerListView.as_view(), name='followers'),
+    path('profile/<str:username>/following/', FollowingListView.as_view(), name='following'),
 ]
 
@@ -1,13 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from rest_framework import status
-from rest_framework.generics import get_object_or_404, RetrieveUpdateAPIView, DestroyAPIView
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404, DestroyAPIView, ListAPIView, RetrieveUpdateAPIView
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from user_profile.models import UserProfile
+from media_files.uploads import BoundedImageUploadMixin
+from user_profile.models import Follow, UserProfile
+from user_profile.pagination import FollowCursorPagination
 from user_profile.permissions import IsOwnerOrReadOnly
-from user_profile.serializers import ProfileSerializer
+from user_profile.serializers import FollowerSerializer, FollowingSerializer, ProfileSerializer
+from utils.conditional import ConditionalMixin
+from utils.dynamic_fields import DynamicFieldsViewMixin
+from utils.response_cache import VersionedCacheMixin
 
+User = get_user_model()
 
-class UserProfileView(RetrieveUpdateAPIView):
+
+class UserProfileView(BoundedImageUploadMixin, ConditionalMixin, VersionedCacheMixin, DynamicFieldsViewMixin, RetrieveUpdateAPIView):
     """
     API view for retrieving and partially updating a user's profile.
 
@@ -20,18 +32,25 @@ class UserProfileView(RetrieveUpdateAPIView):
     Supported Methods:
         - GET: Retrieve the user's profile data.
         - PATCH: Partially update the user's profile if the requester is the owner.
+
+    GET responses are cached per profile version (see VersionedCacheMixin) and
+    carry an ETag derived from it (see ConditionalMixin). `?fields=` trims the
+    output and the columns loaded (see DynamicFieldsMixin). Picture uploads
+    are size-checked from their headers while streaming (see
+    BoundedImageUploadMixin).
     """
     permission_classes = [IsOwnerOrReadOnly]
     serializer_class = ProfileSerializer
+    cache_endpoint = 'profile'
 
     def get_queryset(self):
         """
         Provides the queryset for the view.
 
         Returns:
-            QuerySet: All UserProfile instances.
+            QuerySet: All UserProfile instances, with their users joined.
         """
-        return UserProfile.objects.all()
+        return self.optimize_queryset(UserProfile.objects.select_related('user'))
 
     def get_object(self):
         """
@@ -46,13 +65,31 @@ class UserProfileView(RetrieveUpdateAPIView):
             Http404: If no matching UserProfile is found.
         """
         username = self.kwargs.get('username')
-        profile = get_object_or_404(UserProfile, user__username=username)
+        profile = get_object_or_404(self.get_queryset(), user__username=username)
 
         # Enforce object-level permission
         self.check_object_permissions(self.request, profile)
 
         return profile
 
+    def get_cache_version(self):
+        """
+        Identify the cached response by profile id and version.
+
+        Returns:
+            tuple | None: ``(profile id, version)``, or None if no such profile.
+        """
+        return UserProfile.objects.filter(
+            user__username=self.kwargs.get('username')
+        ).values_list('pk', 'version').first()
+
+    def get_object_validators(self):
+        """
+        ETag from the profile version; profiles have no modification time.
+        """
+        version = self.get_current_version()
+        return (version, None) if version is not None else None
+
     def put(self, request, *args, **kwargs):
         """
         Disable full updates to user profiles.
@@ -147,3 +184,81 @@ class UserDeleteProfileView(DestroyAPIView):
             {'message': 'Delete profile success'},
             status=status.HTTP_204_NO_CONTENT
         )
+
+
+class FollowView(APIView):
+    """
+    Follow or unfollow a user.
+
+    URL Parameters:
+        username (str): The user to follow or unfollow.
+
+    Supported Methods:
+        - POST: Follow the user; 201 when the follow is new, 200 if it existed.
+        - DELETE: Unfollow the user; 204 whether or not a follow existed.
+
+    Follower counts and home timelines are updated from the Follow signals
+    (see user_profile.signals and posts.signals).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_followee(self):
+        followee = get_object_or_404(User, username=self.kwargs.get('username'))
+        if followee.pk == self.request.user.pk:
+            raise ValidationError({'detail': 'You cannot follow yourself.'})
+        return followee
+
+    def post(self, request, *args, **kwargs):
+        followee = self.get_followee()
+        try:
+            with transaction.atomic():
+                _, created = Follow.objects.get_or_create(follower=request.user, followee=followee)
+        except IntegrityError:
+            # A concurrent request created it first
+            created = False
+        return Response(
+            {'username': followee.username, 'following': True},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    def delete(self, request, *args, **kwargs):
+        followee = self.get_followee()
+        # Deleted one by one so the post_delete receivers run
+        for follow in Follow.objects.filter(follower=request.user, followee=followee):
+            follow.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FollowerListView(ListAPIView):
+    """
+    List the users following a user, most recent follow first.
+
+    URL Parameters:
+        username (str): The user whose followers are listed.
+
+    Cursor paginated (see FollowCursorPagination).
+    """
+    serializer_class = FollowerSerializer
+    pagination_class = FollowCursorPagination
+    user_field = 'followee'
+    listed_field = 'follower'
+
+    def get_queryset(self):
+        user = get_object_or_404(User, username=self.kwargs.get('username'))
+        return Follow.objects.filter(**{self.user_field: user}).select_related(self.listed_field).only(
+            'id', 'created_at', f'{self.listed_field}__id', f'{self.listed_field}__username'
+        )
+
+
+class FollowingListView(FollowerListView):
+    """
+    List the users a user follows, most recent follow first.
+
+    URL Parameters:
+        username (str): The user whose followed accounts are listed.
+
+    Cursor paginated (see FollowCursorPagination).
+    """
+    serializer_class = FollowingSerializer
+    user_field = 'follower'
+    listed_field = 'followee'
@@ -0,0 +1,11 @@
+from django.conf import settings
+
+
+def get_setting(namespace, defaults, name):
+    """
+    Read `name` from the settings dict `namespace`, falling back to `defaults`.
+
+    Modules bind their own namespace with ``functools.partial``. Settings are
+    looked up on every call, so ``override_settings`` applies.
+    """
+    return getattr(settings, namespace, {}).get(name, defaults[name])
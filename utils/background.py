@@ -0,0 +1,100 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.db import close_old_connections, transaction
+
+from utils import app_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Worker threads; image encoding releases the GIL, so threads scale.
+    'WORKERS': 2,
+    # Run tasks inline instead (tests, management commands).
+    'EAGER': False,
+}
+
+
+get_setting = partial(app_settings.get_setting, 'BACKGROUND_TASKS', DEFAULTS)
+
+
+class BackgroundPool:
+    """
+    In-process worker pool for work that should not hold up a response.
+
+    Tasks submitted under the same `key` while one is queued or running are
+    dropped, so repeated saves or requests do not pile up duplicate work.
+    Each task gets fresh database connections and failures are logged, not
+    raised. Work is lost if the process exits, so tasks must be safe to
+    redo later (e.g. lazily, on first request).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pending = set()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=get_setting('WORKERS'),
+                    thread_name_prefix='background'
+                )
+            return self.executor
+
+    def submit(self, fn, *args, key=None):
+        """
+        Run `fn(*args)` on the pool.
+
+        Returns:
+            bool: False if a task with the same key is already pending.
+        """
+        if key is not None:
+            with self.lock:
+                if key in self.pending:
+                    return False
+                self.pending.add(key)
+
+        if get_setting('EAGER'):
+            self.run(fn, args, key, inline=True)
+        else:
+            self.get_executor().submit(self.run, fn, args, key)
+        return True
+
+    def submit_on_commit(self, fn, *args, key=None):
+        """
+        `submit` once the current transaction commits, so the task sees the
+        rows that scheduled it.
+        """
+        transaction.on_commit(lambda: self.submit(fn, *args, key=key))
+
+    def run(self, fn, args, key, inline=False):
+        # Worker threads own their connections; inline runs share the caller's
+        if not inline:
+            close_old_connections()
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception('Background task %s failed', getattr(fn, '__name__', fn))
+        finally:
+            if key is not None:
+                with self.lock:
+                    self.pending.discard(key)
+            if not inline:
+                close_old_connections()
+
+    def shutdown(self, wait=True):
+        """
+        Wait for queued tasks (if `wait`) and release the workers; the pool
+        starts new ones on the next submit.
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+background = BackgroundPool()
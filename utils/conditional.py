@@ -0,0 +1,87 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def make_etag(parts):
+    """
+    Build a quoted strong ETag from the values a representation depends on.
+    """
+    return '"%s"' % hashlib.sha256(repr(tuple(parts)).encode()).hexdigest()[:32]
+
+
+class ConditionalMixin:
+    """
+    ETag / Last-Modified support for `retrieve` and `list`, checked before the
+    serializer runs.
+
+    Views describe their representation with validators: a sequence of values
+    the body depends on (hashed into the ETag) and an optional last-modified
+    datetime. `If-None-Match` / `If-Modified-Since` matching the validators
+    turn the request into a 304 without serializing anything.
+
+    - `get_object_validators()` is computed before the object is loaded, so it
+      should use a cheap query on version columns.
+    - `get_list_validators(rows)` is computed from the page just fetched.
+
+    Either may return None to skip conditional handling. Last-Modified should
+    only be given when a single timestamp covers every change to the body;
+    otherwise the ETag alone is authoritative.
+    """
+
+    def get_object_validators(self):
+        return None
+
+    def get_list_validators(self, rows):
+        return None
+
+    def get_representation_parts(self):
+        # Absolute URLs (scheme and host) and the query string shape the body
+        return (self.request.scheme, self.request.get_host(), self.request.get_full_path())
+
+    def get_not_modified_response(self, validators):
+        etag_parts, last_modified = validators
+        etag = make_etag((*self.get_representation_parts(), *etag_parts))
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(self.request._request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            self.set_validator_headers(response, validators)
+        return response
+
+    def set_validator_headers(self, response, validators):
+        if validators is None:
+            return response
+        etag_parts, last_modified = validators
+        response['ETag'] = make_etag((*self.get_representation_parts(), *etag_parts))
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_object_validators()
+        if validators is not None:
+            not_modified = self.get_not_modified_response(validators)
+            if not_modified is not None:
+                return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        return self.set_validator_headers(response, validators)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+
+        validators = self.get_list_validators(rows)
+        if validators is not None:
+            not_modified = self.get_not_modified_response(validators)
+            if not_modified is not None:
+                return not_modified
+
+        serializer = self.get_serializer(rows, many=True)
+        if page is not None:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response(serializer.data)
+        return self.set_validator_headers(response, validators)
@@ -0,0 +1,135 @@
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.db import DatabaseError, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+
+from utils import app_settings
+from utils.background import background
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Seconds increments are held in memory before being written.
+    'FLUSH_INTERVAL': 1.0,
+    # Flush early once this many rows have increments pending.
+    'MAX_PENDING': 5000,
+    # Rows written per UPDATE.
+    'BATCH_SIZE': 500,
+    # Write increments as soon as their transaction commits (tests).
+    'EAGER': False,
+}
+
+
+get_setting = partial(app_settings.get_setting, 'COUNTERS', DEFAULTS)
+
+
+def write_increments(model, key_field, increments):
+    """
+    Apply summed increments to counter columns of `model`, one UPDATE per
+    batch of rows whatever the number of columns:
+    ``SET likes = MAX(likes + CASE id WHEN .. THEN 3 .. END, 0), ...``.
+
+    Rows with a `version` column get it bumped, invalidating their cached
+    responses and ETags. Counts never go below zero.
+
+    Args:
+        model: Model holding the counters.
+        key_field (str): Field identifying rows, e.g. ``'pk'`` or ``'user_id'``.
+        increments (dict): ``{(key, column): delta}``.
+    """
+    by_key = defaultdict(dict)
+    for (key, column), delta in increments.items():
+        if delta:
+            by_key[key][column] = delta
+    keys = list(by_key)
+    columns = {column for deltas in by_key.values() for column in deltas}
+    versioned = any(field.name == 'version' for field in model._meta.concrete_fields)
+
+    batch_size = get_setting('BATCH_SIZE')
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        updates = {}
+        for column in columns:
+            whens = [
+                When(**{key_field: key}, then=Value(by_key[key][column]))
+                for key in batch if column in by_key[key]
+            ]
+            if whens:
+                updates[column] = Greatest(F(column) + Case(*whens, default=Value(0)), Value(0))
+        if versioned:
+            updates['version'] = F('version') + 1
+        model._base_manager.filter(**{f'{key_field}__in': batch}).update(**updates)
+
+
+class CounterBuffer:
+    """
+    Write-behind buffer for denormalized counter columns (likes, comments,
+    post counts).
+
+    Increments are summed in memory once their transaction commits and
+    written every FLUSH_INTERVAL seconds by `write_increments`, on the
+    background pool. However many likes a viral post gets, its row then
+    sees one UPDATE per interval per process instead of one per like, so
+    write contention on it stays constant as volume grows.
+
+    Increments still buffered when a process dies are lost, and writes that
+    bypass the buffer (cascading deletes) are not counted; the
+    `reconcile_counters` command recomputes exact values.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(Counter)
+        self.timer = None
+
+    def add(self, model, key, column, delta=1, key_field='pk'):
+        """
+        Add `delta` to `column` of the `model` row whose `key_field` is `key`,
+        once the current transaction commits.
+        """
+        transaction.on_commit(lambda: self.add_committed(model, key, column, delta, key_field))
+
+    def add_committed(self, model, key, column, delta, key_field):
+        if get_setting('EAGER'):
+            write_increments(model, key_field, {(key, column): delta})
+            return
+
+        with self.lock:
+            self.pending[(model, key_field)][(key, column)] += delta
+            pending = sum(len(increments) for increments in self.pending.values())
+            if self.timer is None:
+                self.timer = threading.Timer(get_setting('FLUSH_INTERVAL'), self.schedule_flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if pending >= get_setting('MAX_PENDING'):
+            self.schedule_flush()
+
+    def schedule_flush(self):
+        background.submit(self.flush, key=('counters', id(self)))
+
+    def flush(self):
+        """
+        Write all pending increments now.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(Counter)
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        for (model, key_field), increments in pending.items():
+            try:
+                write_increments(model, key_field, increments)
+            except DatabaseError:
+                logger.exception('Dropped %d %s counter increments', len(increments), model.__name__)
+
+
+counters = CounterBuffer()
+
+# Graceful shutdowns write what is left
+atexit.register(counters.flush)
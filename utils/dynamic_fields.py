@@ -0,0 +1,151 @@
+from rest_framework import permissions, serializers
+
+
+def parse_field_spec(value):
+    """
+    Parse ``a,b.c,b.d`` into the tree ``{'a': None, 'b': {'c': None, 'd': None}}``.
+
+    A leaf of None means "everything below"; it wins over narrower paths given
+    for the same name. Returns None when no value was supplied.
+    """
+    if value is None:
+        return None
+    tree = {}
+    for item in value.split(','):
+        path = [name.strip() for name in item.split('.')]
+        if not all(path):
+            continue
+        *parents, leaf = path
+        node = tree
+        for name in parents:
+            if name in node and node[name] is None:
+                break
+            node = node.setdefault(name, {})
+        else:
+            node[leaf] = None
+    return tree
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin for sparse fieldsets and expansion control.
+
+    - `fields` (a tree from `parse_field_spec`) keeps only the named fields;
+      nested paths narrow nested serializers.
+    - `expand` lists which `expandable_fields` are embedded. When it is given,
+      every expandable field not listed collapses to its id(s); when it is
+      None, nothing collapses.
+
+    Nested serializers built by the serializer itself should receive
+    `self.nested_options(name)` so the spec flows down. Subclasses override
+    `optimize_queryset` to drop joins and columns the output does not need.
+    """
+    expandable_fields = ()
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.field_spec = fields
+        self.expand_spec = expand
+
+        if fields is not None:
+            for name in list(self.fields):
+                if name not in fields:
+                    self.fields.pop(name)
+
+        for name in self.expandable_fields:
+            if name not in self.fields:
+                continue
+            if not self.is_expanded(name):
+                self.fields[name] = self.get_collapsed_field(name)
+                continue
+            field = self.fields[name]
+            if isinstance(field, DynamicFieldsMixin):
+                # Declared nested serializer; rebuild it with the nested spec
+                self.fields[name] = type(field)(*field._args, **{**field._kwargs, **self.nested_options(name)})
+
+    def is_expanded(self, name):
+        return self.expanded(self.expand_spec, name)
+
+    def nested_options(self, name):
+        """
+        Keyword arguments narrowing a nested serializer rendered for `name`.
+        """
+        return {
+            'fields': self.subspec(self.field_spec, name),
+            'expand': self.subexpand(self.expand_spec, name)
+        }
+
+    def get_collapsed_field(self, name):
+        """
+        Field rendering an unexpanded relation; by default its foreign key.
+        """
+        return serializers.ReadOnlyField(source=f'{name}_id')
+
+    # Helpers on raw spec trees, shared by __init__ and optimize_queryset
+
+    @staticmethod
+    def wants(fields, name):
+        return fields is None or name in fields
+
+    @staticmethod
+    def expanded(expand, name):
+        return expand is None or name in expand
+
+    @staticmethod
+    def subspec(fields, name):
+        return fields.get(name) if fields is not None else None
+
+    @staticmethod
+    def subexpand(expand, name):
+        # Below an expanded relation, relations collapse unless named too
+        return None if expand is None else (expand.get(name) or {})
+
+    @classmethod
+    def optimize_queryset(cls, queryset, fields=None, expand=None):
+        """
+        Narrow `queryset` to what the given spec renders. Default: unchanged.
+        """
+        return queryset
+
+
+class DynamicFieldsViewMixin:
+    """
+    View mixin reading `?fields=` and `?expand=` for DynamicFieldsMixin
+    serializers on read requests.
+
+    Views call `optimize_queryset()` on their base queryset so the serializer
+    can prune joins and columns to match.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_field_specs(self):
+        """
+        Returns:
+            tuple: ``(fields, expand)`` trees, None where not requested or for
+            write requests, whose bodies always render in full.
+        """
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None, None
+        params = self.request.query_params
+        return (
+            parse_field_spec(params.get(self.fields_query_param)),
+            parse_field_spec(params.get(self.expand_query_param))
+        )
+
+    def has_field_specs(self):
+        return self.get_field_specs() != (None, None)
+
+    def optimize_queryset(self, queryset):
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, DynamicFieldsMixin):
+            return queryset
+        fields, expand = self.get_field_specs()
+        return serializer_class.optimize_queryset(queryset, fields, expand)
+
+    def get_serializer(self, *args, **kwargs):
+        if issubclass(self.get_serializer_class(), DynamicFieldsMixin):
+            fields, expand = self.get_field_specs()
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,320 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from utils.conditional import ConditionalMixin
+from utils.dynamic_fields import DynamicFieldsMixin
+
+# Field classes whose to_representation only looks at the value itself, so it
+# can run on a raw column value instead of a model attribute.
+PLAIN_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.FloatField,
+    serializers.DecimalField,
+    serializers.BooleanField,
+    serializers.UUIDField,
+    serializers.DateTimeField,
+    serializers.DateField,
+    serializers.TimeField,
+    serializers.ReadOnlyField,
+)
+
+# Compiled serializers kept per (class, fields, expand); specs come from query
+# strings, so the cache is bounded.
+COMPILED_CACHE_SIZE = 256
+
+
+class NotCompilable(Exception):
+    """
+    The serializer renders something a values() row cannot provide.
+    """
+
+
+class FastValue:
+    """
+    Fast-path stand-in for a SerializerMethodField rendering one column or
+    annotation as is.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+
+class FastNested:
+    """
+    Fast-path stand-in for a SerializerMethodField rendering a to-one relation
+    with `serializer_class`; rendered as None when the relation is empty.
+    """
+
+    def __init__(self, serializer_class, source):
+        self.serializer_class = serializer_class
+        self.source = source
+
+
+def resolve_path(model, attrs):
+    """
+    Check that `attrs` walks to-one relations of `model` down to a column.
+
+    Returns:
+        tuple: ``(path, model_field)`` with `path` in ORM ``a__b`` form.
+
+    Raises:
+        NotCompilable: If an attribute is not a column or to-one relation.
+    """
+    field = None
+    for attr in attrs:
+        if model is None:
+            raise NotCompilable(f'{attr} follows a column')
+        try:
+            field = model._meta.pk if attr == 'pk' else model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            raise NotCompilable(f'{model.__name__}.{attr} is not a field')
+        if field.many_to_many or field.one_to_many:
+            raise NotCompilable(f'{model.__name__}.{attr} is a to-many relation')
+        model = field.related_model
+    return '__'.join(attrs), field
+
+
+class RenderState:
+    """
+    Per-call values converters would otherwise look up for every row.
+    """
+
+    def __init__(self, context):
+        self.request = context.get('request')
+        self.timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+
+
+def file_converter(serializer_field, model_field):
+    """
+    Render a stored file name the way FileField.to_representation renders
+    the FieldFile.
+    """
+    storage = model_field.storage
+    use_url = getattr(serializer_field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+
+    def convert(name, state):
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        return state.request.build_absolute_uri(url) if state.request is not None else url
+    return convert
+
+
+def datetime_converter(field):
+    """
+    DateTimeField.to_representation for aware ISO 8601 output, with the
+    current timezone resolved once per call instead of once per value.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601 or hasattr(field, 'timezone'):
+        return None
+
+    def convert(value, state):
+        if state.timezone is None or isinstance(value, str) or not timezone.is_aware(value):
+            return field.to_representation(value)
+        try:
+            value = value.astimezone(state.timezone).isoformat()
+        except OverflowError:
+            return field.to_representation(value)
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+class CompiledSerializer:
+    """
+    A read-only serializer compiled into a values() row mapper.
+
+    Every output field becomes a column path (dotted sources such as
+    ``user.username`` become ``user__username`` joins) and a converter
+    running the field's own `to_representation` on the raw value, so the
+    output matches the serializer's without instantiating models or walking
+    attribute chains. Declared nested serializers over to-one relations are
+    compiled in place, under the relation's prefix.
+
+    Custom fields can take part by defining `compile_converter(model_field)`,
+    returning ``convert(value, state)`` for the raw column value (see
+    RenderState). SerializerMethodFields compile only when the serializer maps their method
+    name to a FastValue or FastNested in `fast_fields`; anything else raises
+    NotCompilable and the caller keeps the regular serializer.
+    """
+
+    def __init__(self, serializer, prefix=''):
+        model = serializer.Meta.model
+        fast_fields = getattr(serializer, 'fast_fields', {})
+        self.paths = []
+        self.steps = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                self.add_fast_field(serializer, name, fast_fields.get(field.method_name), prefix)
+            elif isinstance(field, serializers.BaseSerializer):
+                if isinstance(field, serializers.ListSerializer) or field.source == '*':
+                    raise NotCompilable(f'{name} is not a to-one relation')
+                path, _ = resolve_path(model, field.source_attrs)
+                self.add_nested(name, field, prefix + path + '__')
+            elif hasattr(field, 'compile_converter'):
+                # Custom fields rendering from a column supply their own converter
+                path, model_field = resolve_path(model, field.source_attrs)
+                self.add_value(name, prefix + path, field.compile_converter(model_field), with_state=True)
+            elif isinstance(field, serializers.FileField):
+                path, model_field = resolve_path(model, field.source_attrs)
+                self.add_value(name, prefix + path, file_converter(field, model_field), with_state=True)
+            elif isinstance(field, serializers.DateTimeField) and datetime_converter(field):
+                path, _ = resolve_path(model, field.source_attrs)
+                self.add_value(name, prefix + path, datetime_converter(field), with_state=True)
+            elif isinstance(field, PLAIN_FIELDS) and field.source != '*':
+                path, _ = resolve_path(model, field.source_attrs)
+                self.add_value(name, prefix + path, field.to_representation)
+            else:
+                raise NotCompilable(f'{name} ({type(field).__name__}) cannot be compiled')
+
+    def add_value(self, name, path, convert, with_state=False):
+        self.paths.append(path)
+        if with_state:
+            def step(row, state):
+                value = row[path]
+                return None if value is None else convert(value, state)
+        else:
+            def step(row, state):
+                value = row[path]
+                return None if value is None else convert(value)
+        self.steps.append((name, step))
+
+    def add_nested(self, name, serializer, prefix):
+        nested = CompiledSerializer(serializer, prefix)
+        # The related primary key tells an empty relation from a blank row
+        marker = prefix + serializer.Meta.model._meta.pk.attname
+        self.paths += [marker, *nested.paths]
+
+        def step(row, state):
+            if row[marker] is None:
+                return None
+            return nested.map_row(row, state)
+        self.steps.append((name, step))
+
+    def add_fast_field(self, serializer, name, spec, prefix):
+        if isinstance(spec, FastValue):
+            self.add_value(name, prefix + spec.path, lambda value: value)
+        elif isinstance(spec, FastNested):
+            options = serializer.nested_options(name) if isinstance(serializer, DynamicFieldsMixin) else {}
+            nested = spec.serializer_class(**options)
+            path, _ = resolve_path(serializer.Meta.model, spec.source.split('.'))
+            self.add_nested(name, nested, prefix + path + '__')
+        else:
+            raise NotCompilable(f'{name} has no fast-path equivalent')
+
+    def map_row(self, row, state):
+        return {name: step(row, state) for name, step in self.steps}
+
+    def map_rows(self, rows, context):
+        """
+        Render values() rows; `context` is the serializer context.
+        """
+        state = RenderState(context)
+        return [self.map_row(row, state) for row in rows]
+
+    def values(self, queryset, *extra):
+        """
+        Turn `queryset` into the values() query feeding `map_rows`, selecting
+        `extra` columns (ordering, validators) as well.
+        """
+        paths = list(dict.fromkeys([*self.paths, *extra]))
+        return queryset.select_related(None).prefetch_related(None).values(*paths)
+
+
+def freeze_spec(spec):
+    if spec is None:
+        return None
+    return tuple(sorted((name, freeze_spec(child)) for name, child in spec.items()))
+
+
+def thaw_spec(frozen):
+    if frozen is None:
+        return None
+    return {name: thaw_spec(child) for name, child in frozen}
+
+
+@lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def _compile(serializer_class, fields, expand):
+    options = {}
+    if issubclass(serializer_class, DynamicFieldsMixin):
+        options = {'fields': thaw_spec(fields), 'expand': thaw_spec(expand)}
+    try:
+        return CompiledSerializer(serializer_class(**options))
+    except NotCompilable:
+        return None
+
+
+def compile_serializer(serializer_class, fields=None, expand=None):
+    """
+    Return the CompiledSerializer for `serializer_class` narrowed by the given
+    spec trees (see DynamicFieldsMixin), or None if it cannot be compiled.
+    Compilation happens once per class and spec.
+    """
+    return _compile(serializer_class, freeze_spec(fields), freeze_spec(expand))
+
+
+class FastListMixin:
+    """
+    Opt-in fast path for `list`: rows are read with values() and rendered by
+    the compiled serializer (see CompiledSerializer) instead of instantiating
+    models and running the serializer's fields one by one.
+
+    The output is the same as the regular path's. Views whose serializer (or
+    requested `?fields=` / `?expand=`) cannot be compiled, and every request
+    while `fast_list` is False, take the regular path. `fast_list_columns`
+    names extra columns the view needs from the rows (e.g. for
+    `get_list_validators`, which receives the value dicts on this path);
+    the paginator's ordering columns are added automatically.
+    """
+    fast_list = True
+    fast_list_columns = ()
+
+    def get_compiled_serializer(self):
+        if not self.fast_list:
+            return None
+        fields, expand = self.get_field_specs() if hasattr(self, 'get_field_specs') else (None, None)
+        return compile_serializer(self.get_serializer_class(), fields, expand)
+
+    def get_fast_list_columns(self):
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return (*self.fast_list_columns, *(field.lstrip('-') for field in ordering))
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()), *self.get_fast_list_columns())
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+
+        validators = None
+        if isinstance(self, ConditionalMixin):
+            validators = self.get_list_validators(rows)
+            if validators is not None:
+                not_modified = self.get_not_modified_response(validators)
+                if not_modified is not None:
+                    return not_modified
+
+        data = compiled.map_rows(rows, self.get_serializer_context())
+        if page is not None:
+            response = self.get_paginated_response(data)
+        else:
+            response = Response(data)
+        if validators is not None:
+            self.set_validator_headers(response, validators)
+        return response
@@ -0,0 +1,258 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import datetime
+from uuid import UUID
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a fixed, unique ordering.
+
+    Unlike offset pagination, every page is fetched with a range predicate on the
+    ordering columns (``WHERE (created_at, id) < (:created_at, :id)``) so the cost
+    of a page depends only on the page size, never on how deep the client has
+    scrolled or how large the table is. The ordering must end in a unique column
+    (usually the primary key) and should be backed by a matching composite index.
+
+    Cursors are opaque, URL-safe base64 tokens holding the position of the
+    boundary row and the direction of travel.
+
+    Attributes:
+        ordering (tuple): Ordering fields, e.g. ``('-created_at', '-id')``.
+        page_size (int): Default number of rows per page.
+        max_page_size (int): Upper bound a client may request.
+        page_size_query_param (str): Query parameter used to request a page size.
+        cursor_query_param (str): Query parameter carrying the cursor.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = getattr(settings, 'PAGINATION_PAGE_SIZE', 20)
+    max_page_size = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 100)
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return a single page of results, remembering enough state to build links.
+
+        Returns:
+            list: Model instances for the requested page.
+
+        Raises:
+            NotFound: If the cursor cannot be decoded.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        limit = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        if cursor is None:
+            position, reverse = None, False
+        else:
+            position, reverse = cursor
+
+        rows, has_more = self.fetch(queryset, position, reverse, limit)
+        self.page = rows
+
+        if reverse:
+            # Walking backwards: we came from the following page, so it exists.
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        return rows
+
+    def fetch(self, queryset, position, reverse, limit):
+        """
+        Run the keyset query for one page.
+
+        Args:
+            queryset (QuerySet): Base queryset, already filtered for the caller.
+            position (list | None): Ordering values of the boundary row, exclusive.
+            reverse (bool): Walk against the declared ordering.
+            limit (int): Maximum number of rows to return.
+
+        Returns:
+            tuple: ``(rows, has_more)`` where rows are in the declared ordering and
+            ``has_more`` tells whether more rows exist in the direction of travel.
+        """
+        queryset = queryset.order_by(*self.get_ordering(reverse))
+        if position is not None:
+            queryset = queryset.filter(self.build_seek_filter(self.coerce_position(queryset, position), reverse))
+
+        # Fetch one extra row to learn whether another page exists.
+        rows = list(queryset[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if reverse:
+            rows.reverse()
+        return rows, has_more
+
+    def coerce_position(self, queryset, position):
+        """
+        Convert the values of a decoded cursor to the Python types of their
+        ordering fields on `queryset`'s model.
+
+        Cursors come from clients, so anything that does not fit its field
+        (including null) is rejected rather than handed to the database.
+
+        Raises:
+            NotFound: If a value is not valid for its field.
+        """
+        coerced = []
+        for field, value in zip(self.ordering, position):
+            try:
+                value = self.get_ordering_field(queryset.model, field.lstrip('-')).to_python(value)
+            except (FieldDoesNotExist, ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            coerced.append(value)
+        return coerced
+
+    def get_ordering_field(self, model, path):
+        """
+        Model field an ordering path such as ``user__date_joined`` ends at.
+        """
+        field = None
+        for name in path.split('__'):
+            field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            model = field.related_model
+        return field.target_field if field.is_relation else field
+
+    def get_ordering(self, reverse=False):
+        """
+        Return the ordering, optionally flipped for backwards travel.
+        """
+        if not reverse:
+            return list(self.ordering)
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+    def build_seek_filter(self, position, reverse=False):
+        """
+        Build the row-value comparison ``(a, b, c) > (x, y, z)`` as a ``Q`` object.
+
+        Expanded as ``a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)``,
+        honouring the direction of each ordering field, which every database
+        backend can serve from the composite index.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.get_ordering(reverse), position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def get_position(self, instance):
+        """
+        Extract the ordering values of an instance (or a values() row) in a
+        JSON-friendly form.
+        """
+        position = []
+        for field in self.ordering:
+            if isinstance(instance, dict):
+                value = instance[field.lstrip('-')]
+            else:
+                value = instance
+                for attr in field.lstrip('-').split('__'):
+                    value = getattr(value, attr)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, UUID):
+                value = str(value)
+            position.append(value)
+        return position
+
+    def get_page_size(self, request):
+        """
+        Return the requested page size, clamped to ``max_page_size``.
+        """
+        if self.page_size_query_param:
+            try:
+                requested = int(request.query_params[self.page_size_query_param])
+                if requested > 0:
+                    return min(requested, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def encode_cursor(self, position, reverse=False):
+        """
+        Serialize a position into an opaque cursor token.
+        """
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, token):
+        """
+        Parse a cursor token produced by ``encode_cursor``.
+
+        Returns:
+            tuple | None: ``(position, reverse)``, or None if no cursor was given.
+
+        Raises:
+            NotFound: If the token is malformed.
+        """
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            position = payload['p']
+            reverse = bool(payload.get('r', 0))
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_link(self, position, reverse):
+        """
+        Build an absolute URL pointing at the page past ``position``.
+        """
+        cursor = self.encode_cursor(position, reverse)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.get_link(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.get_link(self.get_position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
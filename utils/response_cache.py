@@ -0,0 +1,178 @@
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from utils import app_settings
+
+DEFAULTS = {
+    # Django cache alias holding cached payloads (locmem, file or shared).
+    'CACHE_ALIAS': 'default',
+    # Seconds a payload is kept; versions make entries stale, not the timeout.
+    'TIMEOUT': 600,
+    # Seconds other workers wait for the one computing a missing payload.
+    'LOCK_TIMEOUT': 5,
+}
+
+# Interval at which waiters poll for a payload computed by another worker.
+POLL_INTERVAL = 0.01
+
+# Distinguishes "not cached" from a cached None.
+MISSING = object()
+
+
+get_setting = partial(app_settings.get_setting, 'RESPONSE_CACHE', DEFAULTS)
+
+
+class VersionedResponseCache:
+    """
+    Cache of serialized payloads keyed by object version.
+
+    Entries are never invalidated: writers bump the object's `version` column,
+    so the next read builds a new key and the old entry simply ages out.
+
+    A miss is computed once per key (single-flight): concurrent requests in
+    this process wait on a lock, and other processes sharing the cache wait on
+    a short lease taken with `cache.add`, polling until the payload appears.
+    Hits, misses and coalesced waits are counted per endpoint.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.counters = defaultdict(lambda: {'hits': 0, 'misses': 0, 'coalesced': 0})
+
+    @property
+    def cache(self):
+        return caches[get_setting('CACHE_ALIAS')]
+
+    @staticmethod
+    def make_key(endpoint, parts):
+        digest = hashlib.sha256(':'.join(str(part) for part in parts).encode()).hexdigest()
+        return f'response:{endpoint}:{digest}'
+
+    def count(self, endpoint, outcome):
+        with self.lock:
+            self.counters[endpoint][outcome] += 1
+
+    def get_or_compute(self, endpoint, parts, compute):
+        """
+        Return the payload cached under `parts`, computing it at most once.
+
+        Args:
+            endpoint (str): Name used for the key prefix and the stats.
+            parts (tuple): Everything the payload depends on, version included.
+            compute (callable): Builds the payload on a miss.
+        """
+        cache = self.cache
+        key = self.make_key(endpoint, parts)
+        payload = cache.get(key, MISSING)
+        if payload is not MISSING:
+            self.count(endpoint, 'hits')
+            return payload
+
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = [threading.Lock(), 0]
+            flight[1] += 1
+
+        try:
+            with flight[0]:
+                # Someone may have filled the entry while we waited
+                payload = cache.get(key, MISSING)
+                if payload is not MISSING:
+                    self.count(endpoint, 'coalesced')
+                    return payload
+                return self.compute_shared(cache, endpoint, key, compute)
+        finally:
+            with self.lock:
+                flight[1] -= 1
+                if not flight[1]:
+                    del self.flights[key]
+
+    def compute_shared(self, cache, endpoint, key, compute):
+        lease = f'{key}:lease'
+        lock_timeout = get_setting('LOCK_TIMEOUT')
+        if not cache.add(lease, 1, lock_timeout):
+            # Another process is computing it; wait for its result
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                payload = cache.get(key, MISSING)
+                if payload is not MISSING:
+                    self.count(endpoint, 'coalesced')
+                    return payload
+
+        self.count(endpoint, 'misses')
+        try:
+            payload = compute()
+            cache.set(key, payload, get_setting('TIMEOUT'))
+        finally:
+            cache.delete(lease)
+        return payload
+
+    def stats(self):
+        with self.lock:
+            stats = {}
+            for endpoint, counters in self.counters.items():
+                lookups = sum(counters.values())
+                served = counters['hits'] + counters['coalesced']
+                stats[endpoint] = {**counters, 'hit_ratio': served / lookups if lookups else 0.0}
+            return stats
+
+    def reset_stats(self):
+        with self.lock:
+            self.counters.clear()
+
+
+response_cache = VersionedResponseCache()
+
+
+class VersionedCacheMixin:
+    """
+    Serve `retrieve` from `response_cache`, keyed by the object's version.
+
+    Views implement `get_cache_version()`, returning a tuple that changes
+    whenever the payload would (typically primary key and `version`, read
+    with a cheap indexed query), or None to bypass the cache. On a hit the
+    object is neither loaded nor serialized.
+
+    Object-level permissions are only checked on a miss, so this is only
+    suitable for objects every permitted caller may read.
+    """
+    cache_endpoint = None
+
+    def get_cache_version(self):
+        raise NotImplementedError
+
+    def get_current_version(self):
+        """
+        `get_cache_version()`, looked up once per request so other mixins
+        (e.g. ConditionalMixin validators) can share it.
+        """
+        if not hasattr(self, '_current_version'):
+            self._current_version = self.get_cache_version()
+        return self._current_version
+
+    def get_cache_parts(self, version):
+        request = self.request
+        # Absolute URLs in the payload depend on the scheme and host, and the
+        # query string may shape the payload
+        return (*version, request.scheme, request.get_host(), request.get_full_path())
+
+    def retrieve(self, request, *args, **kwargs):
+        version = self.get_current_version()
+        if version is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        data = response_cache.get_or_compute(
+            self.cache_endpoint or type(self).__name__,
+            self.get_cache_parts(version),
+            lambda: super(VersionedCacheMixin, self).retrieve(request, *args, **kwargs).data
+        )
+        return Response(data)